@@ -5,13 +5,97 @@ Created on Wed Nov 13 16:08:35 2024
 @author: slim
 """
 
+import sys
+
+
+def intern(value):
+    # descriptions, effects and mechanism names repeat across thousands of
+    # failure modes, keep a single copy of each
+    return sys.intern(value) if type(value) is str else value
+
+"""
+ordered reference sets
+"""
+
+class RefSet:
+    # insertion ordered collection with O(1) append/remove/membership, used
+    # where a list of linked objects can grow to the size of the BOM
+    __slots__ = ('_items',)
+
+    def __init__(self, items=()):
+        self._items = dict.fromkeys(items)
+
+    def append(self, item):
+        self._items[item] = None
+
+    def remove(self, item):
+        try:
+            del self._items[item]
+        except KeyError:
+            raise ValueError(f"{item!r} not in {type(self).__name__}") from None
+
+    def clear(self):
+        self._items.clear()
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        # positional access is O(n), kept for list compatibility
+        return list(self._items)[index]
+
+    def __repr__(self):
+        return f"{type(self).__name__}({list(self._items)!r})"
+
+
+class IdIndex(RefSet):
+    # RefSet of objects with an ``id``, also looked up by str(id) in O(1)
+    __slots__ = ('_by_id',)
+
+    def __init__(self, items=()):
+        super().__init__()
+        self._by_id = {}
+        for item in items:
+            self.append(item)
+
+    def append(self, item):
+        key = str(item.id)
+        existing = self._by_id.get(key)
+        if existing is item:
+            return
+        if existing is not None:
+            raise ValueError(f"duplicate id {item.id!r}")
+        self._items[item] = None
+        self._by_id[key] = item
+
+    def remove(self, item):
+        super().remove(item)
+        del self._by_id[str(item.id)]
+
+    def clear(self):
+        super().clear()
+        self._by_id.clear()
+
+    def get(self, item_id, default=None):
+        return self._by_id.get(str(item_id), default)
+
+
 """
 class safety function
 """   
 
 class SafetyFunction : 
+    __slots__ = ('related_components', 'id', 'description', 'target_integrity_level',
+                 'RF', 'MPFL', 'MPFD', 'MPHF', 'SPFM', 'LFM', 'safetyrelated', 'lifetime')
+
     def __init__(self,sf_id):
-        self.related_components = []
+        self.related_components = RefSet()
         self.id = sf_id
         self.description = ""
         self.target_integrity_level = ""
@@ -22,11 +106,56 @@ class SafetyFunction :
         self.SPFM = 0.0
         self.LFM = 0.0
         self.safetyrelated = 0.0
+        # lifetime of the last full evaluation, None until evaluated
+        self.lifetime = None
 
     def add_component(self, component):
+        if component in self.related_components:
+            return  # already linked, its totals are in the sums
         self.related_components.append(component)
-        
-    
+        if self not in component.related_Sfs:
+            component.related_Sfs.append(self)
+        self.apply_delta(component.RF, component.MPFL, component.MPFD, component.failure_rate)
+
+    def remove_component(self, component):
+        self.related_components.remove(component)
+        if self in component.related_Sfs:
+            component.related_Sfs.remove(self)
+        self.recompute_totals()
+
+    def recompute_totals(self):
+        # re-sum the remaining components instead of subtracting the removed
+        # one: subtracting leaves rounding residue (RF = -8.8e-13 and
+        # SPFM > 1 once every component is unlinked, where a full evaluation
+        # gives 0)
+        comps = self.related_components
+        self.RF = sum(cp.RF for cp in comps)
+        self.MPFL = sum(cp.MPFL for cp in comps)
+        self.MPFD = sum(cp.MPFD for cp in comps)
+        self.safetyrelated = sum(cp.failure_rate for cp in comps)
+        if self.lifetime is not None:
+            self.update_derived_metrics(self.lifetime)
+
+    def apply_delta(self, d_rf, d_mpfl, d_mpfd, d_safetyrelated=0.0):
+        # running totals, only the derived metrics of this SF are recomputed
+        self.RF += d_rf
+        self.MPFL += d_mpfl
+        self.MPFD += d_mpfd
+        self.safetyrelated += d_safetyrelated
+        if self.lifetime is not None:
+            self.update_derived_metrics(self.lifetime)
+
+    def update_derived_metrics(self, lifetime):
+        self.MPHF = (self.RF / 1e9) + ((self.MPFL / 1e9) * (self.MPFD / 1e9) * lifetime)
+        if self.safetyrelated > 0:
+            self.SPFM = 1 - (self.RF / self.safetyrelated)
+        else:
+            self.SPFM = 0
+
+        if (self.safetyrelated - self.RF) > 0:
+            self.LFM = 1 - (self.MPFL / (self.safetyrelated - self.RF))
+        else:
+            self.LFM = 0
     
     def evaluate_metrics(self,lifetime):
         self.RF = 0.0
@@ -45,16 +174,8 @@ class SafetyFunction :
                 self.RF+=fm.RF 
                 self.MPFD+= fm.MPFD
                 self.MPFL+= fm.MPFL
-        self.MPHF = (self.RF / 1e9) + ((self.MPFL / 1e9) * (self.MPFD / 1e9) * lifetime)
-        if self.safetyrelated > 0:
-            self.SPFM = 1 - (self.RF / self.safetyrelated)
-        else:
-            self.SPFM = 0
-
-        if (self.safetyrelated - self.RF) > 0:
-            self.LFM = 1 - (self.MPFL / (self.safetyrelated - self.RF))
-        else:
-            self.LFM = 0
+        self.update_derived_metrics(lifetime)
+        self.lifetime = lifetime
        
                
 
@@ -63,31 +184,104 @@ class failure mode
 """   
 
 class FailureMode:
+    __slots__ = ('component', '_description', '_Failure_rate_total', '_system_level_effect',
+                 '_is_SPF', '_is_MPF', '_SPF_safety_mechanism', '_MPF_safety_mechanism',
+                 'SPF_diagnostic_coverage', 'MPF_diagnostic_coverage', 'RF', 'MPFL', 'MPFD')
+
     def __init__(self):
-        self.description = "none"
-        self.Failure_rate_total = 0.0
-        self.system_level_effect = "none"
-        self.is_SPF = 0
-        self.is_MPF = 0 
-        self.SPF_safety_mechanism = "none"
-        self.MPF_safety_mechanism = "none"
+        self.component = None
+        self._description = "none"
+        self._Failure_rate_total = 0.0
+        self._system_level_effect = "none"
+        self._is_SPF = 0
+        self._is_MPF = 0 
+        self._SPF_safety_mechanism = "none"
+        self._MPF_safety_mechanism = "none"
         self.SPF_diagnostic_coverage = 0
         self.MPF_diagnostic_coverage = 0
         self.RF = 0.0
         self.MPFL = 0.0
         self.MPFD = 0.0
-        
+
+    # interned text attributes
+    @property
+    def description(self):
+        return self._description
+
+    @description.setter
+    def description(self, value):
+        self._description = intern(value)
+
+    @property
+    def system_level_effect(self):
+        return self._system_level_effect
+
+    @system_level_effect.setter
+    def system_level_effect(self, value):
+        self._system_level_effect = intern(value)
+
+    @property
+    def SPF_safety_mechanism(self):
+        return self._SPF_safety_mechanism
+
+    @SPF_safety_mechanism.setter
+    def SPF_safety_mechanism(self, value):
+        self._SPF_safety_mechanism = intern(value)
+
+    @property
+    def MPF_safety_mechanism(self):
+        return self._MPF_safety_mechanism
+
+    @MPF_safety_mechanism.setter
+    def MPF_safety_mechanism(self, value):
+        self._MPF_safety_mechanism = intern(value)
+
+    # inputs of the RF/MPFL/MPFD formulas, changing one pushes the deltas up
+    @property
+    def Failure_rate_total(self):
+        return self._Failure_rate_total
+
+    @Failure_rate_total.setter
+    def Failure_rate_total(self, value):
+        self._Failure_rate_total = value
+        self.update_metrics()
+
+    @property
+    def is_SPF(self):
+        return self._is_SPF
+
+    @is_SPF.setter
+    def is_SPF(self, value):
+        self._is_SPF = value
+        self.update_metrics()
+
+    @property
+    def is_MPF(self):
+        return self._is_MPF
+
+    @is_MPF.setter
+    def is_MPF(self, value):
+        self._is_MPF = value
+        self.update_metrics()
 
     def set_spf_mechanism(self, spf_mechanism, dc):
         self.SPF_safety_mechanism=spf_mechanism
         self.SPF_diagnostic_coverage=dc
-        self.RF = self.is_SPF * self.Failure_rate_total * (1 - (self.SPF_diagnostic_coverage /100))
+        self.update_metrics()
     
     def set_mpf_mechanism(self, mpf_mechanism, dc):
         self.MPF_safety_mechanism=mpf_mechanism
         self.MPF_diagnostic_coverage=dc
-        self.MPFL = self.is_MPF * (self.Failure_rate_total-self.RF) * (1 - (self.MPF_diagnostic_coverage /100))  
-        self.MPFD = self.is_MPF * (self.Failure_rate_total-self.RF) * (self.MPF_diagnostic_coverage /100)
+        self.update_metrics()
+
+    def update_metrics(self):
+        RF = self.is_SPF * self.Failure_rate_total * (1 - (self.SPF_diagnostic_coverage /100))
+        MPFL = self.is_MPF * (self.Failure_rate_total-RF) * (1 - (self.MPF_diagnostic_coverage /100))  
+        MPFD = self.is_MPF * (self.Failure_rate_total-RF) * (self.MPF_diagnostic_coverage /100)
+        d_rf, d_mpfl, d_mpfd = RF - self.RF, MPFL - self.MPFL, MPFD - self.MPFD
+        self.RF, self.MPFL, self.MPFD = RF, MPFL, MPFD
+        if self.component is not None and (d_rf or d_mpfl or d_mpfd):
+            self.component.apply_fm_delta(d_rf, d_mpfl, d_mpfd)
        
     
     
@@ -97,17 +291,57 @@ class component
 """        
         
 class Component:
+    __slots__ = ('id', '_type', 'failure_modes', 'related_Sfs', '_failure_rate',
+                 'is_safety_related', 'RF', 'MPFL', 'MPFD')
+
     def __init__(self,id):
         self.id = id
-        self.type = None
+        self._type = None
         self.failure_modes = []
-        self.failure_rate = 0
-        self.is_safety_related = 0
         self.related_Sfs = []
-        
+        self._failure_rate = 0
+        self.is_safety_related = 0
+        # running totals of the failure modes
+        self.RF = 0.0
+        self.MPFL = 0.0
+        self.MPFD = 0.0
+
+    @property
+    def type(self):
+        return self._type
+
+    @type.setter
+    def type(self, value):
+        self._type = intern(value)
+
+    @property
+    def failure_rate(self):
+        return self._failure_rate
+
+    @failure_rate.setter
+    def failure_rate(self, value):
+        delta = value - self._failure_rate
+        self._failure_rate = value
+        if delta:
+            for sf in self.related_Sfs:
+                sf.apply_delta(0.0, 0.0, 0.0, delta)
 
     def add_FM(self, fm):
         self.failure_modes.append(fm)
+        fm.component = self
+        self.apply_fm_delta(fm.RF, fm.MPFL, fm.MPFD)
+
+    def remove_FM(self, fm):
+        self.failure_modes.remove(fm)
+        fm.component = None
+        self.apply_fm_delta(-fm.RF, -fm.MPFL, -fm.MPFD)
+
+    def apply_fm_delta(self, d_rf, d_mpfl, d_mpfd):
+        self.RF += d_rf
+        self.MPFL += d_mpfl
+        self.MPFD += d_mpfd
+        for sf in self.related_Sfs:
+            sf.apply_delta(d_rf, d_mpfl, d_mpfd)
 
    
 
@@ -123,8 +357,8 @@ class Project:
         self.name = name
         self.Target_standard = None
         self.lifetime = 0
-        self.SF_list = []
-        self.bom = []
+        self.SF_list = IdIndex()
+        self.bom = IdIndex()
  
 
     # Safety functions
@@ -132,6 +366,37 @@ class Project:
         
         self.SF_list.append(sf)
 
+    def get_SF(self, sf_id):
+        return self.SF_list.get(sf_id)
+
+    def remove_SF(self, sf):
+        self.SF_list.remove(sf)
+        for comp in sf.related_components:
+            if sf in comp.related_Sfs:
+                comp.related_Sfs.remove(sf)
+        sf.related_components.clear()
+
+    # Components
+    def add_component(self, comp):
+        self.bom.append(comp)
+
+    def get_component(self, comp_id):
+        return self.bom.get(comp_id)
+
+    def remove_component(self, comp):
+        self.bom.remove(comp)
+        for sf in list(comp.related_Sfs):
+            sf.remove_component(comp)
+
+    # SF <-> component links, both sides are kept consistent
+    def link(self, comp, sf):
+        if comp not in sf.related_components:
+            sf.add_component(comp)
+
+    def unlink(self, comp, sf):
+        if comp in sf.related_components:
+            sf.remove_component(comp)
+
     def evaluate_metrics(self, lifetime):
         for sf in self.SF_list:
             sf.evaluate_metrics(lifetime)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Cold-start time of the headless CLI.
+
+Runs ``fmeda_cli.py evaluate`` on the bundled example project in fresh
+interpreters and fails (exit status 1) when the median wall time is over
+the 50 ms target (bare ``python -c pass`` is shown for reference).
+
+    python benchmarks/bench_cli_startup.py [runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+EXAMPLE = os.path.join(ROOT, "FMEDA Project1.csv")
+TARGET_MS = 50.0
+
+
+def wall_times(cmd, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def report(label, times):
+    times = sorted(times)
+    p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+    print(f"{label:<22} median {statistics.median(times):6.1f} ms   p95 {p95:6.1f} ms")
+    return statistics.median(times)
+
+
+def main(argv):
+    runs = int(argv[1]) if len(argv) > 1 else 30
+    report("python -c pass", wall_times([sys.executable, "-c", "pass"], runs))
+    median = report("fmeda_cli evaluate", wall_times([sys.executable, "fmeda_cli.py", "evaluate", EXAMPLE], runs))
+    if median > TARGET_MS:
+        sys.exit(f"cold start median {median:.1f} ms is over the {TARGET_MS:.0f} ms target")
+    print(f"target {TARGET_MS:.0f} ms: OK")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Cost of the fmeda app's logging on imports and calculations.
+
+Builds a synthetic project in an in-memory SQLite database, exports it to
+CSV once, then times the CSV import and the per-object ("orm") calculation,
+which log per failure mode, with the fmeda logger at WARNING (off), INFO,
+DEBUG sampled (every FMEDA_LOG_SAMPLE_EVERY-th row) and DEBUG for every
+row. Log lines go to /dev/null, so the numbers are the formatting and
+handler cost, not the terminal's.
+
+    python benchmarks/bench_logging.py [n_failure_modes] [runs]
+"""
+
+import io
+import logging
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "fmeda_backend.settings")
+os.environ["DATABASE_URL"] = "sqlite://:memory:"
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+
+from fmeda.csv_io import import_project_csv, iter_project_csv  # noqa: E402
+from fmeda.tests import build_fixture_project  # noqa: E402
+from fmeda.models import Project  # noqa: E402
+from fmeda.utils import calculate_project_metrics  # noqa: E402
+
+FMS_PER_COMPONENT = 4
+N_SFS = 50
+
+# label, level, sample every
+MODES = [
+    ("off (WARNING)", logging.WARNING, None),
+    ("INFO", logging.INFO, None),
+    ("DEBUG, sampled", logging.DEBUG, None),
+    ("DEBUG, every row", logging.DEBUG, 1),
+]
+
+
+def median_ms(func, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def configure(level, devnull):
+    logger = logging.getLogger("fmeda")
+    logger.handlers = [logging.StreamHandler(devnull)]
+    logger.setLevel(level)
+
+
+def main(argv):
+    n_fms = int(argv[1]) if len(argv) > 1 else 20000
+    runs = int(argv[2]) if len(argv) > 2 else 3
+    call_command("migrate", verbosity=0)
+    project = build_fixture_project(N_SFS, max(n_fms // FMS_PER_COMPONENT, 1), FMS_PER_COMPONENT)
+    csv_bytes = "".join(iter_project_csv(project)).encode()
+
+    def run_import():
+        imported, _ = import_project_csv(io.BytesIO(csv_bytes))
+        Project.objects.filter(pk=imported.pk).delete()
+
+    def run_calculate():
+        calculate_project_metrics(project, "orm")
+
+    print(f"{n_fms} failure modes, {N_SFS} safety functions, median of {runs} runs\n")
+    print(f"{'logging':<20} {'import':>10} {'FMs/s':>10} {'calculate':>12} {'FMs/s':>10}")
+    with open(os.devnull, "w") as devnull:
+        for label, level, every in MODES:
+            configure(level, devnull)
+            with override_settings(FMEDA_LOG_SAMPLE_EVERY=every or 100):
+                import_ms = median_ms(run_import, runs)
+                calc_ms = median_ms(run_calculate, runs)
+            print(f"{label:<20} {import_ms:7.0f} ms {n_fms / import_ms * 1000:10.0f} "
+                  f"{calc_ms:9.0f} ms {n_fms / calc_ms * 1000:10.0f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
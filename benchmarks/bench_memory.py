@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Memory per failure mode of the FMEDA.py object model.
+
+Builds a project the way the CSV loaders do (every string comes out of the
+csv parser, so equal values are distinct objects unless the model interns
+them) and reports the traced bytes per failure mode.
+
+    python benchmarks/bench_memory.py [n_failure_modes]
+"""
+
+import csv
+import io
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from FMEDA import Project, SafetyFunction, Component, FailureMode  # noqa: E402
+
+FMS_PER_COMPONENT = 4
+EFFECTS = ["Loss of function", "Malfunction", "Overcurrent/overheating", "Loss of switching"]
+MECHANISMS = ["Watchdog", "Voltage monitor", "CRC check", "none"]
+
+
+def fm_csv(n_fm):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for i in range(n_fm):
+        writer.writerow([i // FMS_PER_COMPONENT, "Pin open circuit", 12.5, EFFECTS[i % 4],
+                         1, MECHANISMS[i % 4], 60.0, 1, MECHANISMS[(i + 1) % 4], 90.0])
+    return buf.getvalue()
+
+
+def build_project(rows):
+    project = Project("bench")
+    sf = SafetyFunction("SF1")
+    project.add_SF(sf)
+    comp = None
+    for row in rows:
+        comp_id = row[0]
+        if comp is None or comp.id != comp_id:
+            comp = Component(comp_id)
+            comp.type = "IC"
+            comp.failure_rate = 50.0
+            project.bom.append(comp)
+            sf.add_component(comp)
+        fm = FailureMode()
+        fm.description = row[1]
+        fm.Failure_rate_total = float(row[2])
+        fm.system_level_effect = row[3]
+        fm.is_SPF = int(row[4])
+        fm.set_spf_mechanism(row[5], float(row[6]))
+        fm.is_MPF = int(row[7])
+        fm.set_mpf_mechanism(row[8], float(row[9]))
+        comp.add_FM(fm)
+    return project
+
+
+def measure(n_fm):
+    text = fm_csv(n_fm)
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    project = build_project(csv.reader(io.StringIO(text)))
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return project, after - before
+
+
+def main(argv):
+    n_fm = int(argv[1]) if len(argv) > 1 else 200_000
+    project, used = measure(n_fm)
+    print(f"failure modes : {n_fm}")
+    print(f"components    : {len(project.bom)}")
+    print(f"traced memory : {used / 2**20:.1f} MiB")
+    print(f"per FM        : {used / n_fm:.0f} bytes (including its share of components)")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
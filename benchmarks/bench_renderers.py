@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Render time and bytes on the wire of a full project response.
+
+Builds a synthetic project in an in-memory SQLite database, serializes it
+once with ProjectSerializer (the /projects/<id>/ payload) and compares DRF's
+JSONRenderer with FastJSONRenderer and MessagePackRenderer, then gzip and
+brotli on the rendered JSON, and finally the whole GET request through the
+middleware stack. Renderers and codecs whose library is not installed are
+skipped.
+
+    python benchmarks/bench_renderers.py [n_failure_modes]
+"""
+
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "fmeda_backend.settings")
+os.environ["DATABASE_URL"] = "sqlite://:memory:"
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from django.utils.text import compress_string  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from fmeda import middleware, renderers  # noqa: E402
+from fmeda.tests import build_fixture_project  # noqa: E402
+from fmeda.models import Project  # noqa: E402
+from fmeda.serializers import ProjectSerializer  # noqa: E402
+
+FMS_PER_COMPONENT = 4
+N_SFS = 50
+
+
+def median_ms(func, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), result
+
+
+def row(label, ms, size, base_ms=None):
+    speedup = f"   x{base_ms / ms:5.1f}" if base_ms else ""
+    size = f"{size / 1e6:9.2f} MB" if size is not None else " " * 12
+    print(f"{label:<34} {ms:9.1f} ms {size}{speedup}")
+
+
+def main(argv):
+    n_fms = int(argv[1]) if len(argv) > 1 else 20000
+    runs = 5
+    call_command("migrate", verbosity=0)
+    project = build_fixture_project(N_SFS, max(n_fms // FMS_PER_COMPONENT, 1), FMS_PER_COMPONENT)
+    print(f"{n_fms} failure modes, {N_SFS} safety functions, median of {runs} runs\n")
+
+    ms, data = median_ms(
+        lambda: ProjectSerializer(ProjectSerializer.setup_eager_loading(Project.objects).get(pk=project.pk)).data, 1)
+    row("serialize (ProjectSerializer)", ms, None)
+
+    print("\nrender")
+    base_ms, body = median_ms(lambda: JSONRenderer().render(data), runs)
+    row("JSONRenderer (json module)", base_ms, len(body))
+    if renderers.orjson is not None:
+        ms, fast = median_ms(lambda: renderers.FastJSONRenderer().render(data), runs)
+        row("FastJSONRenderer (orjson)", ms, len(fast), base_ms)
+        # Floats may be spelled differently (1e-9 vs 1e-09), the values match
+        assert json.loads(fast) == json.loads(body), "FastJSONRenderer output differs"
+    if renderers.MessagePackRenderer.available:
+        ms, packed = median_ms(lambda: renderers.MessagePackRenderer().render(data), runs)
+        row("MessagePackRenderer", ms, len(packed), base_ms)
+
+    print("\ncompress the JSON body")
+    ms, gz = median_ms(lambda: compress_string(body, max_random_bytes=100), runs)
+    row("gzip (level 6)", ms, len(gz))
+    if middleware.brotli is not None:
+        ms, br = median_ms(lambda: middleware.brotli.compress(body, quality=middleware.BROTLI_QUALITY), runs)
+        row(f"brotli (quality {middleware.BROTLI_QUALITY})", ms, len(br))
+
+    print("\nGET /projects/<id>/ end to end")
+    client = APIClient()
+    cases = [("identity", {}), ("gzip", {"HTTP_ACCEPT_ENCODING": "gzip"})]
+    if middleware.brotli is not None:
+        cases.append(("br", {"HTTP_ACCEPT_ENCODING": "br, gzip"}))
+    if renderers.MessagePackRenderer.available:
+        cases.append(("msgpack + gzip", {"HTTP_ACCEPT": "application/msgpack", "HTTP_ACCEPT_ENCODING": "gzip"}))
+    with override_settings(ALLOWED_HOSTS=["testserver"]):
+        for label, headers in cases:
+            ms, response = median_ms(lambda: client.get(f"/projects/{project.pk}/", **headers), runs)
+            assert response.status_code == 200, response.status_code
+            row(f"{label} ({response.get('Content-Encoding', 'identity')})", ms, len(response.content))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
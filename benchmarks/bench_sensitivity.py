@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Scenarios per second of fmeda_sensitivity.Sweep on synthetic projects.
+
+Every size sweeps the DC of three safety mechanisms (each used by about a
+fifth of the failure modes) over --steps values, i.e. steps**3 scenarios,
+and checks a few scenarios against Project.evaluate_metrics on an edited
+copy of the project.
+
+    python benchmarks/bench_sensitivity.py
+    python benchmarks/bench_sensitivity.py --sizes 1000,100000 --steps 30
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+
+from fmeda_io import read_project_csv  # noqa: E402
+from fmeda_sensitivity import RESULT_FIELDS, Sweep  # noqa: E402
+from synthetic import write_project  # noqa: E402
+
+MECHANISMS = ["Watchdog", "Voltage monitor", "CRC check"]
+
+
+def check(csv_text, result, scenario):
+    """Largest relative difference between one scenario and the object model."""
+    project = read_project_csv(io.StringIO(csv_text))
+    dcs = dict(zip(result.parameters, result.values[scenario].tolist()))
+    for comp in project.bom:
+        for fm in comp.failure_modes:
+            if fm.SPF_safety_mechanism in dcs:
+                fm.set_spf_mechanism(fm.SPF_safety_mechanism, dcs[fm.SPF_safety_mechanism])
+            if fm.MPF_safety_mechanism in dcs:
+                fm.set_mpf_mechanism(fm.MPF_safety_mechanism, dcs[fm.MPF_safety_mechanism])
+    project.evaluate_metrics(project.lifetime)
+    worst = 0.0
+    for s, sf in enumerate(project.SF_list):
+        for name in RESULT_FIELDS:
+            expected, got = getattr(sf, name), getattr(result, name)[scenario, s]
+            worst = max(worst, abs(expected - got) / max(abs(expected), 1e-12))
+    return worst
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Time DC sweeps with fmeda_sensitivity.")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        type=lambda text: [int(size) for size in text.split(",")],
+                        help="failure mode counts, comma separated")
+    parser.add_argument("--steps", type=int, default=20, help="values per mechanism")
+    args = parser.parse_args(argv[1:])
+
+    print(f"{'FMs':>8} {'SFs':>5} {'scenarios':>10} {'setup ms':>10} {'sweep ms':>10} {'scenarios/s':>12} {'max rel err':>12}")
+    for n_fms in args.sizes:
+        out = io.StringIO()
+        n_sfs = max(10, n_fms // 1000)
+        write_project(out, n_sfs=n_sfs, n_components=max(1, n_fms // 4), fms_per_component=4, seed=n_fms)
+        csv_text = out.getvalue()
+        project = read_project_csv(io.StringIO(csv_text))
+
+        start = time.perf_counter()
+        sweep = Sweep(project)
+        for mechanism in MECHANISMS:
+            sweep.vary_mechanism(mechanism, np.linspace(0, 99, args.steps))
+        setup = time.perf_counter() - start
+        start = time.perf_counter()
+        result = sweep.run()
+        elapsed = time.perf_counter() - start
+
+        worst = max(check(csv_text, result, i) for i in random.Random(n_fms).sample(range(len(sweep)), 3))
+        print(f"{n_fms:>8} {n_sfs:>5} {len(sweep):>10} {setup * 1000:>10.1f} {elapsed * 1000:>10.1f} "
+              f"{len(sweep) / elapsed:>12.0f} {worst:>12.1e}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite over synthetic projects of growing size.
+
+For each size (number of failure modes) a project is generated with
+benchmarks/synthetic.py and timed through:
+
+    desktop.*   fmeda_io.read_project_csv, Project.evaluate_metrics (objects)
+                and fmeda_engine.evaluate_project (vectorized)
+    backend.*   CSV import and export, and calculate_project_metrics with
+                every engine ("orm" runs calculate_fmeda_metrics per SF)
+    api.*       the main endpoints through the Django test client, with the
+                query counts reported by InstrumentationMiddleware
+
+Results (median seconds of --runs) are written as JSON to --output, by
+default benchmarks/results/<date>-<commit>.json, together with the commit,
+Python and database used. --compare prints the change against an earlier
+file and flags steps that got slower than --threshold.
+
+The backend uses an in-memory SQLite database unless DATABASE_URL is set.
+
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --sizes 1000,10000 --runs 3 --compare benchmarks/results/old.json
+    python benchmarks/bench_suite.py --compare old.json new.json    # compare only
+"""
+
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "fmeda_backend.settings")
+os.environ.setdefault("DATABASE_URL", "sqlite://:memory:")
+os.environ.setdefault("FMEDA_LOG_LEVEL", "WARNING")
+os.environ.setdefault("FMEDA_JOB_WORKERS", "0")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from fmeda.csv_io import import_project_csv, iter_project_csv  # noqa: E402
+from fmeda.models import Project  # noqa: E402
+from fmeda.utils import CALCULATION_ENGINES, calculate_project_metrics  # noqa: E402
+from fmeda_engine import evaluate_project  # noqa: E402
+from fmeda_io import read_project_csv  # noqa: E402
+from synthetic import write_project  # noqa: E402
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+FMS_PER_COMPONENT = 4
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def project_shape(n_fms):
+    """Synthetic project parameters for about ``n_fms`` failure modes."""
+    return {"n_sfs": max(10, n_fms // 1000), "n_components": max(1, n_fms // FMS_PER_COMPONENT),
+            "fms_per_component": FMS_PER_COMPONENT, "fanout": 2.0, "seed": n_fms}
+
+
+def timed(func, runs, setup=None):
+    """Median seconds of ``runs`` calls and the last result."""
+    times, result = [], None
+    for _ in range(runs):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def server_queries(response):
+    match = re.search(r'desc="(\d+) queries"', response.get("Server-Timing", ""))
+    return int(match.group(1)) if match else None
+
+
+def bench_desktop(csv_text, runs):
+    timings = {}
+    timings["desktop.read_csv"], project = timed(lambda: read_project_csv(io.StringIO(csv_text)), runs)
+    timings["desktop.evaluate_objects"], _ = timed(lambda: project.evaluate_metrics(project.lifetime), runs)
+    timings["desktop.evaluate_vectorized"], _ = timed(lambda: evaluate_project(project, project.lifetime), runs)
+    return timings
+
+
+def bench_backend(csv_bytes, runs):
+    timings = {}
+    imported = []
+
+    def run_import():
+        project, _ = import_project_csv(io.BytesIO(csv_bytes))
+        imported.append(project)
+        return project
+
+    timings["backend.import_csv"], project = timed(run_import, runs)
+    for other in imported[:-1]:
+        Project.objects.filter(pk=other.pk).delete()
+    for engine in CALCULATION_ENGINES:
+        timings[f"backend.calculate.{engine}"], _ = timed(lambda: calculate_project_metrics(project, engine), runs)
+    timings["backend.export_csv"], _ = timed(lambda: sum(len(line) for line in iter_project_csv(project)), runs)
+    return timings, project
+
+
+def bench_api(project, csv_bytes, runs):
+    client = APIClient()
+    timings, queries = {}, {}
+
+    def request(name, method, path, **kwargs):
+        def call():
+            response = getattr(client, method)(path, **kwargs)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            assert response.status_code < 400, (path, response.status_code)
+            return response
+        timings[f"api.{name}"], response = timed(call, runs)
+        queries[f"api.{name}"] = server_queries(response)
+        return response
+
+    with override_settings(ALLOWED_HOSTS=["testserver"]):
+        request("project_detail", "get", f"/projects/{project.pk}/")
+        request("component_list", "get", f"/components/?project={project.pk}")
+        request("failure_mode_list", "get", f"/failure-modes/?project={project.pk}")
+        request("calculate", "post", "/fmeda/calculate/", data={"project": project.pk}, format="json")
+        request("results", "get", f"/fmeda/results/{project.pk}/")
+        request("export_csv", "get", f"/projects/{project.pk}/export-csv/")
+        upload = io.BytesIO(csv_bytes)
+        upload.name = "synthetic.csv"
+
+        def rewind():
+            upload.seek(0)
+        timings["api.import_csv"], response = timed(
+            lambda: client.post("/projects/import-csv/", {"file": upload}, format="multipart"), runs, setup=rewind)
+        assert response.status_code == 201, response.status_code
+        queries["api.import_csv"] = server_queries(response)
+    return timings, queries
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes, runs):
+    call_command("migrate", verbosity=0)
+    report = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": connection.vendor,
+        "runs": runs,
+        "sizes": {},
+    }
+    for n_fms in sizes:
+        shape = project_shape(n_fms)
+        out = io.StringIO()
+        write_project(out, **shape)
+        csv_text = out.getvalue()
+        csv_bytes = csv_text.encode()
+
+        print(f"{n_fms} failure modes ...", flush=True)
+        timings = bench_desktop(csv_text, runs)
+        backend, project = bench_backend(csv_bytes, runs)
+        timings.update(backend)
+        api, queries = bench_api(project, csv_bytes, runs)
+        timings.update(api)
+        Project.objects.all().delete()
+
+        report["sizes"][str(n_fms)] = {
+            "shape": shape,
+            "csv_bytes": len(csv_bytes),
+            "seconds": {name: round(seconds, 6) for name, seconds in timings.items()},
+            "queries": queries,
+        }
+        for name, seconds in timings.items():
+            suffix = f"  ({queries[name]} queries)" if queries.get(name) is not None else ""
+            print(f"  {name:<32} {seconds * 1000:10.1f} ms{suffix}")
+    return report
+
+
+def compare(old, new, threshold):
+    """Print the change of every step present in both reports, return the regressions."""
+    regressions = []
+    print(f"\n{old.get('commit')} ({old.get('created')}) -> {new.get('commit')} ({new.get('created')})")
+    for size, entry in new["sizes"].items():
+        before = old["sizes"].get(size)
+        if before is None:
+            continue
+        print(f"{size} failure modes")
+        for name, seconds in entry["seconds"].items():
+            if name not in before["seconds"]:
+                continue
+            ratio = seconds / before["seconds"][name] if before["seconds"][name] else float("inf")
+            flag = "  SLOWER" if ratio > threshold else ""
+            if flag:
+                regressions.append((size, name, ratio))
+            print(f"  {name:<32} {before['seconds'][name] * 1000:10.1f} -> {seconds * 1000:10.1f} ms"
+                  f"  x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Time the FMEDA engines, CSV I/O and API on synthetic projects.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        type=lambda text: [int(size) for size in text.split(",")],
+                        help="failure mode counts, comma separated")
+    parser.add_argument("--runs", type=int, default=1, help="runs per step, the median is kept")
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/<date>-<commit>.json)")
+    parser.add_argument("--compare", nargs="+", metavar="JSON",
+                        help="earlier results to compare with; with two files only compare them")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="flag steps more than this many times slower (default 1.2)")
+    args = parser.parse_args(argv[1:])
+
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[0]) as f_old, open(args.compare[1]) as f_new:
+            regressions = compare(json.load(f_old), json.load(f_new), args.threshold)
+        return 1 if regressions else 0
+
+    report = run_suite(args.sizes, args.runs)
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{report['commit'] or 'nogit'}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+    print(f"\nwrote {output}")
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            return 1 if compare(json.load(f), report, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
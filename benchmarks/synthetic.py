@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic FMEDA projects in the single-CSV format.
+
+Writes projects of any size that load in the GUI, fmeda_cli.py and the
+backend import. The shape is chosen with the number of safety functions,
+components and failure modes per component, the SF fan-out (SFs each
+safety related component is linked to, fractional values are a mean) and
+the diagnostic coverage distribution. Component failure rates depend on the
+component type and are split over its failure modes, so the totals look
+like a real BOM. The same seed gives the same file.
+
+    python benchmarks/synthetic.py big.csv --sfs 50 --components 25000 --fms-per-component 4
+    python benchmarks/synthetic.py big.csv --components 2500 --fanout 1.5 --dc 0:0.2,90:0.5,99:0.3
+"""
+
+import argparse
+import csv
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from fmeda_io import CSV_COLUMNS  # noqa: E402
+
+# type -> (base failure rate in FIT, failure mode descriptions)
+COMPONENT_TYPES = {
+    "Resistor": (0.5, ["Open circuit", "Short circuit", "Drift"]),
+    "Capacitor": (1.0, ["Short circuit", "Open circuit", "Capacitance drift"]),
+    "MOSFET": (10.0, ["Drain-source short", "Gate open", "Stuck off", "Increased Rds(on)"]),
+    "Diode": (2.0, ["Short circuit", "Open circuit", "Increased leakage"]),
+    "Microcontroller": (150.0, ["Stuck output", "Wrong output value", "Clock failure", "Memory corruption"]),
+    "Voltage regulator": (30.0, ["Output over voltage", "Output under voltage", "Oscillation", "No output"]),
+    "Connector": (5.0, ["Open contact", "Short to adjacent pin"]),
+    "Crystal": (8.0, ["No oscillation", "Frequency drift"]),
+}
+EFFECTS = ["Loss of function", "Unintended activation", "Degraded function", "No effect"]
+MECHANISMS = ["Watchdog", "Voltage monitor", "CRC check", "Plausibility check", "Redundant channel"]
+INTEGRITY_LEVELS = ["ASIL A", "ASIL B", "ASIL C", "ASIL D"]
+
+# diagnostic coverage (%) -> share of failure modes, the usual low/medium/high
+# levels of ISO 26262-5 plus undetected ones
+DEFAULT_DC_WEIGHTS = {0.0: 0.15, 60.0: 0.3, 90.0: 0.35, 99.0: 0.2}
+
+
+def project_rows(n_sfs, n_components, fms_per_component, fanout=2.0, dc_weights=None,
+                 unrelated=0.1, spf=0.7, mpf=0.8, lifetime=20000.0, seed=0, name=None):
+    """Yield the CSV rows (dicts keyed by CSV_COLUMNS) of one synthetic project.
+
+    ``unrelated`` is the share of components without SF links, ``spf`` and
+    ``mpf`` the shares of failure modes flagged single- and multi-point.
+    """
+    rng = random.Random(seed)
+    dc_weights = dc_weights or DEFAULT_DC_WEIGHTS
+    dc_levels, dc_shares = list(dc_weights), list(dc_weights.values())
+    types = list(COMPONENT_TYPES)
+
+    def coverage():
+        dc = rng.choices(dc_levels, dc_shares)[0]
+        return (rng.choice(MECHANISMS) if dc else ""), dc
+
+    yield {"section": "project", "lifetime": lifetime,
+           "name": name or f"synthetic {n_sfs}x{n_components}x{fms_per_component}"}
+    sf_ids = [f"SF{i + 1}" for i in range(n_sfs)]
+    for i, sf_id in enumerate(sf_ids):
+        yield {"section": "sf", "id": sf_id, "description": f"Safety function {i + 1}",
+               "target_integrity_level": rng.choice(INTEGRITY_LEVELS)}
+
+    components = []
+    for i in range(n_components):
+        comp_type = rng.choice(types)
+        failure_rate = round(COMPONENT_TYPES[comp_type][0] * rng.lognormvariate(0.0, 0.5), 4)
+        related = []
+        if sf_ids and rng.random() >= unrelated:
+            count = int(fanout) + (rng.random() < fanout - int(fanout))
+            related = rng.sample(sf_ids, min(max(count, 1), len(sf_ids)))
+        components.append((f"C{i + 1}", comp_type, failure_rate))
+        yield {"section": "component", "id": f"C{i + 1}", "type": comp_type, "failure_rate": failure_rate,
+               "related_sf_ids": ",".join(related), "is_safety_related": bool(related)}
+
+    for comp_id, comp_type, failure_rate in components:
+        descriptions = COMPONENT_TYPES[comp_type][1]
+        shares = [rng.random() + 0.1 for _ in range(fms_per_component)]
+        total = sum(shares)
+        for j, share in enumerate(shares):
+            spf_mechanism, spf_dc = coverage()
+            mpf_mechanism, mpf_dc = coverage()
+            yield {"section": "fm", "component_id": comp_id,
+                   "description": descriptions[j % len(descriptions)] + (f" {j + 1}" if j >= len(descriptions) else ""),
+                   "Failure_rate_total": round(failure_rate * share / total, 6),
+                   "system_level_effect": rng.choice(EFFECTS),
+                   "is_SPF": int(rng.random() < spf), "SPF_safety_mechanism": spf_mechanism,
+                   "SPF_diagnostic_coverage": spf_dc,
+                   "is_MPF": int(rng.random() < mpf), "MPF_safety_mechanism": mpf_mechanism,
+                   "MPF_diagnostic_coverage": mpf_dc}
+
+
+def write_project(target, **params):
+    """Write a synthetic project (see project_rows) to a path or text file."""
+    if isinstance(target, str):
+        with open(target, "w", newline="", encoding="utf-8") as f:
+            return write_project(f, **params)
+    writer = csv.DictWriter(target, fieldnames=CSV_COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(project_rows(**params))
+
+
+def parse_dc_weights(text):
+    """``"0:0.2,90:0.5,99:0.3"`` -> ``{0.0: 0.2, 90.0: 0.5, 99.0: 0.3}``."""
+    weights = {}
+    for part in text.split(","):
+        dc, _, share = part.partition(":")
+        weights[float(dc)] = float(share or 1)
+    return weights
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Write a synthetic FMEDA project CSV.")
+    parser.add_argument("output")
+    parser.add_argument("--sfs", type=int, default=20)
+    parser.add_argument("--components", type=int, default=250)
+    parser.add_argument("--fms-per-component", type=int, default=4)
+    parser.add_argument("--fanout", type=float, default=2.0, help="SFs per safety related component (mean)")
+    parser.add_argument("--dc", type=parse_dc_weights, default=None,
+                        help="diagnostic coverage distribution, e.g. 0:0.15,60:0.3,90:0.35,99:0.2")
+    parser.add_argument("--unrelated", type=float, default=0.1, help="share of components without SF links")
+    parser.add_argument("--lifetime", type=float, default=20000.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv[1:])
+    write_project(args.output, n_sfs=args.sfs, n_components=args.components,
+                  fms_per_component=args.fms_per_component, fanout=args.fanout, dc_weights=args.dc,
+                  unrelated=args.unrelated, lifetime=args.lifetime, seed=args.seed)
+    print(f"{args.output}: {args.sfs} SFs, {args.components} components, "
+          f"{args.components * args.fms_per_component} failure modes")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
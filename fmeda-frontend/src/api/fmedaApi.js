@@ -262,10 +262,10 @@ export const exportProject = async (projectId) => {
   }
 };
 
-// Clear all data
+// Delete every project (explicit reset, never part of another flow)
 export const clearAllData = async () => {
   try {
-    const response = await apiClient.get(`/projects/clear-all/`);
+    const response = await apiClient.post(`/projects/clear-all/`);
     return response.data;
   } catch (error) {
     throw error;
@@ -26,16 +26,7 @@ export default function Home({ currentProject, setCurrentProject, clearProjectDa
     setError("");
 
     try {
-      // First, clear all existing data automatically
-      console.log("Automatically clearing all existing data...");
-      try {
-        await clearAllData();
-        console.log("All data cleared successfully");
-      } catch (clearError) {
-        console.log("Failed to clear data, but continuing...", clearError);
-      }
-      
-      // Clear any existing project data
+      // Other projects stay on the server, only the local state is reset
       clearProjectData();
       
       const project = await createProject({ name: newProjectName.trim() });
@@ -0,0 +1,26 @@
+import os
+import sys
+
+from django.apps import AppConfig
+
+
+def serves_requests():
+    """Whether this process is a web server, not a management command other than runserver."""
+    program = os.path.basename(sys.argv[0]) if sys.argv else ''
+    if program in ('manage.py', 'django-admin', '__main__.py'):
+        return sys.argv[1:2] == ['runserver']
+    return True
+
+
+class FmedaConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'fmeda'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if serves_requests():
+            # Not here: the database should not be used while apps load
+            from django.core.signals import request_started
+            from .jobs import start_workers_on_first_request
+            request_started.connect(start_workers_on_first_request)
@@ -0,0 +1,69 @@
+"""
+Coalescing of follow-up work triggered by model changes.
+
+A ``CommitBatch`` collects ids (projects, components, SFs...) while rows are
+being written and hands them to its handler once: when the surrounding
+transaction commits, at the end of a ``hold()`` block (e.g. one HTTP
+request), or right away when neither is active.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+def _merge(target, ids):
+    for name, values in ids.items():
+        target.setdefault(name, set()).update(values)
+
+
+class _Pending:
+    def __init__(self, batch):
+        self.batch = batch
+        self.ids = {}
+
+    def flush(self):
+        local = self.batch._local
+        if getattr(local, 'pending', None) is self:
+            local.pending = None
+        self.batch.handler(**self.ids)
+
+
+class CommitBatch:
+    """Call ``handler(**{name: set_of_ids})`` once per transaction or hold() block."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self._local = threading.local()
+
+    def add(self, **ids):
+        local = self._local
+        held = getattr(local, 'held', None)
+        if held is not None:
+            _merge(held, ids)
+            return
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            self.handler(**{name: set(values) for name, values in ids.items()})
+            return
+        pending = getattr(local, 'pending', None)
+        # A rolled back transaction drops its on_commit callbacks; start over then
+        if pending is None or not any(func == pending.flush for _, func, _ in connection.run_on_commit):
+            pending = local.pending = _Pending(self)
+            transaction.on_commit(pending.flush)
+        _merge(pending.ids, ids)
+
+    @contextmanager
+    def hold(self):
+        """Collect everything added inside the block and handle it once at the end."""
+        local = self._local
+        if getattr(local, 'held', None) is not None:
+            yield  # already held by an outer block
+            return
+        local.held = {}
+        try:
+            yield
+        finally:
+            held, local.held = local.held, None
+            if held:
+                self.add(**held)
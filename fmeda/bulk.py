@@ -0,0 +1,234 @@
+"""
+List-based bulk endpoints for the model viewsets.
+
+``BulkWriteMixin`` adds ``/<resource>/bulk/`` to a ModelViewSet:
+
+    POST   [{...}, {...}]          create every row
+    PATCH  [{"id": 1, ...}, ...]   partially update every row
+    DELETE {"ids": [1, 2, ...]}    delete every row
+
+All rows are validated before anything is written; if one row is invalid
+nothing is saved and the response lists the errors per row. Valid requests
+are written with bulk_create/bulk_update in one transaction. Add
+``?recalculate=true`` (and optionally ``&engine=...``) to recalculate each
+touched project once at the end.
+"""
+from django.conf import settings
+from django.db import transaction
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .models import Project
+from .serializers import BulkPrimaryKeyRelatedField
+from .utils import CALCULATION_ENGINES, calculate_project_metrics
+from .versioning import bump_data_version
+
+BULK_MAX_ROWS = 5000
+BULK_BATCH_SIZE = 500
+
+
+def truthy(value):
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class BulkWriteMixin:
+    bulk_max_rows = BULK_MAX_ROWS
+    # Fields always written by bulk_update() on top of the validated ones
+    bulk_update_fields = ()
+
+    # Hooks for the viewsets
+    def prepare_bulk_instance(self, instance, row):
+        """Adjust an instance built from a validated row before it is written."""
+
+    def after_bulk_write(self, instances, rows):
+        """Write what bulk_create/bulk_update cannot (e.g. M2M links)."""
+
+    def bulk_project_ids(self, instances):
+        """Ids of the projects the written or deleted instances belong to."""
+        return set()
+
+    def schedule_bulk_recalculation(self, instances):
+        """Queue targeted recalculation (FMEDA_AUTO_RECALCULATE) for the instances."""
+
+    def bulk_related_objects(self, rows):
+        """Extra ``{name: {pk: obj}}`` lookups the row checks need, loaded at once."""
+        return {}
+
+    def validate_bulk_row(self, row, instance, related_objects):
+        """Extra per-row checks, return an errors dict (empty when valid)."""
+        return {}
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        engine = request.query_params.get('engine') or settings.FMEDA_CALCULATION_ENGINE
+        if engine not in CALCULATION_ENGINES:
+            return Response({'detail': f'Unknown engine {engine!r}, expected one of {list(CALCULATION_ENGINES)}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if request.method == 'DELETE':
+            rows = request.data.get('ids') if isinstance(request.data, dict) else request.data
+        else:
+            rows = request.data
+        if not isinstance(rows, list):
+            return Response({'detail': 'Expected a list.'}, status=status.HTTP_400_BAD_REQUEST)
+        if request.method == 'DELETE' and not all(_is_id(pk) for pk in rows):
+            return Response({'detail': 'Expected a list of integer ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.bulk_max_rows:
+            return Response({'detail': f'At most {self.bulk_max_rows} rows per request.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            if request.method == 'POST':
+                results, project_ids = self._bulk_create(rows)
+            elif request.method == 'PATCH':
+                results, project_ids = self._bulk_update(rows)
+            else:
+                results, project_ids = self._bulk_delete(rows)
+            if project_ids is None:
+                return Response({'results': results}, status=status.HTTP_400_BAD_REQUEST)
+            # bulk_create()/bulk_update() and FM deletes send no signals
+            bump_data_version(project_ids=project_ids)
+
+            data = {'results': results}
+            if truthy(request.query_params.get('recalculate')):
+                for project in Project.objects.filter(id__in=project_ids):
+                    calculate_project_metrics(project, engine)
+                data['recalculated_projects'] = sorted(project_ids)
+
+        code = status.HTTP_201_CREATED if request.method == 'POST' else status.HTTP_200_OK
+        return Response(data, status=code)
+
+    def _related_objects(self, rows):
+        """Load every pk referenced by the rows' FK fields with one query per field."""
+        related = {}
+        for name, field in self.get_serializer().fields.items():
+            if not isinstance(field, BulkPrimaryKeyRelatedField) or field.read_only:
+                continue
+            pks = {row[name] for row in rows if isinstance(row, dict) and _is_id(row.get(name))}
+            related[name] = field.get_queryset().in_bulk(pks) if pks else {}
+        related.update(self.bulk_related_objects(rows))
+        return related
+
+    def _validate_rows(self, rows, instances=None):
+        related_objects = self._related_objects(rows)
+        context = {**self.get_serializer_context(), 'related_objects': related_objects}
+        serializer_class = self.get_serializer_class()
+        results = []
+        validated = []
+        for index, row in enumerate(rows):
+            if not isinstance(row, dict):
+                results.append({'index': index, 'status': 'error', 'errors': {'detail': 'Expected an object.'}})
+                continue
+            instance = None
+            if instances is not None:
+                instance = instances.get(row['id']) if _is_id(row.get('id')) else None
+                if instance is None:
+                    results.append({'index': index, 'status': 'error', 'errors': {'id': 'Not found.'}})
+                    continue
+            serializer = serializer_class(instance, data=row, partial=instance is not None, context=context)
+            errors = {} if serializer.is_valid() else dict(serializer.errors)
+            errors.update(self.validate_bulk_row(row, instance, related_objects))
+            if errors:
+                results.append({'index': index, 'status': 'error', 'errors': errors})
+            else:
+                results.append({'index': index, 'status': 'valid'})
+                validated.append((index, serializer, row))
+        for index, errors in self._unique_together_errors(validated).items():
+            results[index] = {'index': index, 'status': 'error', 'errors': errors}
+        return results, validated, all(result['status'] == 'valid' for result in results)
+
+    def _unique_together_errors(self, validated):
+        """Check the model's unique_together sets for all rows with one query each.
+
+        Catches clashes with stored rows as well as between the rows of the
+        request. Returns ``{row index: errors}``.
+        """
+        model = self.get_queryset().model
+        errors = {}
+        for fields in model._meta.unique_together:
+            keys = {}
+            for index, serializer, row in validated:
+                values = []
+                for name in fields:
+                    if name in serializer.validated_data:
+                        value = serializer.validated_data[name]
+                    else:
+                        value = getattr(serializer.instance, name, None)
+                    values.append(getattr(value, 'pk', value))
+                keys.setdefault(tuple(values), []).append((index, serializer))
+            lookup = {f'{name}__in': {key[i] for key in keys} for i, name in enumerate(fields)}
+            existing = {}
+            for pk, *values in model.objects.filter(**lookup).values_list('pk', *fields).iterator():
+                existing[tuple(values)] = pk
+            message = f'The fields {", ".join(fields)} must make a unique set.'
+            for key, entries in keys.items():
+                own_pks = {serializer.instance.pk for _, serializer in entries if serializer.instance is not None}
+                clashes = len(entries) > 1 or (key in existing and existing[key] not in own_pks)
+                if clashes:
+                    for index, _ in entries:
+                        errors[index] = {'non_field_errors': [message]}
+        return errors
+
+    def _bulk_create(self, rows):
+        """Return the per-row results and the touched project ids (None if invalid)."""
+        results, validated, ok = self._validate_rows(rows)
+        if not ok:
+            return results, None
+        model = self.get_queryset().model
+        instances = []
+        for _, serializer, row in validated:
+            instance = model(**serializer.validated_data)
+            self.prepare_bulk_instance(instance, row)
+            instances.append(instance)
+        instances = model.objects.bulk_create(instances, batch_size=BULK_BATCH_SIZE)
+        self.after_bulk_write(instances, [row for _, _, row in validated])
+        self.schedule_bulk_recalculation(instances)
+        for result, instance in zip(results, instances):
+            result.update(status='created', id=instance.pk)
+        return results, self.bulk_project_ids(instances)
+
+    def _bulk_update(self, rows):
+        model = self.get_queryset().model
+        ids = [row['id'] for row in rows if isinstance(row, dict) and _is_id(row.get('id'))]
+        results, validated, ok = self._validate_rows(rows, model.objects.in_bulk(ids))
+        if not ok:
+            return results, None
+        instances = []
+        fields = set()
+        for _, serializer, row in validated:
+            instance = serializer.instance
+            for attr, value in serializer.validated_data.items():
+                setattr(instance, attr, value)
+                fields.add(attr)
+            self.prepare_bulk_instance(instance, row)
+            instances.append(instance)
+        fields.update(self.bulk_update_fields)
+        # bulk_update() skips Model.save(), so stamp auto_now fields here
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                for instance in instances:
+                    field.pre_save(instance, add=False)
+                fields.add(field.name)
+        if fields:
+            model.objects.bulk_update(instances, sorted(fields), batch_size=BULK_BATCH_SIZE)
+        self.after_bulk_write(instances, [row for _, _, row in validated])
+        self.schedule_bulk_recalculation(instances)
+        for result, instance in zip(results, instances):
+            result.update(status='updated', id=instance.pk)
+        return results, self.bulk_project_ids(instances)
+
+    def _bulk_delete(self, ids):
+        model = self.get_queryset().model
+        instances = model.objects.in_bulk(ids)
+        results = [
+            {'index': index, 'id': pk, 'status': 'deleted' if pk in instances else 'not_found'}
+            for index, pk in enumerate(ids)
+        ]
+        project_ids = self.bulk_project_ids(list(instances.values()))
+        self.schedule_bulk_recalculation(list(instances.values()))
+        model.objects.filter(pk__in=list(instances)).delete()
+        return results, project_ids
@@ -0,0 +1,297 @@
+"""
+Streaming project CSV import and export.
+
+Reads the single-CSV project format (the one written by the desktop GUI and
+by ProjectExportCSVView) row by row and inserts SFs, components, failure
+modes and the SF <-> component links with chunked bulk_create calls, and
+writes it back out one line at a time straight from the database.
+"""
+import csv
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from fmeda_io import CSV_COLUMNS, flag_value, float_value, normalize_id, text_value
+
+from .locks import project_lock
+from .logs import RowSampler
+from .models import Project, SafetyFunction, Component, FailureMode
+from .utils import calculate_project_metrics, compute_failure_mode_metrics
+
+IMPORT_CHUNK_SIZE = 2000
+EXPORT_CHUNK_SIZE = 2000
+
+ComponentSafetyFunction = Component.related_sfs.through
+
+logger = logging.getLogger(__name__)
+
+
+def _bool(value):
+    return value.strip().lower() in ('1', '1.0', 'true', 'yes')
+
+
+def decoded_lines(file_obj):
+    """Yield the lines of an uploaded (binary) file as text."""
+    for i, line in enumerate(file_obj):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8-sig' if i == 0 else 'utf-8')
+        yield line
+
+
+class ProjectCSVImporter:
+    """Create one project from CSV rows, ``chunk_size`` rows per INSERT.
+
+    FM metrics are computed before the insert, so no row is saved twice.
+    Rows may reference components or SFs defined further down the file;
+    those are resolved when the importer finishes.
+    """
+
+    def __init__(self, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.project = None
+        self.sf_pks = {}
+        self.comp_pks = {}
+        self.pending_sfs = []
+        self.pending_components = []
+        self.pending_fms = []
+        self.deferred_fms = []
+        self.links = []
+        self.skipped_fms = 0
+        self.sample_row = RowSampler(logger)
+
+    def run(self, rows):
+        """Import ``rows`` (dicts keyed by column name) in one transaction."""
+        with transaction.atomic():
+            for row in rows:
+                self.add_row(row)
+            return self.finish()
+
+    def add_row(self, row):
+        section = text_value(row, 'section')
+        if self.sample_row():
+            logger.debug('import row section=%s id=%s component=%s', section, row.get('id'), row.get('component_id'))
+        if section == 'project':
+            self.add_project(row)
+        elif self.project is None:
+            if section in ('sf', 'component', 'fm'):
+                raise ValueError("the 'project' row must come before the other sections")
+        elif section == 'sf':
+            self.add_sf(row)
+        elif section == 'component':
+            self.add_component(row)
+        elif section == 'fm':
+            self.add_fm(row)
+
+    def add_project(self, row):
+        if self.project is not None:
+            return
+        self.project = Project.objects.create(name=text_value(row, 'name'), lifetime=float_value(row, 'lifetime'))
+
+    def add_sf(self, row):
+        sf_id = normalize_id(row.get('id'))
+        if sf_id in self.sf_pks:
+            return  # Skip duplicates
+        self.sf_pks[sf_id] = None
+        self.pending_sfs.append(SafetyFunction(
+            project=self.project,
+            sf_id=sf_id,
+            description=text_value(row, 'description'),
+            target_integrity_level=text_value(row, 'target_integrity_level'),
+        ))
+        if len(self.pending_sfs) >= self.chunk_size:
+            self.flush_sfs()
+
+    def add_component(self, row):
+        comp_id = normalize_id(row.get('id'))
+        if comp_id in self.comp_pks:
+            return  # Skip duplicates
+        related_sf_ids = [normalize_id(s) for s in text_value(row, 'related_sf_ids').split(',') if normalize_id(s)]
+        # Safety related if linked to an SF, otherwise use the explicit column
+        if related_sf_ids:
+            is_safety_related = True
+        else:
+            is_safety_related = _bool(text_value(row, 'is_safety_related'))
+        self.comp_pks[comp_id] = None
+        self.links.extend((comp_id, sf_id) for sf_id in related_sf_ids)
+        self.pending_components.append(Component(
+            project=self.project,
+            comp_id=comp_id,
+            type=text_value(row, 'type'),
+            failure_rate=float_value(row, 'failure_rate'),
+            is_safety_related=is_safety_related,
+        ))
+        if len(self.pending_components) >= self.chunk_size:
+            self.flush_components()
+
+    def add_fm(self, row):
+        comp_id = normalize_id(row.get('component_id'))
+        if comp_id not in self.comp_pks:
+            self.deferred_fms.append(row)
+            return
+        if self.comp_pks[comp_id] is None:
+            self.flush_components()
+        fm = compute_failure_mode_metrics(FailureMode(
+            component_id=self.comp_pks[comp_id],
+            description=text_value(row, 'description'),
+            Failure_rate_total=float_value(row, 'Failure_rate_total'),
+            system_level_effect=text_value(row, 'system_level_effect'),
+            is_SPF=flag_value(row, 'is_SPF'),
+            is_MPF=flag_value(row, 'is_MPF'),
+            SPF_safety_mechanism=text_value(row, 'SPF_safety_mechanism'),
+            SPF_diagnostic_coverage=float_value(row, 'SPF_diagnostic_coverage'),
+            MPF_safety_mechanism=text_value(row, 'MPF_safety_mechanism'),
+            MPF_diagnostic_coverage=float_value(row, 'MPF_diagnostic_coverage'),
+        ))
+        self.pending_fms.append(fm)
+        if len(self.pending_fms) >= self.chunk_size:
+            self.flush_fms()
+
+    def flush_sfs(self):
+        created = SafetyFunction.objects.bulk_create(self.pending_sfs, batch_size=self.chunk_size)
+        self._record_pks(created, 'sf_id', self.sf_pks, self.project.safety_functions)
+        self.pending_sfs = []
+
+    def flush_components(self):
+        created = Component.objects.bulk_create(self.pending_components, batch_size=self.chunk_size)
+        self._record_pks(created, 'comp_id', self.comp_pks, self.project.components)
+        self.pending_components = []
+
+    def flush_fms(self):
+        FailureMode.objects.bulk_create(self.pending_fms, batch_size=self.chunk_size)
+        self.pending_fms = []
+
+    def _record_pks(self, created, key, pks, queryset):
+        if created and created[0].pk is None:
+            # Backends that cannot return ids from a bulk insert
+            keys = [getattr(obj, key) for obj in created]
+            pks.update(queryset.filter(**{f'{key}__in': keys}).values_list(key, 'id'))
+        else:
+            pks.update((getattr(obj, key), obj.pk) for obj in created)
+
+    def flush_links(self):
+        seen = set()
+        batch = []
+        for comp_id, sf_id in self.links:
+            comp_pk, sf_pk = self.comp_pks.get(comp_id), self.sf_pks.get(sf_id)
+            if comp_pk is None or sf_pk is None or (comp_pk, sf_pk) in seen:
+                continue
+            seen.add((comp_pk, sf_pk))
+            batch.append(ComponentSafetyFunction(component_id=comp_pk, safetyfunction_id=sf_pk))
+            if len(batch) >= self.chunk_size:
+                ComponentSafetyFunction.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            ComponentSafetyFunction.objects.bulk_create(batch)
+        self.links = []
+
+    def report(self, phase, fraction):
+        """Pass ``(phase, fraction of the phase done)`` to the progress callback."""
+        if self.progress is not None:
+            self.progress(phase, fraction)
+
+    def finish(self):
+        if self.project is None:
+            raise ValueError("no 'project' row in CSV")
+        self.report('link', 0.0)
+        self.flush_sfs()
+        self.flush_components()
+        deferred, self.deferred_fms = self.deferred_fms, []
+        for row in deferred:
+            if normalize_id(row.get('component_id')) in self.comp_pks:
+                self.add_fm(row)
+            else:
+                self.skipped_fms += 1
+        self.flush_fms()
+        self.flush_links()
+        self.report('calculate', 0.0)
+        # FM metrics were stored at insert time, only the SFs are left
+        calculate_project_metrics(self.project, settings.FMEDA_CALCULATION_ENGINE, update_failure_modes=False)
+        return self.project
+
+
+def _reporting_lines(file_obj, importer):
+    """Pass the lines of ``file_obj`` through, reporting the share read."""
+    size = getattr(file_obj, 'size', None)
+    done = 0
+    for i, line in enumerate(file_obj):
+        done += len(line)
+        if size and i % importer.chunk_size == 0:
+            importer.report('read', min(done / size, 1.0))
+        yield line
+
+
+def import_project_csv(file_obj, chunk_size=IMPORT_CHUNK_SIZE, replace=None, progress=None):
+    """Import an uploaded project CSV and return ``(project, importer)``.
+
+    ``replace`` is the id of a project the import takes the place of; it is
+    deleted in the same transaction, under its project lock. ``progress`` is
+    called as ``progress(phase, fraction)`` while the import runs.
+    """
+    started = time.monotonic()
+    importer = ProjectCSVImporter(chunk_size, progress)
+    lines = _reporting_lines(file_obj, importer) if progress is not None else file_obj
+    with project_lock(replace) if replace is not None else transaction.atomic():
+        if replace is not None:
+            Project.objects.filter(id=replace).delete()
+        project = importer.run(csv.DictReader(decoded_lines(lines)))
+    logger.info('import project=%s name=%r file=%r replaced=%s sfs=%d components=%d skipped_fms=%d seconds=%.3f',
+                project.id, project.name, getattr(file_obj, 'name', None), replace, len(importer.sf_pks),
+                len(importer.comp_pks), importer.skipped_fms, time.monotonic() - started)
+    return project, importer
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def iter_project_csv(project, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the CSV lines of ``project`` (header first).
+
+    Each section is read with a single values_list() query streamed through
+    iterator(), so memory does not grow with the number of failure modes.
+    Only the SF ids of each component's links are held in memory.
+    """
+    writer = csv.DictWriter(_Echo(), fieldnames=CSV_COLUMNS, lineterminator='\n')
+    yield writer.writeheader()
+    yield writer.writerow({'section': 'project', 'name': project.name, 'lifetime': project.lifetime})
+
+    sfs = (project.safety_functions.order_by('id')
+           .values_list('sf_id', 'description', 'target_integrity_level'))
+    for sf_id, description, target_integrity_level in sfs.iterator(chunk_size=chunk_size):
+        yield writer.writerow({'section': 'sf', 'id': sf_id, 'description': description,
+                               'target_integrity_level': target_integrity_level})
+
+    related_sf_ids = {}
+    links = (ComponentSafetyFunction.objects.filter(component__project=project).order_by('id')
+             .values_list('component_id', 'safetyfunction__sf_id'))
+    for comp_pk, sf_id in links.iterator(chunk_size=chunk_size):
+        related_sf_ids.setdefault(comp_pk, []).append(sf_id)
+
+    components = (project.components.order_by('id')
+                  .values_list('id', 'comp_id', 'type', 'failure_rate', 'is_safety_related'))
+    for comp_pk, comp_id, comp_type, failure_rate, is_safety_related in components.iterator(chunk_size=chunk_size):
+        yield writer.writerow({
+            'section': 'component',
+            'id': comp_id,
+            'type': comp_type,
+            'failure_rate': failure_rate,
+            'related_sf_ids': ','.join(related_sf_ids.get(comp_pk, ())),
+            'is_safety_related': is_safety_related,
+        })
+
+    fm_fields = ('description', 'Failure_rate_total', 'system_level_effect', 'is_SPF',
+                 'SPF_safety_mechanism', 'SPF_diagnostic_coverage', 'is_MPF',
+                 'MPF_safety_mechanism', 'MPF_diagnostic_coverage')
+    fms = (FailureMode.objects.filter(component__project=project).order_by('component_id', 'id')
+           .values_list('component__comp_id', *fm_fields))
+    for comp_id, *values in fms.iterator(chunk_size=chunk_size):
+        row = dict(zip(fm_fields, values))
+        row['section'] = 'fm'
+        row['component_id'] = comp_id
+        yield writer.writerow(row)
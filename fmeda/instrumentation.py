@@ -0,0 +1,167 @@
+"""
+Per-request performance instrumentation.
+
+InstrumentationMiddleware records, for every request, the number of SQL
+queries, the time spent in the database and named phase spans. It sends
+them back in a ``Server-Timing`` header (shown by the browser's network
+panel) and logs them as one JSON line.
+
+Code on the request path marks its phases with span():
+
+    with span('compute'):
+        result = columnar.evaluate(lifetime)
+
+Spans of the same name add up. Outside of a request (jobs, management
+commands) span() records nothing.
+
+Views declare query budgets per handler, the viewset action or the
+lowercase HTTP method:
+
+    class ProjectResultsView(APIView):
+        query_budgets = {'get': 2}
+
+Each request's duration also goes to the /metrics latency histograms (see
+fmeda/metrics.py).
+
+A request running more queries than its budget logs a warning, or raises
+QueryBudgetExceeded when FMEDA_QUERY_BUDGETS is 'raise' (fmeda/tests.py
+turns that on). Streaming responses run their queries after the middleware
+returns, so they have no Server-Timing header and no budget.
+"""
+import contextvars
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import record_request
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('fmeda_request_metrics', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request ran more SQL queries than its view's budget."""
+
+
+class RequestMetrics:
+    """Queries, database time and phase spans of one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.spans = {}  # name -> seconds
+        self.view = None
+        self.query_budget = None
+
+    def add_span(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+    def server_timing(self, total):
+        entries = [f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"']
+        entries.extend(f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.spans.items())
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+    def as_dict(self, total):
+        return {
+            'view': self.view,
+            'queries': self.queries,
+            'query_budget': self.query_budget,
+            'db_ms': round(self.db_time * 1000, 1),
+            'spans_ms': {name: round(seconds * 1000, 1) for name, seconds in self.spans.items()},
+            'total_ms': round(total * 1000, 1),
+        }
+
+
+def current_metrics():
+    """RequestMetrics of the request being handled, None outside of one."""
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """Add the time spent in the block to the request's ``name`` span."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_span(name, time.perf_counter() - start)
+
+
+def view_query_budget(view_func, method):
+    """Query budget a view declares for ``method`` requests, None if it has none."""
+    cls = getattr(view_func, 'cls', None)
+    budgets = getattr(cls, 'query_budgets', None)
+    if not budgets:
+        return None
+    actions = getattr(view_func, 'actions', None)  # viewsets: {'get': 'list', ...}
+    handler = actions.get(method.lower()) if actions else method.lower()
+    return budgets.get(handler)
+
+
+class InstrumentationMiddleware:
+    """Measure each request, see the module docstring."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.FMEDA_INSTRUMENT_REQUESTS:
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(metrics.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - metrics.started
+        record_request(metrics.view, request.method, total)
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'method': request.method, 'path': request.path, 'status': response.status_code,
+                'streaming': response.streaming, **metrics.as_dict(total),
+            }))
+        if response.streaming:
+            return response
+        response.headers['Server-Timing'] = metrics.server_timing(total)
+        self.check_query_budget(request, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view = getattr(request.resolver_match, 'view_name', None)
+            metrics.query_budget = view_query_budget(view_func, request.method)
+
+    def check_query_budget(self, request, metrics):
+        if metrics.query_budget is None or metrics.queries <= metrics.query_budget:
+            return
+        mode = settings.FMEDA_QUERY_BUDGETS
+        message = (f'{request.method} {request.path} ran {metrics.queries} queries, '
+                   f'the budget of {metrics.view} is {metrics.query_budget}')
+        if mode == 'raise':
+            raise QueryBudgetExceeded(message)
+        if mode == 'warn':
+            logger.warning(message)
@@ -0,0 +1,376 @@
+"""
+Background jobs for imports and calculations.
+
+The Job table is the queue: submit_job() stores a queued row and worker
+threads claim rows with a compare-and-set UPDATE, so any number of processes
+(web workers, ``manage.py run_fmeda_jobs``) share one queue without a
+broker.
+
+Handlers run inside their own transactions, so progress is not written by
+the worker itself: a reporter thread, on its own database connection,
+writes the progress of the running jobs together with a heartbeat. A job
+whose worker went away (restart, crash) is queued again once its heartbeat
+is older than FMEDA_JOB_STALE_AFTER, at most FMEDA_JOB_MAX_ATTEMPTS times.
+Every write of a job (progress, heartbeat, final status) only applies while
+the row is still running under the worker that claimed it, so a job queued
+again behind a slow worker's back cannot be finished twice.
+
+On SQLite (one writer at a time) jobs only report when they end, so there
+are no heartbeats to go by. There, and on every backend for jobs of this
+host, a process starting its workers (start_workers(), run on the first
+request of a web process and by ``manage.py run_fmeda_jobs``) also queues
+again the running jobs whose worker process no longer exists.
+"""
+import logging
+import os
+import secrets
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .csv_io import import_project_csv
+from .models import Job
+from .utils import calculate_project_results
+
+# How often idle workers look for jobs queued by other processes
+JOB_POLL_INTERVAL = 2.0
+# How often the reporter writes the progress of running jobs
+PROGRESS_WRITE_INTERVAL = 0.5
+
+# Tells this process from an earlier one that had the same pid
+PROCESS_TOKEN = secrets.token_hex(4)
+
+JOB_HANDLERS = {}
+
+logger = logging.getLogger(__name__)
+
+
+def job_handler(kind, phases):
+    """Register ``func(job, progress)`` as the handler of ``kind`` jobs.
+
+    ``phases`` maps each phase the handler reports to its share of the whole
+    job, which turns per-phase fractions into the job's overall progress.
+    """
+    def register(func):
+        JOB_HANDLERS[kind] = (func, dict(phases))
+        return func
+    return register
+
+
+@job_handler(Job.KIND_IMPORT, {'read': 0.8, 'link': 0.1, 'calculate': 0.1})
+def run_import_job(job, progress):
+    with job.upload.open('rb') as file_obj:
+        project, importer = import_project_csv(file_obj, replace=job.params.get('replace'), progress=progress)
+    return project, {
+        'project': project.id,
+        'name': project.name,
+        'safety_functions': len(importer.sf_pks),
+        'components': len(importer.comp_pks),
+        'skipped_failure_modes': importer.skipped_fms,
+    }
+
+
+@job_handler(Job.KIND_CALCULATE, {'calculate': 0.9, 'results': 0.1})
+def run_calculate_job(job, progress):
+    results, version = calculate_project_results(job.project_id, job.params['engine'], progress)
+    return job.project, {'project': job.project_id, 'data_version': version, 'results': results}
+
+
+class JobProgress:
+    """Progress callback ``progress(phase, fraction)`` of one running job.
+
+    Only records the state; a ProgressReporter writes it out.
+    """
+
+    def __init__(self, job, weights):
+        self.job_id = job.pk
+        self.worker = job.worker
+        self.weights = weights
+        self.lock = threading.Lock()
+        self.phase = ''
+        self.phase_started = None
+        self.progress = 0.0
+        self.done = 0.0  # weight of the finished phases
+        self.timings = dict(job.phase_timings)
+        self.timings.setdefault('queued', round((job.started_at - job.created_at).total_seconds(), 3))
+        self.dirty = True
+
+    def __call__(self, phase, fraction):
+        with self.lock:
+            if phase != self.phase:
+                self._close_phase()
+                self.phase, self.phase_started = phase, time.monotonic()
+            self.progress = min(self.done + self.weights.get(phase, 0.0) * fraction, 1.0)
+            self.dirty = True
+
+    def _close_phase(self):
+        if self.phase:
+            self.timings[self.phase] = round(time.monotonic() - self.phase_started, 3)
+            self.done += self.weights.get(self.phase, 0.0)
+        self.phase = ''
+
+    def finish(self):
+        """Close the current phase, return the final ``phase_timings``."""
+        with self.lock:
+            self._close_phase()
+            self.dirty = False
+            return dict(self.timings)
+
+    def pending_update(self):
+        """Fields to write if anything changed since the last call, else None."""
+        with self.lock:
+            if not self.dirty:
+                return None
+            self.dirty = False
+            return {'phase': self.phase, 'progress': self.progress, 'phase_timings': dict(self.timings)}
+
+
+class ProgressReporter:
+    """Thread writing the progress and heartbeat of the jobs being run here."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = {}  # job id -> JobProgress
+        self.last_heartbeat = 0.0
+
+    def start(self):
+        if connection.vendor == 'sqlite':
+            # SQLite has a single writer and the jobs hold it for their whole
+            # transaction; writing progress meanwhile could make the job the
+            # victim of a lock conflict, so jobs only report when they end
+            return
+        threading.Thread(target=self.loop, name='fmeda-job-reporter', daemon=True).start()
+
+    def track(self, progress):
+        with self.lock:
+            self.running[progress.job_id] = progress
+
+    def untrack(self, progress):
+        with self.lock:
+            self.running.pop(progress.job_id, None)
+
+    def loop(self):
+        while True:
+            time.sleep(PROGRESS_WRITE_INTERVAL)
+            close_old_connections()
+            try:
+                self.write()
+            except Exception:
+                # Progress is best effort; the job's own result still lands
+                logger.exception('writing job progress failed')
+
+    def write(self):
+        with self.lock:
+            running = list(self.running.values())
+        now = timezone.now()
+        beat = time.monotonic() - self.last_heartbeat >= settings.FMEDA_JOB_STALE_AFTER / 6
+        for progress in running:
+            fields = progress.pending_update()
+            if fields is not None or beat:
+                owned_job(progress.job_id, progress.worker).update(heartbeat_at=now, **(fields or {}))
+        if beat and running:
+            self.last_heartbeat = time.monotonic()
+
+
+def submit_job(kind, project=None, params=None, upload=None):
+    """Queue a job and wake the workers once the surrounding transaction commits."""
+    job = Job(kind=kind, project=project, params=params or {})
+    if upload is not None:
+        job.upload.save(upload.name, upload, save=False)
+    job.save()
+    transaction.on_commit(ensure_workers)
+    return job
+
+
+def owned_job(job_id, worker):
+    """The job's row while it is still running under ``worker``."""
+    return Job.objects.filter(pk=job_id, worker=worker, status=Job.STATUS_RUNNING)
+
+
+def requeue_stale_jobs():
+    """Queue running jobs whose worker stopped sending heartbeats again.
+
+    Jobs of this process are never stale: they are still running. On
+    SQLite nothing sends heartbeats; see requeue_orphaned_jobs().
+    """
+    if connection.vendor == 'sqlite':
+        return
+    requeue_jobs(Job.objects.filter(
+        status=Job.STATUS_RUNNING,
+        heartbeat_at__lt=timezone.now() - timedelta(seconds=settings.FMEDA_JOB_STALE_AFTER),
+    ).exclude(worker__startswith=process_name()))
+
+
+def requeue_orphaned_jobs():
+    """Queue again the running jobs of worker processes of this host that are gone.
+
+    Workers are named ``host:pid:token:thread``; a job of this host whose
+    pid no longer exists, or is now this process's, lost its worker.
+    """
+    host, pid = socket.gethostname(), os.getpid()
+    running = Job.objects.filter(status=Job.STATUS_RUNNING, worker__startswith=f'{host}:')
+    orphaned = []
+    for job_id, worker in running.exclude(worker__startswith=process_name()).values_list('id', 'worker'):
+        try:
+            worker_pid = int(worker.split(':')[1])
+        except (IndexError, ValueError):
+            continue
+        if worker_pid == pid or not process_exists(worker_pid):
+            orphaned.append(job_id)
+    if orphaned:
+        logger.warning('requeueing jobs of stopped workers jobs=%s', orphaned)
+        requeue_jobs(Job.objects.filter(id__in=orphaned))
+
+
+def requeue_jobs(jobs):
+    """Queue ``jobs`` again, failing those out of attempts."""
+    job_ids = list(jobs.values_list('id', flat=True))
+    if not job_ids:
+        return  # idle workers only read
+    lost = Job.objects.filter(id__in=job_ids, status=Job.STATUS_RUNNING)
+    lost.filter(attempts__gte=settings.FMEDA_JOB_MAX_ATTEMPTS).update(
+        status=Job.STATUS_FAILED, error='Worker stopped responding.', finished_at=timezone.now(),
+    )
+    lost.update(status=Job.STATUS_QUEUED, worker='')
+
+
+def process_exists(pid):
+    if os.name == 'nt':
+        import ctypes
+        # PROCESS_QUERY_LIMITED_INFORMATION
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # someone else's process
+    return True
+
+
+def claim_next_job(worker):
+    """Mark the oldest queued job as running for ``worker`` and return it."""
+    requeue_stale_jobs()
+    for job_id in Job.objects.filter(status=Job.STATUS_QUEUED).order_by('id').values_list('id', flat=True)[:10]:
+        now = timezone.now()
+        # Other workers may try the same row; only one UPDATE matches it
+        claimed = Job.objects.filter(id=job_id, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING, worker=worker, attempts=F('attempts') + 1,
+            started_at=now, heartbeat_at=now, finished_at=None, error='',
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def run_job(job, reporter):
+    """Run a claimed job and store its result or error."""
+    func, weights = JOB_HANDLERS[job.kind]
+    progress = JobProgress(job, weights)
+    reporter.track(progress)
+    try:
+        project, result = func(job, progress)
+    except Exception as e:
+        logger.exception('job failed job=%s kind=%s attempt=%s', job.pk, job.kind, job.attempts)
+        fields = {'status': Job.STATUS_FAILED, 'error': str(e) or type(e).__name__}
+    else:
+        fields = {'status': Job.STATUS_SUCCEEDED, 'project': project, 'progress': 1.0, 'phase': '', 'result': result}
+    finally:
+        reporter.untrack(progress)
+    if job.upload:
+        fields['upload'] = ''
+    timings = progress.finish()
+    if not owned_job(job.pk, job.worker).update(phase_timings=timings, finished_at=timezone.now(), **fields):
+        # Queued again and claimed by another worker meanwhile: that run
+        # owns the row (and the upload) now
+        logger.warning('job lost job=%s kind=%s worker=%s, result dropped', job.pk, job.kind, job.worker)
+        return
+    if job.upload:
+        job.upload.delete(save=False)
+    logger.info('job done job=%s kind=%s status=%s timings=%s', job.pk, job.kind, fields['status'], timings)
+
+
+def process_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{PROCESS_TOKEN}:'
+
+
+def worker_name():
+    return process_name() + threading.current_thread().name
+
+
+def run_queued_jobs(reporter):
+    """Run queued jobs one after the other until the queue is empty."""
+    while True:
+        close_old_connections()
+        job = claim_next_job(worker_name())
+        if job is None:
+            return
+        run_job(job, reporter)
+
+
+class WorkerPool:
+    """Threads taking jobs off the queue until the process exits."""
+
+    def __init__(self, size):
+        self.size = size
+        self.wakeup = threading.Event()
+        self.reporter = ProgressReporter()
+
+    def start(self):
+        self.reporter.start()
+        for i in range(self.size):
+            threading.Thread(target=self.work, name=f'fmeda-job-{i}', daemon=True).start()
+
+    def wake(self):
+        self.wakeup.set()
+
+    def work(self):
+        while True:
+            try:
+                run_queued_jobs(self.reporter)
+            except Exception:
+                logger.exception('job worker failed')
+            self.wakeup.wait(JOB_POLL_INTERVAL)
+            self.wakeup.clear()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def ensure_workers():
+    """Start this process's pool of FMEDA_JOB_WORKERS threads and wake it."""
+    global _pool
+    if settings.FMEDA_JOB_WORKERS <= 0:
+        return  # jobs are run by `manage.py run_fmeda_jobs` instead
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool(settings.FMEDA_JOB_WORKERS)
+            _pool.start()
+    _pool.wake()
+
+
+def start_workers():
+    """Recover the jobs of stopped workers and start this process's pool."""
+    try:
+        requeue_orphaned_jobs()
+    except Exception:
+        logger.exception('requeueing orphaned jobs failed')
+    ensure_workers()
+
+
+def start_workers_on_first_request(sender, **kwargs):
+    """request_started receiver, connected by FmedaConfig.ready() in web processes."""
+    request_started.disconnect(start_workers_on_first_request)
+    start_workers()
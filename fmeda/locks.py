@@ -0,0 +1,58 @@
+"""
+Per-project locks.
+
+Work that reads a whole project and writes it back (calculating, replacing
+or clearing it) runs under ``project_lock(project_id)``: two such operations
+on the same project are serialized, different projects proceed in parallel.
+
+On PostgreSQL this is a transaction-level advisory lock, held across worker
+processes until the transaction ends. Other backends fall back to a
+per-process lock (SQLite serializes writers across processes on its own).
+"""
+import threading
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.db import connection, transaction
+
+# First key of the two-key advisory lock form, keeps our locks apart from
+# advisory locks other applications take on the same database
+PROJECT_LOCK_NAMESPACE = 0x464D4544  # 'FMED'
+
+_process_locks = defaultdict(threading.RLock)
+_process_locks_guard = threading.Lock()
+
+
+def _process_lock(project_id):
+    with _process_locks_guard:
+        return _process_locks[int(project_id)]
+
+
+@contextmanager
+def project_lock(project_id):
+    """Run the block in a transaction holding the lock of ``project_id``.
+
+    Inside an outer transaction the PostgreSQL lock is held until that one
+    ends.
+    """
+    if connection.vendor == 'postgresql':
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [PROJECT_LOCK_NAMESPACE, int(project_id)])
+            yield
+    else:
+        with _process_lock(project_id), transaction.atomic():
+            yield
+
+
+@contextmanager
+def project_locks(project_ids):
+    """project_lock() of every project in ``project_ids``.
+
+    The locks are taken in id order, so two callers locking overlapping
+    sets cannot deadlock.
+    """
+    with ExitStack() as stack:
+        for project_id in sorted({int(project_id) for project_id in project_ids}):
+            stack.enter_context(project_lock(project_id))
+        yield
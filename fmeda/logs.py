@@ -0,0 +1,37 @@
+"""
+Logging helpers for the fmeda app.
+
+Modules log to ``logging.getLogger(__name__)`` (configured by LOGGING in the
+settings, level FMEDA_LOG_LEVEL) with %-style arguments, so messages below
+the level are never formatted. Messages are ``event key=value ...`` lines.
+
+Per-row messages (one per failure mode or CSV row) are DEBUG and sampled:
+only every FMEDA_LOG_SAMPLE_EVERY-th row is logged, so turning DEBUG on for
+a 100k row import does not flood the collectors. With DEBUG off a sampled
+row costs one ``isEnabledFor()`` check.
+"""
+import itertools
+import logging
+
+from django.conf import settings
+
+
+class RowSampler:
+    """Call once per row; True for every ``every``-th row while DEBUG is on.
+
+        sample_row = RowSampler(logger)
+        for row in rows:
+            if sample_row():
+                logger.debug('row id=%s', row['id'])
+    """
+
+    def __init__(self, logger, every=None):
+        self.logger = logger
+        self.every = every
+        # next() on a count is atomic, samplers may be shared between threads
+        self.rows = itertools.count()
+
+    def __call__(self):
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return False
+        return next(self.rows) % (self.every or settings.FMEDA_LOG_SAMPLE_EVERY) == 0
@@ -0,0 +1,41 @@
+"""
+Background job worker (see fmeda/jobs.py).
+
+Web processes run queued jobs themselves from their first request on,
+unless FMEDA_JOB_WORKERS is 0; this command runs them in a separate process
+instead, on any host sharing the database.
+
+    python manage.py run_fmeda_jobs --workers 4
+    python manage.py run_fmeda_jobs --once    # drain the queue and exit
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from fmeda.jobs import ProgressReporter, WorkerPool, requeue_orphaned_jobs, run_queued_jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued FMEDA import and calculation jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=max(settings.FMEDA_JOB_WORKERS, 1),
+                            help='Number of worker threads.')
+        parser.add_argument('--once', action='store_true',
+                            help='Run the jobs queued right now one by one, then exit.')
+
+    def handle(self, *args, **options):
+        requeue_orphaned_jobs()
+        if options['once']:
+            reporter = ProgressReporter()
+            reporter.start()
+            run_queued_jobs(reporter)
+            return
+        WorkerPool(options['workers']).start()
+        self.stdout.write(f'Running FMEDA jobs with {options["workers"]} workers, Ctrl+C to stop.')
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,205 @@
+"""
+Prometheus metrics served by ``/metrics`` in the text exposition format.
+
+Request latency histograms (per view and method) and results cache lookups
+are counters recorded in each process. A process adds what it recorded to
+a SQLite file shared by every worker on the host (FMEDA_METRICS_FILE) at
+most every FMEDA_METRICS_FLUSH_INTERVAL seconds, and before answering a
+scrape, so any worker answers for all of them without an external agent.
+With an empty FMEDA_METRICS_FILE each process only reports its own.
+
+Project sizes and the job queue are read from the database at scrape time.
+"""
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+
+from django.conf import settings
+from django.db.models import Count
+from django.http import HttpResponse
+
+from .models import Component, FailureMode, Job, SafetyFunction
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+
+# family -> (type, help), in exposition order
+FAMILIES = {
+    'fmeda_request_duration_seconds': (
+        'histogram', 'Time to produce the response, by view (streamed bodies not included).'),
+    'fmeda_results_cache_requests_total': ('counter', 'Results cache lookups, by result.'),
+    'fmeda_results_cache_hit_ratio': ('gauge', 'Share of results cache lookups that were hits.'),
+    'fmeda_project_safety_functions': ('gauge', 'Safety functions per project.'),
+    'fmeda_project_components': ('gauge', 'Components per project.'),
+    'fmeda_project_failure_modes': ('gauge', 'Failure modes per project.'),
+    'fmeda_jobs': ('gauge', 'Background jobs, by status.'),
+    'fmeda_job_queue_depth': ('gauge', 'Background jobs waiting for a worker.'),
+}
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def series(name, **labels):
+    """Exposition name of one sample, e.g. ``fmeda_jobs{status="queued"}``."""
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}="{_label_value(value)}"' for key, value in labels.items()) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _sort_key(key):
+    """Sort samples by name and labels, histogram buckets by their bound."""
+    base, _, rest = key.partition('le="')
+    if not rest:
+        return key, 0.0
+    return base, float(rest.partition('"')[0].replace('+Inf', 'inf'))
+
+
+class MetricsRegistry:
+    """Counters of this process, added to the shared file now and then."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}  # series -> increment not yet in the file
+        self.local = {}    # series -> total, without a shared file
+        self.last_flush = time.monotonic()
+
+    def inc(self, key, amount=1.0):
+        with self.lock:
+            self.pending[key] = self.pending.get(key, 0.0) + amount
+        self.maybe_flush()
+
+    def observe_request(self, view, method, seconds):
+        labels = {'view': view or 'unmatched', 'method': method}
+        name = 'fmeda_request_duration_seconds'
+        with self.lock:
+            pending = self.pending
+            for bound in LATENCY_BUCKETS:
+                if seconds <= bound:
+                    key = series(name + '_bucket', **labels, le=_format_value(bound))
+                    pending[key] = pending.get(key, 0.0) + 1
+            for key, amount in ((series(name + '_sum', **labels), seconds), (series(name + '_count', **labels), 1)):
+                pending[key] = pending.get(key, 0.0) + amount
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if time.monotonic() - self.last_flush >= settings.FMEDA_METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+        if not pending:
+            return
+        path = settings.FMEDA_METRICS_FILE
+        if not path:
+            with self.lock:
+                for key, amount in pending.items():
+                    self.local[key] = self.local.get(key, 0.0) + amount
+            return
+        try:
+            with _shared_file(path) as db:
+                db.executemany(
+                    'INSERT INTO counters (series, value) VALUES (?, ?) '
+                    'ON CONFLICT(series) DO UPDATE SET value = value + excluded.value',
+                    pending.items(),
+                )
+        except sqlite3.Error:
+            # Keep the increments for the next flush rather than failing the request
+            logger.exception('writing metrics to %s failed', path)
+            with self.lock:
+                for key, amount in pending.items():
+                    self.pending[key] = self.pending.get(key, 0.0) + amount
+
+    def counters(self):
+        """``{series: value}`` of every process (only this one without a file)."""
+        self.flush()
+        path = settings.FMEDA_METRICS_FILE
+        if not path:
+            with self.lock:
+                return dict(self.local)
+        with _shared_file(path) as db:
+            return dict(db.execute('SELECT series, value FROM counters'))
+
+
+@contextmanager
+def _shared_file(path):
+    """Connection to the shared counters file, in a committed transaction."""
+    with closing(sqlite3.connect(path, timeout=5.0)) as db, db:
+        db.execute('CREATE TABLE IF NOT EXISTS counters (series TEXT PRIMARY KEY, value REAL NOT NULL)')
+        yield db
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush)
+
+
+def record_request(view, method, seconds):
+    registry.observe_request(view, method, seconds)
+
+
+def record_cache_lookup(hit):
+    registry.inc(series('fmeda_results_cache_requests_total', result='hit' if hit else 'miss'))
+
+
+def database_gauges():
+    """``{series: value}`` of the gauges read from the database."""
+    gauges = {}
+    sizes = (
+        ('fmeda_project_safety_functions', SafetyFunction.objects.values_list('project_id')),
+        ('fmeda_project_components', Component.objects.values_list('project_id')),
+        ('fmeda_project_failure_modes', FailureMode.objects.values_list('component__project_id')),
+    )
+    for name, queryset in sizes:
+        for project_id, count in queryset.annotate(count=Count('id')).order_by():
+            gauges[series(name, project=project_id)] = count
+
+    jobs = dict(Job.objects.values_list('status').annotate(count=Count('id')).order_by())
+    for status, _ in Job.STATUS_CHOICES:
+        gauges[series('fmeda_jobs', status=status)] = jobs.get(status, 0)
+    gauges['fmeda_job_queue_depth'] = jobs.get(Job.STATUS_QUEUED, 0)
+    return gauges
+
+
+def exposition(samples):
+    """Text exposition of ``{series: value}``, grouped by family."""
+    by_family = {}
+    for key, value in samples.items():
+        name = key.partition('{')[0]
+        for suffix in ('_bucket', '_sum', '_count', ''):
+            family = name[:len(name) - len(suffix)] if suffix else name
+            if name.endswith(suffix) and family in FAMILIES:
+                by_family.setdefault(family, []).append((key, value))
+                break
+    lines = []
+    for family, (kind, help_text) in FAMILIES.items():
+        if family not in by_family:
+            continue
+        lines.append(f'# HELP {family} {help_text}')
+        lines.append(f'# TYPE {family} {kind}')
+        lines.extend(f'{key} {_format_value(value)}' for key, value in sorted(by_family[family], key=lambda sample: _sort_key(sample[0])))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    samples = registry.counters()
+    hits = samples.get(series('fmeda_results_cache_requests_total', result='hit'), 0.0)
+    misses = samples.get(series('fmeda_results_cache_requests_total', result='miss'), 0.0)
+    if hits + misses:
+        samples['fmeda_results_cache_hit_ratio'] = hits / (hits + misses)
+    samples.update(database_gauges())
+    return HttpResponse(exposition(samples), content_type=CONTENT_TYPE)
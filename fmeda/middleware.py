@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from .recalc import auto_recalculate_enabled, recalculation_batch
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Brotli quality for responses compressed on the fly; 11 (the maximum) is
+# far too slow for multi-MB bodies, 5 is close to gzip in speed and smaller
+BROTLI_QUALITY = 5
+
+
+class RecalculationBatchMiddleware:
+    """Run the targeted recalculations of one request in a single pass.
+
+    Without it every autocommitted save of the request would recalculate
+    its SFs on its own.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not auto_recalculate_enabled():
+            return self.get_response(request)
+        with recalculation_batch():
+            return self.get_response(request)
+
+
+def accepted_encodings(header):
+    """Return ``{coding: q}`` from an Accept-Encoding header."""
+    codings = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip().replace(' ', '')
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def choose_encoding(header):
+    """Best of brotli and gzip for an Accept-Encoding header, None for neither."""
+    codings = accepted_encodings(header)
+    default = codings.get('*', 0.0)
+    best, best_q = None, 0.0
+    for coding in ('br', 'gzip'):  # brotli wins ties
+        if coding == 'br' and brotli is None:
+            continue
+        q = codings.get(coding, default)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class CompressionMiddleware:
+    """Compress responses with brotli or gzip, as negotiated with the client.
+
+    Bodies under FMEDA_COMPRESS_MIN_SIZE bytes go out as they are, and so do
+    streaming responses (CSV export, live results), which have to reach the
+    client as they are produced. Brotli is used when installed.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < settings.FMEDA_COMPRESS_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+        if coding is None:
+            return response
+        if coding == 'br':
+            compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        else:
+            compressed = compress_string(response.content, max_random_bytes=100)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        # The body is no longer byte-for-byte the one the ETag was made for
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = coding
+        return response
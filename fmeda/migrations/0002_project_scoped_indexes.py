@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 11:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fmeda', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='component',
+            index=models.Index(fields=['project', 'id'], name='fmeda_comp_project_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='failuremode',
+            index=models.Index(fields=['component', 'id'], name='fmeda_fm_component_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='safetyfunction',
+            index=models.Index(fields=['project', 'id'], name='fmeda_sf_project_id_idx'),
+        ),
+    ]
@@ -5,6 +5,18 @@ class Project(models.Model):
     lifetime = models.FloatField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Bumped on every change to the project's data, see fmeda/versioning.py
+    data_version = models.PositiveBigIntegerField(default=0, editable=False)
+
+    def save(self, *args, **kwargs):
+        # data_version only moves through UPDATE ... SET data_version + 1;
+        # never write back the (possibly stale) value held by this instance
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'data_version'
+            ]
+        super().save(*args, **kwargs)
 
 class SafetyFunction(models.Model):
     project = models.ForeignKey(Project, related_name='safety_functions', on_delete=models.CASCADE)
@@ -22,6 +34,9 @@ class SafetyFunction(models.Model):
 
     class Meta:
         unique_together = ('project', 'sf_id')
+        indexes = [
+            models.Index(fields=['project', 'id'], name='fmeda_sf_project_id_idx'),
+        ]
 
 class Component(models.Model):
     project = models.ForeignKey(Project, related_name='components', on_delete=models.CASCADE)
@@ -33,6 +48,9 @@ class Component(models.Model):
 
     class Meta:
         unique_together = ('project', 'comp_id')
+        indexes = [
+            models.Index(fields=['project', 'id'], name='fmeda_comp_project_id_idx'),
+        ]
 
 class FailureMode(models.Model):
     component = models.ForeignKey(Component, related_name='failure_modes', on_delete=models.CASCADE)
@@ -50,4 +68,50 @@ class FailureMode(models.Model):
     MPFD = models.FloatField(default=0)
     # Optionally, add timestamps
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True) 
\ No newline at end of file
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['component', 'id'], name='fmeda_fm_component_id_idx'),
+        ]
+
+
+class Job(models.Model):
+    """A background import or calculation, queued and run by fmeda/jobs.py."""
+    KIND_IMPORT = 'import'
+    KIND_CALCULATE = 'calculate'
+    KIND_CHOICES = [(KIND_IMPORT, 'Import'), (KIND_CALCULATE, 'Calculate')]
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'), (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'), (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    # Set by calculations up front, by imports once the project exists
+    project = models.ForeignKey(Project, related_name='jobs', null=True, blank=True, on_delete=models.SET_NULL)
+    params = models.JSONField(default=dict, blank=True)
+    upload = models.FileField(upload_to='fmeda_jobs/', blank=True)
+    # Progress of the whole job (0..1), the phase it is in and the seconds
+    # spent in each finished phase
+    progress = models.FloatField(default=0)
+    phase = models.CharField(max_length=50, blank=True)
+    phase_timings = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='fmeda_job_status_id_idx'),
+        ]
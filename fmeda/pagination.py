@@ -0,0 +1,20 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OptInCursorPagination(CursorPagination):
+    """Cursor pagination over ``id``, only used when the client asks for it.
+
+    The frontend expects plain JSON arrays from the list endpoints, so a list
+    is only paginated when the request carries ``?cursor=`` or
+    ``?page_size=``. The cursor points at an id, so rows inserted or deleted
+    while a client walks the pages never shift the following pages.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
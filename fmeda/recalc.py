@@ -0,0 +1,42 @@
+"""
+Opt-in targeted recalculation (settings.FMEDA_AUTO_RECALCULATE).
+
+When enabled, saving a failure mode, a component or an SF <-> component
+link recalculates only the safety functions reachable from the change,
+instead of waiting for a full /fmeda/calculate/. The affected SFs are
+collected per transaction, or per request through
+RecalculationBatchMiddleware, and recalculated in one pass at the end.
+"""
+from django.conf import settings
+
+from .batching import CommitBatch
+from .models import SafetyFunction, Component
+from .utils import recalculate_safety_functions
+
+
+def auto_recalculate_enabled():
+    return getattr(settings, 'FMEDA_AUTO_RECALCULATE', False)
+
+
+def _recalculate_now(sf_ids=(), component_ids=(), project_ids=()):
+    sf_ids = set(sf_ids)
+    if component_ids:
+        sf_ids.update(Component.related_sfs.through.objects.filter(component_id__in=component_ids)
+                      .values_list('safetyfunction_id', flat=True))
+    if project_ids:
+        sf_ids.update(SafetyFunction.objects.filter(project_id__in=project_ids).values_list('id', flat=True))
+    recalculate_safety_functions(sf_ids)
+
+
+_recalculations = CommitBatch(_recalculate_now)
+
+
+def schedule_recalculation(sf_ids=(), component_ids=(), project_ids=()):
+    """Queue the SFs given directly, via their components or via their projects."""
+    if auto_recalculate_enabled():
+        _recalculations.add(sf_ids=sf_ids, component_ids=component_ids, project_ids=project_ids)
+
+
+def recalculation_batch():
+    """Context manager deferring scheduled recalculations to the end of the block."""
+    return _recalculations.hold()
@@ -0,0 +1,66 @@
+"""
+Response renderers.
+
+FastJSONRenderer renders with orjson when it is installed, several times
+faster than the json module on large project payloads, and falls back to
+DRF's JSONRenderer otherwise. MessagePackRenderer answers clients sending
+``Accept: application/msgpack`` (or ``?format=msgpack``) when msgpack is
+installed. Renderers whose library is missing are skipped by
+ContentNegotiation, so such clients get 406 rather than an error.
+"""
+from rest_framework import renderers
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.utils import encoders
+
+from .instrumentation import span
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """Same output as JSONRenderer (compact, UTF-8), except that NaN and
+    infinity become ``null`` instead of failing the request."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            # Indented output (e.g. the browsable API) is left to the json module
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        with span('render'):
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        # Like JSONRenderer, keep the output a strict JavaScript subset
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    available = msgpack is not None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        with span('render'):
+            return msgpack.packb(data, default=encoders.JSONEncoder().default, use_bin_type=True)
+
+
+class ContentNegotiation(DefaultContentNegotiation):
+    """Default negotiation over the renderers whose library is installed."""
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        renderers = [renderer for renderer in renderers if getattr(renderer, 'available', True)]
+        return super().select_renderer(request, renderers, format_suffix)
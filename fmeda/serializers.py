@@ -1,7 +1,88 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Project, SafetyFunction, Component, FailureMode
+from rest_framework.validators import UniqueTogetherValidator
+from .models import Project, SafetyFunction, Component, FailureMode, Job
 
-class FailureModeSerializer(serializers.ModelSerializer):
+
+def _field_list(value):
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def sparse_fieldset(request):
+    """Return the ``(fields, expand)`` name sets asked for by a GET request.
+
+    ``?fields=a,b`` limits the rendered top-level fields and ``?expand=x``
+    lists the nested relations rendered in full; the other relations are
+    rendered as lists of pks. ``None`` means "not given", i.e. everything.
+    """
+    if request is None or request.method != 'GET':
+        return None, None
+    return _field_list(request.query_params.get('fields')), _field_list(request.query_params.get('expand'))
+
+
+def relation_prefetch(name, nested_queryset, pk_queryset, fields=None, expand=None):
+    """Prefetch sized for how ``name`` is rendered under ``fields``/``expand``."""
+    if fields is not None and name not in fields:
+        return None
+    if expand is not None and name not in expand:
+        return Prefetch(name, queryset=pk_queryset)
+    return Prefetch(name, queryset=nested_queryset)
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField that first looks in ``context['related_objects']``.
+
+    The bulk endpoints load every referenced pk with one query and pass the
+    objects in, instead of one ``queryset.get()`` per row.
+    """
+
+    def to_internal_value(self, data):
+        cached = self.context.get('related_objects', {}).get(self.field_name, {})
+        if isinstance(data, int) and not isinstance(data, bool) and data in cached:
+            return cached[data]
+        return super().to_internal_value(data)
+
+
+class BulkSerializerMixin:
+    """Serializer side of the bulk endpoints (see fmeda/bulk.py).
+
+    FK fields resolve pks from ``context['related_objects']`` and, in bulk
+    mode, the per-row unique_together queries are skipped because the bulk
+    endpoint checks uniqueness for all rows in one query.
+    """
+    serializer_related_field = BulkPrimaryKeyRelatedField
+
+    def get_validators(self):
+        validators = super().get_validators()
+        if 'related_objects' in self.context:
+            validators = [v for v in validators if not isinstance(v, UniqueTogetherValidator)]
+        return validators
+
+
+class SparseFieldsetMixin:
+    """Apply ``?fields=`` and ``?expand=`` to the top-level serializer."""
+    # Nested relations that are replaced by pks when not expanded
+    expandable_fields = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return fields  # nested serializers always render in full
+        only, expand = sparse_fieldset(self.context.get('request'))
+        if expand is not None:
+            for name in self.expandable_fields:
+                if name in fields and name not in expand:
+                    fields[name] = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+        if only is not None:
+            fields = {name: field for name, field in fields.items() if name in only}
+        return fields
+
+class FailureModeSerializer(BulkSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     # Map frontend field names to backend field names
     failure_rate_total = serializers.FloatField(source='Failure_rate_total', required=False)
     is_spf = serializers.BooleanField(source='is_SPF', required=False)
@@ -15,21 +96,39 @@ class FailureModeSerializer(serializers.ModelSerializer):
         model = FailureMode
         fields = '__all__'
 
-class SafetyFunctionSerializer(serializers.ModelSerializer):
+class SafetyFunctionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     related_components = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
 
     class Meta:
         model = SafetyFunction
         fields = '__all__'
 
-class ComponentSerializer(serializers.ModelSerializer):
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None, expand=None):
+        # related_components is rendered as a list of pks only
+        component_pks = Component.objects.only('id').order_by('id')
+        lookups = [relation_prefetch('related_components', component_pks, component_pks, fields)]
+        return queryset.prefetch_related(*filter(None, lookups))
+
+class ComponentSerializer(BulkSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     failure_modes = FailureModeSerializer(many=True, read_only=True)
     related_sfs = SafetyFunctionSerializer(many=True, read_only=True)
+    expandable_fields = ('failure_modes', 'related_sfs')
 
     class Meta:
         model = Component
         fields = '__all__'
 
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None, expand=None):
+        lookups = [
+            relation_prefetch('failure_modes', FailureMode.objects.order_by('id'),
+                              FailureMode.objects.only('id', 'component_id').order_by('id'), fields, expand),
+            relation_prefetch('related_sfs', SafetyFunctionSerializer.setup_eager_loading(
+                SafetyFunction.objects.order_by('id')), SafetyFunction.objects.only('id').order_by('id'), fields, expand),
+        ]
+        return queryset.prefetch_related(*filter(None, lookups))
+
     def create(self, validated_data):
         related_sfs_data = self.context.get('related_sfs', [])
         component = Component.objects.create(**validated_data)
@@ -46,10 +145,29 @@ class ComponentSerializer(serializers.ModelSerializer):
             instance.related_sfs.set(related_sfs_data)
         return instance
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     safety_functions = SafetyFunctionSerializer(many=True, read_only=True)
     components = ComponentSerializer(many=True, read_only=True)
+    expandable_fields = ('safety_functions', 'components')
 
     class Meta:
         model = Project
-        fields = '__all__' 
\ No newline at end of file
+        fields = '__all__'
+
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None, expand=None):
+        lookups = [
+            relation_prefetch('safety_functions', SafetyFunctionSerializer.setup_eager_loading(
+                SafetyFunction.objects.order_by('id')), SafetyFunction.objects.only('id', 'project_id').order_by('id'),
+                fields, expand),
+            relation_prefetch('components', ComponentSerializer.setup_eager_loading(
+                Component.objects.order_by('id')), Component.objects.only('id', 'project_id').order_by('id'),
+                fields, expand),
+        ]
+        return queryset.prefetch_related(*filter(None, lookups)) 
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        exclude = ['upload']
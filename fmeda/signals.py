@@ -0,0 +1,81 @@
+"""
+Model signal receivers, connected in FmedaConfig.ready().
+
+Any change to an SF, a component, a failure mode or an SF <-> component
+link bumps the data version of its project (see fmeda/versioning.py) and,
+with FMEDA_AUTO_RECALCULATE on, queues the affected SFs for recalculation
+(see fmeda/recalc.py).
+bulk_create()/bulk_update() do not send signals; code using them bumps the
+version itself, and schedules recalculation like code deleting components
+through a queryset.
+
+There is deliberately no post_delete receiver for FailureMode: it would stop
+Django from fast-deleting the FMs of a deleted component or project (every
+row would be loaded first). Single FM deletes are handled in
+FailureModeViewSet.
+"""
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Project, SafetyFunction, Component, FailureMode
+from .recalc import auto_recalculate_enabled, schedule_recalculation
+from .utils import compute_failure_mode_metrics
+from .versioning import bump_data_version
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, created, **kwargs):
+    # The lifetime feeds MPHF, so edits to the project itself count too
+    if not created:
+        bump_data_version(project_ids=[instance.pk])
+        schedule_recalculation(project_ids=[instance.pk])
+
+
+@receiver(post_save, sender=SafetyFunction)
+@receiver(post_delete, sender=SafetyFunction)
+@receiver(post_save, sender=Component)
+@receiver(post_delete, sender=Component)
+def project_member_changed(sender, instance, **kwargs):
+    bump_data_version(project_ids=[instance.project_id])
+
+
+@receiver(post_save, sender=Component)
+def component_saved(sender, instance, **kwargs):
+    # failure_rate feeds safetyrelated of every linked SF
+    schedule_recalculation(component_ids=[instance.pk])
+
+
+@receiver(pre_delete, sender=Component)
+def component_deleting(sender, instance, origin=None, **kwargs):
+    # The links are gone after the delete, so look the SFs up now. Only for
+    # component.delete(): a deleted project takes every SF with it, and
+    # queryset deletes (bulk endpoint, project clear) schedule for all rows
+    # at once instead of one query per component.
+    if auto_recalculate_enabled() and isinstance(origin, Component):
+        schedule_recalculation(sf_ids=instance.related_sfs.values_list('id', flat=True))
+
+
+@receiver(pre_save, sender=FailureMode)
+def failure_mode_saving(sender, instance, **kwargs):
+    # Derived fields go out with the same UPDATE/INSERT
+    if auto_recalculate_enabled():
+        compute_failure_mode_metrics(instance)
+
+
+@receiver(post_save, sender=FailureMode)
+def failure_mode_changed(sender, instance, **kwargs):
+    bump_data_version(component_ids=[instance.component_id])
+    schedule_recalculation(component_ids=[instance.component_id])
+
+
+@receiver(m2m_changed, sender=Component.related_sfs.through)
+def links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        # component.related_sfs.clear(): remember which SFs lose it
+        schedule_recalculation(sf_ids=instance.related_sfs.values_list('id', flat=True))
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_data_version(project_ids=[instance.project_id])
+        if reverse:
+            schedule_recalculation(sf_ids=[instance.pk])
+        elif pk_set:
+            schedule_recalculation(sf_ids=pk_set)
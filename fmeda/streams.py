@@ -0,0 +1,189 @@
+"""
+Server-Sent Events with the live results of a project.
+
+Each process runs one ProjectFeed per watched project: it polls the
+project's data version and, when it moves, works out the results once and
+hands them to every stream (browser tab) subscribed to the project. A
+stream then only sends the SFs whose metrics changed since its last event.
+
+Results come from the shared results cache when a calculation already
+produced them for the version; with FMEDA_AUTO_RECALCULATE the stored SF
+metrics are current and read as they are; otherwise the feed calculates
+once (under the project lock) instead of every tab asking for it.
+
+Django 4.2 keeps iterating a streaming response after the client went away,
+so streams end after FMEDA_STREAM_MAX_AGE seconds; EventSource reconnects on
+its own and sends Last-Event-ID, which skips the unchanged snapshot.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import Project, SafetyFunction
+from .recalc import auto_recalculate_enabled
+from .utils import calculate_project_results, sf_result
+from .versioning import cache_results, get_cached_results, get_data_version
+
+# Comment line sent when nothing happened for this long, keeps proxies from
+# closing the connection
+STREAM_KEEPALIVE = 15.0
+# Reconnect delay suggested to EventSource (milliseconds)
+STREAM_RETRY_MS = 3000
+
+
+def _current_version(project_id):
+    close_old_connections()
+    return get_data_version(project_id)
+
+
+def load_results(project_id):
+    """Return ``(data_version, results)`` of a project, ``None`` once it is gone."""
+    close_old_connections()
+    version = get_data_version(project_id)
+    if version is None:
+        return None
+    cached = get_cached_results(project_id, version)
+    if cached is not None and (cached['calculated'] or auto_recalculate_enabled()):
+        return version, cached['results']
+    if auto_recalculate_enabled():
+        # Every edit already recalculated the SFs it affects
+        results = [sf_result(sf) for sf in SafetyFunction.objects.filter(project_id=project_id).order_by('id')]
+        cache_results(project_id, version, results)
+        return version, results
+    try:
+        results, version = calculate_project_results(project_id, settings.FMEDA_CALCULATION_ENGINE)
+    except Project.DoesNotExist:
+        return None
+    return version, results
+
+
+class Subscription:
+    """What one stream has yet to send: only the newest results are kept."""
+
+    def __init__(self):
+        self.ready = asyncio.Event()
+        self.latest = None
+        self.gone = False
+
+    def publish(self, loaded):
+        if loaded is None:
+            self.gone = True
+        else:
+            self.latest = loaded
+        self.ready.set()
+
+
+class ProjectFeed:
+    """Polls one project for its subscribers, until the last one leaves."""
+
+    def __init__(self, key):
+        self.key = key
+        self.project_id = key[1]
+        self.subscribers = set()
+        self.latest = None
+        self.task = None
+
+    def subscribe(self):
+        subscription = Subscription()
+        if self.latest is not None:
+            subscription.publish(self.latest)
+        self.subscribers.add(subscription)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+
+    def publish(self, loaded):
+        self.latest = loaded
+        for subscription in self.subscribers:
+            subscription.publish(loaded)
+
+    async def run(self):
+        version = None
+        try:
+            while self.subscribers:
+                current = await sync_to_async(_current_version, thread_sensitive=False)(self.project_id)
+                if current is None:
+                    self.publish(None)
+                    return
+                if current != version:
+                    loaded = await sync_to_async(load_results, thread_sensitive=False)(self.project_id)
+                    self.publish(loaded)
+                    if loaded is None:
+                        return
+                    version = loaded[0]
+                await asyncio.sleep(settings.FMEDA_STREAM_POLL_INTERVAL)
+        finally:
+            self.latest = None
+            if _feeds.get(self.key) is self:
+                del _feeds[self.key]
+
+
+# (event loop, project id) -> ProjectFeed
+_feeds = {}
+
+
+def project_feed(project_id):
+    key = asyncio.get_running_loop(), project_id
+    feed = _feeds.get(key)
+    if feed is None:
+        feed = _feeds[key] = ProjectFeed(key)
+    return feed
+
+
+def format_event(event, event_id, data):
+    return f'id: {event_id}\nevent: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+async def results_events(project_id, last_event_id=None):
+    """Yield the SSE lines for one client watching ``project_id``.
+
+    The first event (``results``) carries every SF, the following ones
+    (``update``) only the changed SFs plus the ids of removed ones. The
+    event id is the data version, ``deleted`` ends the stream.
+    """
+    feed = project_feed(project_id)
+    subscription = feed.subscribe()
+    sent = None  # sf id -> result last sent to this client
+    deadline = time.monotonic() + settings.FMEDA_STREAM_MAX_AGE
+    try:
+        yield f'retry: {STREAM_RETRY_MS}\n\n'
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(subscription.ready.wait(), min(STREAM_KEEPALIVE, remaining))
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            subscription.ready.clear()
+            if subscription.gone:
+                yield format_event('deleted', 'deleted', {'project': project_id})
+                return
+            version, results = subscription.latest
+            current = {result['safety_function']: result for result in results}
+            if sent is None and str(version) == last_event_id:
+                # Reconnected without missing anything
+                sent = current
+                continue
+            if sent is None:
+                yield format_event('results', version, {
+                    'project': project_id, 'data_version': version, 'results': results,
+                })
+            else:
+                changed = [result for sf_pk, result in current.items() if sent.get(sf_pk) != result]
+                removed = sorted(sf_pk for sf_pk in sent if sf_pk not in current)
+                if changed or removed:
+                    yield format_event('update', version, {
+                        'project': project_id, 'data_version': version, 'results': changed, 'removed': removed,
+                    })
+            sent = current
+    finally:
+        feed.unsubscribe(subscription)
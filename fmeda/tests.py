@@ -0,0 +1,144 @@
+"""
+Tests of the fmeda app.
+
+    python manage.py test fmeda
+"""
+import io
+import random
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from fmeda_io import read_project_csv
+from test_fmeda import METRICS, MetricsAssertions, snapshot
+
+from .csv_io import iter_project_csv
+from .models import Project, SafetyFunction, Component, FailureMode
+from .utils import CALCULATION_ENGINES, compute_failure_mode_metrics, calculate_project_metrics
+
+# (safety functions, components, failure modes per component)
+FIXTURE_SIZES = [(1, 2, 1), (3, 10, 3), (6, 40, 5)]
+
+# endpoint name -> queries per request, whatever the project size
+EXPECTED_QUERIES = {
+    'project-list': 7,
+    'project-detail': 7,
+    'safety-function-list': 2,
+    'component-list': 4,
+    'failure-mode-list': 1,
+    'failure-modes-by-component': 2,
+    'project-results': 2,
+    'project-export-csv': 5,
+    'project-debug': 6,
+}
+
+
+def build_fixture_project(n_sfs, n_components, n_fms):
+    """Create a project where every component is linked to two SFs."""
+    project = Project.objects.create(name=f'query-count {n_sfs}x{n_components}x{n_fms}', lifetime=20000)
+    sfs = SafetyFunction.objects.bulk_create(
+        SafetyFunction(project=project, sf_id=str(i), target_integrity_level='ASIL B') for i in range(n_sfs)
+    )
+    components = Component.objects.bulk_create(
+        Component(project=project, comp_id=str(i), type='R', failure_rate=10.0 + i, is_safety_related=True)
+        for i in range(n_components)
+    )
+    if components[0].pk is None:
+        sfs = list(project.safety_functions.order_by('id'))
+        components = list(project.components.order_by('id'))
+    FailureMode.objects.bulk_create(
+        compute_failure_mode_metrics(FailureMode(
+            component=comp, description=f'fm {j}', Failure_rate_total=1.0 + j,
+            is_SPF=True, is_MPF=bool(j % 2), SPF_diagnostic_coverage=90, MPF_diagnostic_coverage=60,
+        ))
+        for comp in components for j in range(n_fms)
+    )
+    through = Component.related_sfs.through
+    through.objects.bulk_create(
+        through(component_id=comp.pk, safetyfunction_id=sf.pk)
+        for i, comp in enumerate(components) for sf in {sfs[i % n_sfs], sfs[(i + 1) % n_sfs]}
+    )
+    calculate_project_metrics(project, 'vectorized')
+    return project
+
+
+def endpoint_requests(project):
+    """Yield ``(name, path)`` for every checked endpoint."""
+    component = project.components.order_by('id').first()
+    yield 'project-list', '/projects/'
+    yield 'project-detail', f'/projects/{project.id}/'
+    yield 'safety-function-list', f'/safety-functions/?project={project.id}'
+    yield 'component-list', f'/components/?project={project.id}'
+    yield 'failure-mode-list', f'/failure-modes/?project={project.id}'
+    yield 'failure-modes-by-component', f'/failure-modes/by-component/{component.id}/'
+    yield 'project-results', f'/fmeda/results/{project.id}/'
+    yield 'project-export-csv', f'/projects/{project.id}/export-csv/'
+    yield 'project-debug', f'/projects/{project.id}/debug/'
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], FMEDA_QUERY_BUDGETS='raise', FMEDA_METRICS_FILE='')
+class QueryCountTests(TestCase):
+    """The read endpoints run a fixed number of queries, whatever the project size.
+
+    A count that grows with the fixture is an N+1 regression. Write endpoints
+    are left out: their bulk UPDATEs are batched on purpose. The views' query
+    budgets (fmeda/instrumentation.py) are enforced too.
+    """
+
+    def test_read_endpoints(self):
+        client = APIClient()
+        for size in FIXTURE_SIZES:
+            project = build_fixture_project(*size)
+            for name, path in endpoint_requests(project):
+                with self.subTest(endpoint=name, size=size), self.assertNumQueries(EXPECTED_QUERIES[name]):
+                    response = client.get(path)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    self.assertLess(response.status_code, 400)
+
+
+def build_random_project(seed, n_sfs=5, n_components=30, n_fms=3):
+    """A project with random rates, flags and coverages.
+
+    Components link to 0-2 of the SFs; the last SF is never linked.
+    """
+    rng = random.Random(seed)
+    project = Project.objects.create(name=f'random {seed}', lifetime=20000)
+    sfs = [SafetyFunction.objects.create(project=project, sf_id=f'SF{i}') for i in range(n_sfs)]
+    for i in range(n_components):
+        comp = Component.objects.create(project=project, comp_id=f'C{i}', failure_rate=rng.uniform(1, 100))
+        comp.related_sfs.set(rng.sample(sfs[:-1], rng.randint(0, 2)))
+        FailureMode.objects.bulk_create(
+            FailureMode(
+                component=comp, description=f'fm {j}', Failure_rate_total=rng.uniform(0.1, 30),
+                is_SPF=rng.random() < 0.7, is_MPF=rng.random() < 0.8,
+                SPF_diagnostic_coverage=rng.choice([0, 60, 90, 99, 37.5]),
+                MPF_diagnostic_coverage=rng.choice([0, 60, 90, 99, 37.5]),
+            )
+            for j in range(n_fms)
+        )
+    return project
+
+
+@override_settings(FMEDA_METRICS_FILE='')
+class CalculationEngineTests(MetricsAssertions, TestCase):
+    """Every engine gives the results of FMEDA.Project.evaluate_metrics()."""
+
+    def desktop_metrics(self, project):
+        desktop = read_project_csv(io.StringIO(''.join(iter_project_csv(project))))
+        desktop.evaluate_metrics(desktop.lifetime)
+        return snapshot(desktop)
+
+    def test_engines_match_evaluate_metrics(self):
+        for seed in range(3):
+            project = build_random_project(seed)
+            expected = self.desktop_metrics(project)
+            for engine in CALCULATION_ENGINES:
+                with self.subTest(seed=seed, engine=engine):
+                    # Start from zeros, so nothing is left over from the previous engine
+                    FailureMode.objects.filter(component__project=project).update(RF=0, MPFL=0, MPFD=0)
+                    SafetyFunction.objects.filter(project=project).update(**dict.fromkeys(METRICS, 0))
+                    calculate_project_metrics(project, engine)
+                    actual = {sf.sf_id: {name: getattr(sf, name) for name in METRICS}
+                              for sf in SafetyFunction.objects.filter(project=project)}
+                    self.assertMetricsClose(expected, actual)
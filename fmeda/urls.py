@@ -2,8 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     ProjectViewSet, SafetyFunctionViewSet, ComponentViewSet, FailureModeViewSet,
-    FMEDACalculateView, ProjectResultsView, ProjectImportCSVView, ProjectExportCSVView,
-    ProjectDebugView, ProjectClearAllView
+    FMEDACalculateView, ProjectResultsView, ProjectResultsStreamView, ProjectImportCSVView,
+    ProjectExportCSVView, ProjectDebugView, ProjectClearAllView, JobViewSet
 )
 
 router = DefaultRouter()
@@ -11,6 +11,7 @@ router.register(r'projects', ProjectViewSet)
 router.register(r'safety-functions', SafetyFunctionViewSet)
 router.register(r'components', ComponentViewSet)
 router.register(r'failure-modes', FailureModeViewSet)
+router.register(r'jobs', JobViewSet)
 
 urlpatterns = [
     # Custom URLs (must come before router URLs to avoid conflicts)
@@ -20,6 +21,7 @@ urlpatterns = [
     path('projects/<int:project_id>/debug/', ProjectDebugView.as_view(), name='project-debug'),
     path('fmeda/calculate/', FMEDACalculateView.as_view(), name='fmeda-calculate'),
     path('fmeda/results/<int:project_id>/', ProjectResultsView.as_view(), name='project-results'),
+    path('fmeda/stream/<int:project_id>/', ProjectResultsStreamView.as_view(), name='project-results-stream'),
     # Router URLs (must come after custom URLs)
     path('', include(router.urls)),
 ] 
\ No newline at end of file
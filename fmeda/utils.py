@@ -1,4 +1,33 @@
-def calculate_fmeda_metrics(safety_function, lifetime):
+import logging
+
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Sum, Value, When
+
+from fmeda_engine import ColumnarProject
+
+from .instrumentation import span
+from .locks import project_lock
+from .logs import RowSampler
+from .models import Component, FailureMode, Project, SafetyFunction
+from .versioning import bump_data_version, cache_results, get_cached_results, get_data_version
+
+SF_METRIC_FIELDS = ['RF', 'MPFL', 'MPFD', 'MPHF', 'SPFM', 'LFM', 'safetyrelated']
+FM_METRIC_FIELDS = ['RF', 'MPFL', 'MPFD']
+BULK_UPDATE_BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+sample_row = RowSampler(logger)
+
+
+def calculate_fmeda_metrics(safety_function, lifetime, aggregate=False, save=True):
+    if aggregate:
+        # Let the database compute the sums instead of walking the relations
+        update_failure_modes_in_db(FailureMode.objects.filter(component__related_sfs=safety_function))
+        totals = aggregate_sf_totals(SafetyFunction.objects.filter(pk=safety_function.pk))
+        apply_sf_totals(safety_function, *totals.get(safety_function.pk, (0.0, 0.0, 0.0, 0.0)), lifetime)
+        safety_function.save(update_fields=SF_METRIC_FIELDS)
+        return
+
     # Reset metrics
     safety_function.RF = 0.0
     safety_function.MPFL = 0.0
@@ -10,84 +39,334 @@ def calculate_fmeda_metrics(safety_function, lifetime):
 
     # Get related components through the ManyToMany relationship
     related_components = safety_function.related_components.all()
-    print(f"Safety Function {safety_function.sf_id} has {related_components.count()} related components")
-    
     if related_components.count() == 0:
-        print(f"WARNING: Safety Function {safety_function.sf_id} has NO related components!")
-        print("This means the calculation will result in 0 values.")
-        print("Make sure to link Components to Safety Functions in the Components page.")
+        # Link Components to Safety Functions in the Components page
+        logger.warning('sf without components sf=%s metrics=0', safety_function.sf_id)
         return
-    
-    total_failure_rate = 0.0
-    total_rf = 0.0
-    total_mpfl = 0.0
-    total_mpfd = 0.0
-    
+
     for comp in related_components:
         safety_function.safetyrelated += comp.failure_rate
-        total_failure_rate += comp.failure_rate
-        print(f"Component {comp.comp_id} failure rate: {comp.failure_rate}")
-        
-        # Get failure modes for this component
-        failure_modes = comp.failure_modes.all()
-        print(f"Component {comp.comp_id} has {failure_modes.count()} failure modes")
-        
-        for fm in failure_modes:
+        if sample_row():
+            logger.debug('component sf=%s component=%s failure_rate=%s', safety_function.sf_id,
+                         comp.comp_id, comp.failure_rate)
+
+        for fm in comp.failure_modes.all():
             # Update failure mode calculations first
-            update_failure_mode_calculations(fm)
-            
+            update_failure_mode_calculations(fm, save=save)
+
             safety_function.RF += fm.RF
             safety_function.MPFD += fm.MPFD
             safety_function.MPFL += fm.MPFL
-            
-            total_rf += fm.RF
-            total_mpfl += fm.MPFL
-            total_mpfd += fm.MPFD
-            
-            print(f"Failure Mode {fm.description}: RF={fm.RF}, MPFD={fm.MPFD}, MPFL={fm.MPFL}")
-
-    print(f"Total for {safety_function.sf_id}: failure_rate={total_failure_rate}, RF={total_rf}, MPFL={total_mpfl}, MPFD={total_mpfd}")
 
     # MPHF calculation
     safety_function.MPHF = (safety_function.RF / 1e9) + ((safety_function.MPFL / 1e9) * (safety_function.MPFD / 1e9) * lifetime)
-    
+
     # SPFM
     if safety_function.safetyrelated > 0:
         safety_function.SPFM = 1 - (safety_function.RF / safety_function.safetyrelated)
-        print(f"SPFM calculation: 1 - ({safety_function.RF} / {safety_function.safetyrelated}) = {safety_function.SPFM}")
     else:
         safety_function.SPFM = 0
-        print("SPFM = 0 (no safety related failure rate)")
-    
+
     # LFM
     if (safety_function.safetyrelated - safety_function.RF) > 0:
         safety_function.LFM = 1 - (safety_function.MPFL / (safety_function.safetyrelated - safety_function.RF))
-        print(f"LFM calculation: 1 - ({safety_function.MPFL} / ({safety_function.safetyrelated} - {safety_function.RF})) = {safety_function.LFM}")
     else:
         safety_function.LFM = 0
-        print("LFM = 0 (no remaining failure rate after RF)")
-    
-    print(f"Final metrics for {safety_function.sf_id}: SPFM={safety_function.SPFM}, LFM={safety_function.LFM}, MPHF={safety_function.MPHF}")
-    safety_function.save()
-
-
-def update_failure_mode_calculations(fm):
-    print(f"Calculating failure mode: {fm.description}")
-    print(f"  Input values: is_SPF={fm.is_SPF}, is_MPF={fm.is_MPF}, Failure_rate_total={fm.Failure_rate_total}")
-    print(f"  SPF: mechanism='{fm.SPF_safety_mechanism}', coverage={fm.SPF_diagnostic_coverage}")
-    print(f"  MPF: mechanism='{fm.MPF_safety_mechanism}', coverage={fm.MPF_diagnostic_coverage}")
-    
-    # SPF
+
+    logger.debug('sf metrics sf=%s safetyrelated=%s RF=%s MPFL=%s MPFD=%s SPFM=%s LFM=%s MPHF=%s',
+                 safety_function.sf_id, safety_function.safetyrelated, safety_function.RF, safety_function.MPFL,
+                 safety_function.MPFD, safety_function.SPFM, safety_function.LFM, safety_function.MPHF)
+    if save:
+        safety_function.save()
+
+
+def update_failure_mode_calculations(fm, save=True):
+    compute_failure_mode_metrics(fm)
+    if sample_row():
+        logger.debug('fm metrics fm=%r is_SPF=%s is_MPF=%s Failure_rate_total=%s SPF_dc=%s MPF_dc=%s '
+                     'RF=%s MPFL=%s MPFD=%s', fm.description, fm.is_SPF, fm.is_MPF, fm.Failure_rate_total,
+                     fm.SPF_diagnostic_coverage, fm.MPF_diagnostic_coverage, fm.RF, fm.MPFL, fm.MPFD)
+    if save:
+        fm.save()
+
+
+def compute_failure_mode_metrics(fm):
+    """Set RF/MPFL/MPFD of ``fm`` in memory, without saving."""
     fm.RF = fm.is_SPF * fm.Failure_rate_total * (1 - (fm.SPF_diagnostic_coverage / 100))
-    print(f"  RF calculation: {fm.is_SPF} * {fm.Failure_rate_total} * (1 - {fm.SPF_diagnostic_coverage}/100) = {fm.RF}")
-    
-    # MPF
     mpf_base = fm.Failure_rate_total - fm.RF
     fm.MPFL = fm.is_MPF * mpf_base * (1 - (fm.MPF_diagnostic_coverage / 100))
     fm.MPFD = fm.is_MPF * mpf_base * (fm.MPF_diagnostic_coverage / 100)
-    
-    print(f"  MPF base: {fm.Failure_rate_total} - {fm.RF} = {mpf_base}")
-    print(f"  MPFL calculation: {fm.is_MPF} * {mpf_base} * (1 - {fm.MPF_diagnostic_coverage}/100) = {fm.MPFL}")
-    print(f"  MPFD calculation: {fm.is_MPF} * {mpf_base} * {fm.MPF_diagnostic_coverage}/100 = {fm.MPFD}")
-    
-    fm.save() 
\ No newline at end of file
+    return fm
+
+
+def persist_metrics(failure_modes, safety_functions, batch_size=BULK_UPDATE_BATCH_SIZE):
+    """Write computed FM and SF metrics back in chunked bulk_update calls.
+
+    Everything runs in one transaction, so a calculation either lands
+    completely or not at all.
+    """
+    with span('persist'), transaction.atomic():
+        if failure_modes:
+            FailureMode.objects.bulk_update(failure_modes, FM_METRIC_FIELDS, batch_size=batch_size)
+        if safety_functions:
+            SafetyFunction.objects.bulk_update(safety_functions, SF_METRIC_FIELDS, batch_size=batch_size)
+
+
+def calculate_project_metrics_orm(project, update_failure_modes=True):
+    """Recalculate every FM and SF of ``project`` with the per-object formulas.
+
+    FMs are computed in memory (once, even when shared by several SFs); the
+    ones whose metrics changed are persisted together with the SF metrics by
+    persist_metrics(). Returns the updated SafetyFunctions.
+    """
+    lifetime = float(project.lifetime)
+    with span('load'):
+        failure_modes = list(FailureMode.objects.filter(component__project=project))
+        safety_functions = list(
+            project.safety_functions.order_by('id').prefetch_related('related_components__failure_modes')
+        )
+
+    with span('compute'):
+        changed = []
+        for fm in failure_modes:
+            stored = fm.RF, fm.MPFL, fm.MPFD
+            update_failure_mode_calculations(fm, save=False)
+            if (fm.RF, fm.MPFL, fm.MPFD) != stored:
+                changed.append(fm)
+        for sf in safety_functions:
+            calculate_fmeda_metrics(sf, lifetime, save=False)
+
+    persist_metrics(changed if update_failure_modes else [], safety_functions)
+    return safety_functions
+
+
+def load_columnar_project(project):
+    """Load a project's rows into a ColumnarProject with a fixed number of queries.
+
+    Returns ``(columnar, safety_functions, failure_modes)``; the two lists are
+    in the same order as the SF and FM arrays of ``columnar``.
+    """
+    safety_functions = list(project.safety_functions.order_by('id'))
+    sf_index = {sf.id: i for i, sf in enumerate(safety_functions)}
+
+    comp_rows = list(project.components.order_by('id').values_list('id', 'failure_rate'))
+    comp_index = {pk: i for i, (pk, _) in enumerate(comp_rows)}
+
+    failure_modes = list(
+        FailureMode.objects.filter(component__project=project)
+        .only('id', 'component_id', 'Failure_rate_total', 'is_SPF', 'is_MPF',
+              'SPF_diagnostic_coverage', 'MPF_diagnostic_coverage', 'RF', 'MPFL', 'MPFD')
+        .order_by('id')
+    )
+
+    links = list(
+        Component.related_sfs.through.objects
+        .filter(component__project=project)
+        .values_list('safetyfunction_id', 'component_id')
+    )
+    links = [(sf_index[sf_pk], comp_index[comp_pk]) for sf_pk, comp_pk in links if sf_pk in sf_index]
+
+    columnar = ColumnarProject(
+        sf_ids=[sf.sf_id for sf in safety_functions],
+        comp_failure_rate=[rate for _, rate in comp_rows],
+        fm_component=[comp_index[fm.component_id] for fm in failure_modes],
+        fm_failure_rate=[fm.Failure_rate_total for fm in failure_modes],
+        fm_is_spf=[fm.is_SPF for fm in failure_modes],
+        fm_is_mpf=[fm.is_MPF for fm in failure_modes],
+        fm_spf_dc=[fm.SPF_diagnostic_coverage for fm in failure_modes],
+        fm_mpf_dc=[fm.MPF_diagnostic_coverage for fm in failure_modes],
+        link_sf=[s for s, _ in links],
+        link_component=[c for _, c in links],
+    )
+    return columnar, safety_functions, failure_modes
+
+
+def calculate_project_metrics_vectorized(project, update_failure_modes=True):
+    """Recalculate every FM and SF of ``project`` with the columnar engine.
+
+    Same results as update_failure_mode_calculations() + calculate_fmeda_metrics()
+    but with a constant number of queries. Returns the updated SafetyFunctions.
+    """
+    with span('load'):
+        columnar, safety_functions, failure_modes = load_columnar_project(project)
+
+    with span('compute'):
+        result = columnar.evaluate(float(project.lifetime))
+        # Stored FM metrics are usually current (set on import and save), and
+        # bulk_update costs far more than the comparison: write the changed ones
+        changed = []
+        for fm, rf, mpfl, mpfd in zip(failure_modes, result.fm_RF.tolist(),
+                                      result.fm_MPFL.tolist(), result.fm_MPFD.tolist()):
+            if (fm.RF, fm.MPFL, fm.MPFD) != (rf, mpfl, mpfd):
+                fm.RF = rf
+                fm.MPFL = mpfl
+                fm.MPFD = mpfd
+                changed.append(fm)
+        for sf, row in zip(safety_functions, result.rows()):
+            for name in SF_METRIC_FIELDS:
+                setattr(sf, name, row[name])
+
+    persist_metrics(changed if update_failure_modes else [], safety_functions)
+    return safety_functions
+
+
+def sf_result(sf):
+    """Serialize the metrics of a SafetyFunction for the results endpoints."""
+    return {
+        'safety_function': sf.id,
+        'sf_id': sf.sf_id,
+        'spfm': sf.SPFM * 100 if sf.SPFM else 0,
+        'lfm': sf.LFM * 100 if sf.LFM else 0,
+        'mphf': sf.MPHF,
+        'rf': sf.RF,
+        'mpfl': sf.MPFL,
+        'mpfd': sf.MPFD
+    }
+
+
+def failure_mode_metric_expressions():
+    """Return ``(RF, MPFL, MPFD)`` as database expressions over FailureMode columns."""
+    rate = F('Failure_rate_total')
+    is_spf = Case(When(is_SPF=True, then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+    is_mpf = Case(When(is_MPF=True, then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+    rf = is_spf * rate * (Value(1.0) - F('SPF_diagnostic_coverage') / Value(100.0))
+    mpf_base = rate - rf
+    mpfl = is_mpf * mpf_base * (Value(1.0) - F('MPF_diagnostic_coverage') / Value(100.0))
+    mpfd = is_mpf * mpf_base * (F('MPF_diagnostic_coverage') / Value(100.0))
+    return rf, mpfl, mpfd
+
+
+def update_failure_modes_in_db(failure_modes):
+    """Recompute RF/MPFL/MPFD of a FailureMode queryset with a single UPDATE."""
+    rf, mpfl, mpfd = failure_mode_metric_expressions()
+    return failure_modes.update(RF=rf, MPFL=mpfl, MPFD=mpfd)
+
+
+def aggregate_sf_totals(safety_functions):
+    """Sum the FM and component rates of each SF with two grouped queries.
+
+    Returns ``{sf_pk: (RF, MPFL, MPFD, safetyrelated)}``; SFs without related
+    components are missing from the result.
+    """
+    rf, mpfl, mpfd = failure_mode_metric_expressions()
+    fm_totals = (
+        FailureMode.objects.filter(component__related_sfs__in=safety_functions)
+        .values('component__related_sfs')
+        .annotate(total_rf=Sum(rf), total_mpfl=Sum(mpfl), total_mpfd=Sum(mpfd))
+        .values_list('component__related_sfs', 'total_rf', 'total_mpfl', 'total_mpfd')
+    )
+    rate_totals = (
+        Component.related_sfs.through.objects.filter(safetyfunction__in=safety_functions)
+        .values('safetyfunction_id')
+        .annotate(total=Sum('component__failure_rate'))
+        .values_list('safetyfunction_id', 'total')
+    )
+    totals = {sf_pk: [0.0, 0.0, 0.0, total or 0.0] for sf_pk, total in rate_totals}
+    for sf_pk, total_rf, total_mpfl, total_mpfd in fm_totals:
+        if sf_pk in totals:
+            totals[sf_pk][:3] = [total_rf or 0.0, total_mpfl or 0.0, total_mpfd or 0.0]
+    return {sf_pk: tuple(values) for sf_pk, values in totals.items()}
+
+
+def apply_sf_totals(safety_function, rf, mpfl, mpfd, safetyrelated, lifetime):
+    """Set the totals of a SafetyFunction and derive MPHF, SPFM and LFM from them."""
+    safety_function.RF = rf
+    safety_function.MPFL = mpfl
+    safety_function.MPFD = mpfd
+    safety_function.safetyrelated = safetyrelated
+    safety_function.MPHF = (rf / 1e9) + ((mpfl / 1e9) * (mpfd / 1e9) * lifetime)
+    safety_function.SPFM = 1 - (rf / safetyrelated) if safetyrelated > 0 else 0
+    safety_function.LFM = 1 - (mpfl / (safetyrelated - rf)) if (safetyrelated - rf) > 0 else 0
+
+
+def calculate_project_metrics_aggregate(project, update_failure_modes=True):
+    """Recalculate every FM and SF of ``project`` inside the database.
+
+    FM fields are refreshed with one UPDATE and the per-SF sums come from
+    grouped SUM queries, so the query count does not depend on project size.
+    Returns the updated SafetyFunctions.
+    """
+    lifetime = float(project.lifetime)
+    with span('load'):
+        safety_functions = list(project.safety_functions.order_by('id'))
+    with transaction.atomic():
+        # The sums run in the database, so compute is mostly query time
+        with span('compute'):
+            if update_failure_modes:
+                update_failure_modes_in_db(FailureMode.objects.filter(component__project=project))
+            totals = aggregate_sf_totals(project.safety_functions.all())
+            for sf in safety_functions:
+                apply_sf_totals(sf, *totals.get(sf.pk, (0.0, 0.0, 0.0, 0.0)), lifetime)
+        persist_metrics([], safety_functions)
+    return safety_functions
+
+
+def recalculate_safety_functions(sf_pks):
+    """Recalculate only the SFs in ``sf_pks`` (any projects) with grouped SUMs.
+
+    The FM metrics are summed from their input columns, so the cost follows
+    the SFs touched by an edit rather than the size of the project.
+    Returns the updated SafetyFunctions.
+    """
+    if not sf_pks:
+        return []
+    queryset = SafetyFunction.objects.filter(pk__in=sf_pks)
+    safety_functions = list(queryset.select_related('project').order_by('id'))
+    totals = aggregate_sf_totals(queryset)
+    for sf in safety_functions:
+        apply_sf_totals(sf, *totals.get(sf.pk, (0.0, 0.0, 0.0, 0.0)), float(sf.project.lifetime))
+    persist_metrics([], safety_functions)
+    bump_data_version(project_ids={sf.project_id for sf in safety_functions})
+    return safety_functions
+
+
+CALCULATION_ENGINES = {
+    'vectorized': calculate_project_metrics_vectorized,
+    'aggregate': calculate_project_metrics_aggregate,
+    'orm': calculate_project_metrics_orm,
+}
+
+
+def calculate_project_metrics(project, engine, update_failure_modes=True):
+    """Recalculate ``project`` with one of CALCULATION_ENGINES, return its SFs.
+
+    Pass ``update_failure_modes=False`` when the stored FM RF/MPFL/MPFD are
+    already current (e.g. right after an import) to only write the SFs.
+    """
+    safety_functions = CALCULATION_ENGINES[engine](project, update_failure_modes=update_failure_modes)
+    # bulk_update()/update() send no signals, bump the data version here
+    bump_data_version(project_ids=[project.pk])
+    return safety_functions
+
+
+def calculate_project_results(project_id, engine, progress=None):
+    """Calculate a project under its lock, return ``(results, data_version)``.
+
+    Results already calculated at the current data version come from the
+    results cache, so a request that waited for another calculation of the
+    same project usually finds them there. ``progress`` is called as
+    ``progress(phase, fraction)``. Raises Project.DoesNotExist.
+    """
+    with project_lock(project_id):
+        project = Project.objects.get(id=project_id)
+        version = project.data_version
+        cached = get_cached_results(project.id, version)
+        if cached is not None and cached['calculated']:
+            # Nothing changed since the last calculation (all engines agree)
+            return cached['results'], version
+
+        logger.info('calculate project=%s name=%r engine=%s', project.id, project.name, engine)
+        if progress is not None:
+            progress('calculate', 0.0)
+        safety_functions = calculate_project_metrics(project, engine)
+
+    if progress is not None:
+        progress('results', 0.0)
+    with span('serialize'):
+        results = [sf_result(sf) for sf in safety_functions]
+    # The calculation bumped the version once; anything more means another
+    # write landed meanwhile and these results must not be cached for it
+    new_version = get_data_version(project.id)
+    if new_version == version + 1:
+        cache_results(project.id, new_version, results, calculated=True)
+    return results, new_version
@@ -1,48 +1,107 @@
+import logging
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Project, SafetyFunction, Component, FailureMode
-from .serializers import ProjectSerializer, SafetyFunctionSerializer, ComponentSerializer, FailureModeSerializer
-from .utils import calculate_fmeda_metrics, update_failure_mode_calculations
+from rest_framework.exceptions import ValidationError
+from rest_framework.reverse import reverse
+from .models import Project, SafetyFunction, Component, FailureMode, Job
+from .serializers import (
+    ProjectSerializer, SafetyFunctionSerializer, ComponentSerializer, FailureModeSerializer, JobSerializer,
+    sparse_fieldset
+)
+from .bulk import BulkWriteMixin, truthy
+from .csv_io import import_project_csv, iter_project_csv
+from .instrumentation import span
+from .jobs import submit_job
+from .locks import project_lock, project_locks
+from .recalc import schedule_recalculation
+from .streams import results_events
+from .versioning import bump_data_version, get_data_version, get_cached_results, cache_results, results_etag, etag_matches
+from .utils import (
+    calculate_project_results, CALCULATION_ENGINES, sf_result, compute_failure_mode_metrics
+)
 from rest_framework.parsers import MultiPartParser
-from django.http import HttpResponse
-import pandas as pd
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+
+logger = logging.getLogger(__name__)
 
 class ProjectViewSet(viewsets.ModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
+    # Queries per request, whatever the project size (see fmeda/instrumentation.py)
+    query_budgets = {'list': 7, 'retrieve': 7}
 
-    def create(self, request, *args, **kwargs):
-        # Clear any existing data for this project name if it exists
-        project_name = request.data.get('name')
-        if project_name:
-            print(f"Creating new project: {project_name}")
-            
-            # Delete ALL existing projects and their data completely
-            print("Deleting ALL existing projects and data...")
-            
-            # Delete in reverse dependency order to avoid foreign key constraints
-            FailureMode.objects.all().delete()
-            Component.objects.all().delete()
-            SafetyFunction.objects.all().delete()
-            Project.objects.all().delete()
-            
-            print("All existing data cleared successfully")
-        
-        return super().create(request, *args, **kwargs)
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('destroy', 'clear'):
+            # The rows are only deleted, do not load the whole project first
+            return queryset
+        return ProjectSerializer.setup_eager_loading(queryset, *sparse_fieldset(self.request))
+
+    def perform_destroy(self, instance):
+        with project_lock(instance.pk):
+            instance.delete()
+
+    @action(detail=True, methods=['post'])
+    def clear(self, request, pk=None):
+        """Delete the SFs, components and FMs of this project, keep the project."""
+        project = self.get_object()
+        with project_lock(project.pk):
+            # Components take their FMs and SF links with them
+            _, deleted = Component.objects.filter(project=project).delete()
+            _, deleted_sfs = SafetyFunction.objects.filter(project=project).delete()
+        deleted.update(deleted_sfs)
+        return Response({
+            'safety_functions': deleted.get(SafetyFunction._meta.label, 0),
+            'components': deleted.get(Component._meta.label, 0),
+            'failure_modes': deleted.get(FailureMode._meta.label, 0),
+        }, status=status.HTTP_200_OK)
+
+def filter_by_query_params(queryset, query_params, **lookups):
+    """Filter ``queryset`` by the integer ids given in the query string.
+
+    ``lookups`` maps a query parameter to the ORM lookup it filters on, e.g.
+    ``project='project_id'``. Parameters that are absent are ignored.
+    """
+    filters = {}
+    for param, lookup in lookups.items():
+        value = query_params.get(param)
+        if value in (None, ''):
+            continue
+        try:
+            filters[lookup] = int(value)
+        except ValueError:
+            raise ValidationError({param: f'Invalid id: {value}'})
+    return queryset.filter(**filters).order_by('id')
 
 class SafetyFunctionViewSet(viewsets.ModelViewSet):
     queryset = SafetyFunction.objects.all()
     serializer_class = SafetyFunctionSerializer
+    query_budgets = {'list': 2}
+
+    def get_queryset(self):
+        queryset = filter_by_query_params(super().get_queryset(), self.request.query_params,
+                                          project='project_id')
+        return SafetyFunctionSerializer.setup_eager_loading(queryset, *sparse_fieldset(self.request))
 
-class ComponentViewSet(viewsets.ModelViewSet):
+class ComponentViewSet(BulkWriteMixin, viewsets.ModelViewSet):
     queryset = Component.objects.all()
     serializer_class = ComponentSerializer
+    query_budgets = {'list': 4}
+
+    def get_queryset(self):
+        queryset = filter_by_query_params(super().get_queryset(), self.request.query_params,
+                                          project='project_id')
+        return ComponentSerializer.setup_eager_loading(queryset, *sparse_fieldset(self.request))
 
     def create(self, request, *args, **kwargs):
-        print(f"ComponentViewSet.create called with data: {request.data}")
         related_sfs_ids = request.data.get('related_sfs', [])
-        print(f"related_sfs_ids: {related_sfs_ids}")
+        logger.debug('component create data=%r', request.data)
         serializer = self.get_serializer(data=request.data, context={'related_sfs': related_sfs_ids})
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
@@ -56,313 +115,243 @@ class ComponentViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance, data=request.data, partial=partial, context={'related_sfs': related_sfs_ids})
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
+        if getattr(instance, '_prefetched_objects_cache', None):
+            # Drop the prefetched relations so the response reflects the update
+            instance._prefetched_objects_cache = {}
         return Response(serializer.data)
 
-class FailureModeViewSet(viewsets.ModelViewSet):
+    def bulk_related_objects(self, rows):
+        sf_ids = {
+            sf_id for row in rows if isinstance(row, dict) and isinstance(row.get('related_sfs'), list)
+            for sf_id in row['related_sfs'] if isinstance(sf_id, int)
+        }
+        return {'related_sfs': SafetyFunction.objects.in_bulk(sf_ids) if sf_ids else {}}
+
+    def validate_bulk_row(self, row, instance, related_objects):
+        if 'related_sfs' not in row:
+            return {}
+        sf_ids = row['related_sfs']
+        if not isinstance(sf_ids, list):
+            return {'related_sfs': 'Expected a list of safety function ids.'}
+        project_id = row.get('project', instance.project_id if instance is not None else None)
+        sfs = related_objects['related_sfs']
+        missing = [sf_id for sf_id in sf_ids if not isinstance(sf_id, int) or sf_id not in sfs]
+        if missing:
+            return {'related_sfs': f'Unknown safety functions: {missing}'}
+        foreign = [sf_id for sf_id in sf_ids if sfs[sf_id].project_id != project_id]
+        if foreign:
+            return {'related_sfs': f'Safety functions of another project: {foreign}'}
+        return {}
+
+    def after_bulk_write(self, instances, rows):
+        # Replace the links of the rows that send related_sfs, in two queries
+        through = Component.related_sfs.through
+        linked = [(comp, row['related_sfs']) for comp, row in zip(instances, rows) if 'related_sfs' in row]
+        if not linked:
+            return
+        through.objects.filter(component_id__in=[comp.pk for comp, _ in linked]).delete()
+        through.objects.bulk_create(
+            [through(component_id=comp.pk, safetyfunction_id=sf_id) for comp, sf_ids in linked for sf_id in set(sf_ids)],
+            batch_size=500,
+        )
+
+    def bulk_project_ids(self, instances):
+        return {comp.project_id for comp in instances}
+
+    def schedule_bulk_recalculation(self, instances):
+        component_ids = {comp.pk for comp in instances}
+        if self.request.method == 'DELETE':
+            # Runs before the delete, while the SF links still exist (the
+            # queryset is only evaluated when recalculation is enabled)
+            schedule_recalculation(sf_ids=Component.related_sfs.through.objects.filter(
+                component_id__in=component_ids).values_list('safetyfunction_id', flat=True))
+        else:
+            schedule_recalculation(component_ids=component_ids)
+
+class FailureModeViewSet(BulkWriteMixin, viewsets.ModelViewSet):
     queryset = FailureMode.objects.all()
     serializer_class = FailureModeSerializer
+    bulk_update_fields = ('RF', 'MPFL', 'MPFD')
+    query_budgets = {'list': 1, 'by_component': 2}
+
+    def get_queryset(self):
+        return filter_by_query_params(super().get_queryset(), self.request.query_params,
+                                      project='component__project_id', component='component_id')
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        # FailureMode has no post_delete receiver, see fmeda/signals.py
+        bump_data_version(component_ids=[instance.component_id])
+        schedule_recalculation(component_ids=[instance.component_id])
+
+    def schedule_bulk_recalculation(self, instances):
+        schedule_recalculation(component_ids={fm.component_id for fm in instances})
+
+    def prepare_bulk_instance(self, instance, row):
+        compute_failure_mode_metrics(instance)
+
+    def bulk_project_ids(self, instances):
+        component_ids = {fm.component_id for fm in instances}
+        return set(Component.objects.filter(id__in=component_ids).values_list('project_id', flat=True))
 
     def create(self, request, *args, **kwargs):
-        print(f"FailureModeViewSet.create called with data: {request.data}")
+        logger.debug('fm create data=%r', request.data)
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
-        print(f"Created failure mode: {serializer.data}")
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
     def update(self, request, *args, **kwargs):
-        print(f"FailureModeViewSet.update called with data: {request.data}")
+        logger.debug('fm update pk=%s data=%r', kwargs.get('pk'), request.data)
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
-        print(f"Updated failure mode: {serializer.data}")
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'], url_path='by-component/(?P<component_id>[^/.]+)')
     def by_component(self, request, component_id=None):
         """Get all failure modes for a specific component"""
-        print(f"by_component called with component_id: {component_id} (type: {type(component_id)})")
         try:
             # Convert component_id to integer if it's a string
             if isinstance(component_id, str):
                 component_id = int(component_id)
             
             component = Component.objects.get(id=component_id)
-            print(f"Found component: {component.comp_id} (ID: {component.id})")
             failure_modes = FailureMode.objects.filter(component=component)
-            print(f"Found {failure_modes.count()} failure modes for component {component_id}")
-            for fm in failure_modes:
-                print(f"  - {fm.description} (ID: {fm.id})")
             serializer = self.get_serializer(failure_modes, many=True)
             return Response(serializer.data)
         except Component.DoesNotExist:
-            print(f"Component with ID {component_id} not found")
             return Response({'detail': 'Component not found.'}, status=status.HTTP_404_NOT_FOUND)
         except ValueError as e:
-            print(f"Invalid component ID format: {component_id}")
             return Response({'detail': 'Invalid component ID format.'}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            print(f"Error getting failure modes for component {component_id}: {e}")
+            logger.exception('by_component failed component=%s', component_id)
             return Response({'detail': f'Error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 # Placeholder for FMEDA calculation endpoint
 from rest_framework.views import APIView
+
 class FMEDACalculateView(APIView):
     def post(self, request, *args, **kwargs):
         project_id = request.data.get('project')
         if not project_id:
             return Response({'detail': 'project is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        engine = request.data.get('engine') or settings.FMEDA_CALCULATION_ENGINE
+        if engine not in CALCULATION_ENGINES:
+            return Response({'detail': f'Unknown engine {engine!r}, expected one of {list(CALCULATION_ENGINES)}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            project = Project.objects.get(id=project_id)
+            project = Project.objects.get(id=int(project_id))
+        except (TypeError, ValueError, Project.DoesNotExist):
+            return Response({'detail': 'Project not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        if truthy(request.query_params.get('async')):
+            job = submit_job(Job.KIND_CALCULATE, project=project, params={'engine': engine})
+            return job_accepted(request, job)
+
+        # One calculation per project at a time (see calculate_project_results)
+        try:
+            results, version = calculate_project_results(project.id, engine)
         except Project.DoesNotExist:
             return Response({'detail': 'Project not found.'}, status=status.HTTP_404_NOT_FOUND)
-        
-        print(f"FMEDA Calculation for Project: {project.name} (ID: {project.id})")
-        print(f"Project has {project.safety_functions.count()} Safety Functions")
-        print(f"Project has {project.components.count()} Components")
-        
-        # Debug: Check component-safety function relationships
-        for comp in project.components.all():
-            print(f"Component {comp.comp_id}: related_sfs = {[sf.sf_id for sf in comp.related_sfs.all()]}")
-        
-        # Update all FailureModes for all components in the project
-        for comp in project.components.all():
-            print(f"Processing Component: {comp.comp_id} with {comp.failure_modes.count()} failure modes")
-            for fm in comp.failure_modes.all():
-                update_failure_mode_calculations(fm)
-        
-        # Update all SafetyFunctions
-        for sf in project.safety_functions.all():
-            print(f"Processing Safety Function: {sf.sf_id}")
-            calculate_fmeda_metrics(sf, float(project.lifetime))
-        
-        # Return results for each safety function
-        results = []
-        for sf in project.safety_functions.all():
-            result = {
-                'safety_function': sf.id,
-                'sf_id': sf.sf_id,
-                'spfm': sf.SPFM * 100 if sf.SPFM else 0,
-                'lfm': sf.LFM * 100 if sf.LFM else 0,
-                'mphf': sf.MPHF,
-                'rf': sf.RF,
-                'mpfl': sf.MPFL,
-                'mpfd': sf.MPFD
-            }
-            results.append(result)
-            print(f"Result for {sf.sf_id}: SPFM={result['spfm']}, LFM={result['lfm']}, MPHF={result['mphf']}")
-        
-        print(f"Returning {len(results)} results")
-        return Response(results, status=status.HTTP_200_OK)
+
+        return Response(results, status=status.HTTP_200_OK, headers={'ETag': results_etag(project.id, version)})
 
 class ProjectResultsView(APIView):
+    query_budgets = {'get': 2}
+
     def get(self, request, project_id, *args, **kwargs):
-        try:
-            project = Project.objects.get(id=project_id)
-        except Project.DoesNotExist:
+        version = get_data_version(project_id)
+        if version is None:
             return Response({'detail': 'Project not found.'}, status=status.HTTP_404_NOT_FOUND)
-        
-        # Return results for each safety function
-        results = []
-        for sf in project.safety_functions.all():
-            results.append({
-                'safety_function': sf.id,
-                'sf_id': sf.sf_id,
-                'spfm': sf.SPFM * 100 if sf.SPFM else 0,
-                'lfm': sf.LFM * 100 if sf.LFM else 0,
-                'mphf': sf.MPHF,
-                'rf': sf.RF,
-                'mpfl': sf.MPFL,
-                'mpfd': sf.MPFD
-            })
-        
-        return Response(results, status=status.HTTP_200_OK)
+
+        etag = results_etag(project_id, version)
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        cached = get_cached_results(project_id, version)
+        if cached is not None:
+            results = cached['results']
+        else:
+            # Return results for each safety function
+            results = [sf_result(sf) for sf in SafetyFunction.objects.filter(project_id=project_id)]
+            cache_results(project_id, version, results)
+
+        return Response(results, status=status.HTTP_200_OK, headers={'ETag': etag})
+
+class ProjectResultsStreamView(View):
+    """Server-Sent Events with the results of a project as it changes (see fmeda/streams.py)."""
+
+    async def get(self, request, project_id, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            # Under WSGI the endless stream would be buffered, never sent
+            return JsonResponse({'detail': 'Live results need the ASGI server (fmeda_backend.asgi).'},
+                                status=status.HTTP_501_NOT_IMPLEMENTED)
+        if await sync_to_async(get_data_version)(project_id) is None:
+            return JsonResponse({'detail': 'Project not found.'}, status=status.HTTP_404_NOT_FOUND)
+        response = StreamingHttpResponse(
+            results_events(project_id, request.headers.get('Last-Event-ID')), content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # nginx: pass events through as they come
+        return response
 
 class ProjectImportCSVView(APIView):
     parser_classes = [MultiPartParser]
     http_method_names = ['post']  # Only allow POST method
     
     def post(self, request, *args, **kwargs):
-        print("=== ProjectImportCSVView.post called ===")
-        print(f"Request method: {request.method}")
-        print(f"Request path: {request.path}")
-        print(f"Request FILES: {request.FILES}")
-        print(f"Request data: {request.data}")
-        
         file_obj = request.FILES.get('file')
         if not file_obj:
-            print("No file uploaded")
             return Response({'detail': 'No file uploaded.'}, status=status.HTTP_400_BAD_REQUEST)
+        replace_id = request.data.get('replace')
+        if replace_id is not None:
+            try:
+                replace_id = int(replace_id)
+            except (TypeError, ValueError):
+                return Response({'detail': f'Invalid project id to replace: {replace_id}'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if not Project.objects.filter(id=replace_id).exists():
+                return Response({'detail': 'Project to replace not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if truthy(request.query_params.get('async')):
+            job = submit_job(Job.KIND_IMPORT, params={'replace': replace_id}, upload=file_obj)
+            return job_accepted(request, job)
         try:
-            print(f"Importing file: {file_obj.name}")
-            df = pd.read_csv(file_obj)
-            print(f"CSV columns: {df.columns.tolist()}")
-            print(f"CSV shape: {df.shape}")
-            print(f"First few rows:")
-            print(df.head())
-            
-            # Clear ALL existing data before importing new project
-            print("=== Clearing existing data before import ===")
-            FailureMode.objects.all().delete()
-            Component.objects.all().delete()
-            SafetyFunction.objects.all().delete()
-            Project.objects.all().delete()
-            print("Successfully cleared all existing data")
-            
-            # Create new project
-            project_row = df[df['section'] == 'project'].iloc[0]
-            print(f"Project row: {project_row.to_dict()}")
-            project = Project.objects.create(
-                name=project_row['name'],
-                lifetime=float(project_row['lifetime']) if pd.notna(project_row['lifetime']) else 0
-            )
-            print(f"Created project: {project.name} (ID: {project.id})")
-            
-            sf_map = {}
-            for _, row in df[df['section'] == 'sf'].iterrows():
-                print(f"Creating SF: {row.to_dict()}")
-                sf = SafetyFunction.objects.create(
-                    project=project,
-                    sf_id=str(int(row['id'])) if pd.notna(row['id']) else str(row['id']),
-                    description=row.get('description', ''),
-                    target_integrity_level=row.get('target_integrity_level', '')
-                )
-                sf_map[sf.sf_id] = sf
-                print(f"Created SF: {sf.sf_id}")
-            
-            comp_map = {}
-            for _, row in df[df['section'] == 'component'].iterrows():
-                print(f"Creating component: {row.to_dict()}")
-                
-                # Convert component ID to string and handle float values
-                comp_id = str(int(row['id'])) if pd.notna(row['id']) else str(row['id'])
-                
-                # Determine if component is safety related based on related_sf_ids or explicit field
-                is_safety_related = False
-                if pd.notna(row.get('related_sf_ids', '')) and str(row.get('related_sf_ids', '')).strip():
-                    is_safety_related = True
-                elif pd.notna(row.get('is_safety_related', '')):
-                    is_safety_related = bool(row.get('is_safety_related'))
-                
-                comp = Component.objects.create(
-                    project=project,
-                    comp_id=comp_id,
-                    type=row.get('type', ''),
-                    failure_rate=float(row['failure_rate']) if pd.notna(row['failure_rate']) else 0,
-                    is_safety_related=is_safety_related
-                )
-                comp_map[comp.comp_id] = comp
-                print(f"Created component: {comp.comp_id} (safety_related: {is_safety_related})")
-            
-            for _, row in df[df['section'] == 'fm'].iterrows():
-                print(f"Creating FM: {row.to_dict()}")
-                comp_id = str(int(row['component_id'])) if pd.notna(row['component_id']) else str(row['component_id'])
-                comp = comp_map.get(comp_id)
-                if comp:
-                    fm = FailureMode.objects.create(
-                        component=comp,
-                        description=row.get('description', ''),
-                        Failure_rate_total=float(row.get('Failure_rate_total', 0)),
-                        system_level_effect=row.get('system_level_effect', ''),
-                        is_SPF=int(float(row.get('is_SPF', 0))) if pd.notna(row.get('is_SPF', 0)) else 0,
-                        is_MPF=int(float(row.get('is_MPF', 0))) if pd.notna(row.get('is_MPF', 0)) else 0,
-                        SPF_safety_mechanism=row.get('SPF_safety_mechanism', ''),
-                        SPF_diagnostic_coverage=float(row.get('SPF_diagnostic_coverage', 0)),
-                        MPF_safety_mechanism=row.get('MPF_safety_mechanism', ''),
-                        MPF_diagnostic_coverage=float(row.get('MPF_diagnostic_coverage', 0)),
-                    )
-                    # Calculate FM metrics
-                    update_failure_mode_calculations(fm)
-                    print(f"Created FM for component {comp_id}")
-                else:
-                    print(f"Warning: Component {comp_id} not found for FM. Available components: {list(comp_map.keys())}")
-            
-            # Link related_sfs for components
-            print(f"=== Linking components to safety functions ===")
-            print(f"Available safety functions in sf_map: {list(sf_map.keys())}")
-            
-            for _, row in df[df['section'] == 'component'].iterrows():
-                comp_id = str(int(row['id'])) if pd.notna(row['id']) else str(row['id'])
-                comp = comp_map.get(comp_id)
-                if comp and pd.notna(row.get('related_sf_ids', '')) and str(row.get('related_sf_ids', '')).strip():
-                    # Handle different possible formats of related_sf_ids
-                    related_sf_ids_raw = str(row.get('related_sf_ids', '')).strip()
-                    print(f"Raw related_sf_ids for component {comp.comp_id}: '{related_sf_ids_raw}'")
-                    
-                    # Split by comma and clean up each ID
-                    sf_ids = []
-                    if related_sf_ids_raw:
-                        # Split by comma and clean up
-                        sf_ids = [s.strip() for s in related_sf_ids_raw.split(',') if s.strip()]
-                        print(f"Parsed SF IDs for component {comp.comp_id}: {sf_ids}")
-                    
-                    # Link each safety function
-                    linked_count = 0
-                    for sfid in sf_ids:
-                        sf = sf_map.get(sfid)
-                        if sf:
-                            comp.related_sfs.add(sf)
-                            linked_count += 1
-                            print(f"Linked {comp.comp_id} to {sf.sf_id}")
-                        else:
-                            print(f"Warning: SF {sfid} not found in sf_map. Available SFs: {list(sf_map.keys())}")
-                    
-                    print(f"Successfully linked {linked_count} safety functions to component {comp.comp_id}")
-                elif comp:
-                    print(f"No related_sf_ids found for component {comp.comp_id}")
-                else:
-                    print(f"Component {comp_id} not found in comp_map. Available components: {list(comp_map.keys())}")
-            
-            # Calculate SF metrics
-            for sf in project.safety_functions.all():
-                calculate_fmeda_metrics(sf, project.lifetime)
-                print(f"Calculated metrics for SF: {sf.sf_id}")
-            
-            serializer = ProjectSerializer(project)
-            print(f"Import completed successfully for project: {project.name}")
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            # Other projects are left alone; with ``replace`` the old project
+            # is swapped for the imported one in a single transaction
+            project, importer = import_project_csv(file_obj, replace=replace_id)
+            serializer = ProjectSerializer(ProjectSerializer.setup_eager_loading(Project.objects).get(pk=project.pk))
+            with span('serialize'):
+                data = serializer.data
+            return Response(data, status=status.HTTP_201_CREATED)
         except Exception as e:
-            print(f"Import failed with error: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception('import failed file=%r', file_obj.name)
             return Response({'detail': f'Import failed: {e}'}, status=status.HTTP_400_BAD_REQUEST)
 
 class ProjectExportCSVView(APIView):
     def get(self, request, project_id, *args, **kwargs):
         try:
             project = Project.objects.get(id=project_id)
-            rows = []
-            rows.append({'section': 'project', 'name': project.name, 'lifetime': project.lifetime})
-            for sf in project.safety_functions.all():
-                rows.append({'section': 'sf', 'id': sf.sf_id, 'description': sf.description, 'target_integrity_level': sf.target_integrity_level})
-            for comp in project.components.all():
-                related_sf_ids = ','.join([sf.sf_id for sf in comp.related_sfs.all()])
-                rows.append({
-                    'section': 'component', 
-                    'id': comp.comp_id, 
-                    'type': comp.type, 
-                    'failure_rate': comp.failure_rate, 
-                    'related_sf_ids': related_sf_ids,
-                    'is_safety_related': comp.is_safety_related
-                })
-            for comp in project.components.all():
-                for fm in comp.failure_modes.all():
-                    rows.append({'section': 'fm', 'component_id': comp.comp_id, 'description': fm.description, 'Failure_rate_total': fm.Failure_rate_total, 'system_level_effect': fm.system_level_effect, 'is_SPF': fm.is_SPF, 'SPF_safety_mechanism': fm.SPF_safety_mechanism, 'SPF_diagnostic_coverage': fm.SPF_diagnostic_coverage, 'is_MPF': fm.is_MPF, 'MPF_safety_mechanism': fm.MPF_safety_mechanism, 'MPF_diagnostic_coverage': fm.MPF_diagnostic_coverage})
-            df = pd.DataFrame(rows)
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename="{project.name}_fmeda.csv"'
-            df.to_csv(response, index=False)
-            return response
-        except Exception as e:
-            return Response({'detail': f'Export failed: {e}'}, status=status.HTTP_400_BAD_REQUEST) 
+        except Project.DoesNotExist as e:
+            return Response({'detail': f'Export failed: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        # Rows are written as they are read, nothing is buffered
+        response = StreamingHttpResponse(iter_project_csv(project), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{project.name}_fmeda.csv"'
+        return response
 
 class ProjectDebugView(APIView):
+    query_budgets = {'get': 6}
+
     def get(self, request, project_id, *args, **kwargs):
         try:
-            project = Project.objects.get(id=project_id)
+            project = Project.objects.prefetch_related(
+                'safety_functions__related_components', 'components__related_sfs', 'components__failure_modes'
+            ).get(id=project_id)
         except Project.DoesNotExist:
             return Response({'detail': 'Project not found.'}, status=status.HTTP_404_NOT_FOUND)
         
@@ -426,19 +415,29 @@ class ProjectDebugView(APIView):
         return Response(debug_data, status=status.HTTP_200_OK) 
 
 class ProjectClearAllView(APIView):
-    def get(self, request, *args, **kwargs):
-        try:
-            # Clear all projects and related data
-            print("Clearing ALL projects and data...")
-            
-            # Delete all data in reverse dependency order
-            FailureMode.objects.all().delete()
-            Component.objects.all().delete()
-            SafetyFunction.objects.all().delete()
-            Project.objects.all().delete()
-            
-            print("Successfully cleared all projects and data")
-            return Response({'detail': 'All projects and data cleared successfully'}, status=status.HTTP_200_OK)
-        except Exception as e:
-            print(f"Error clearing data: {e}")
-            return Response({'detail': f'Error clearing data: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR) 
\ No newline at end of file
+    """Reset: delete every project, under the lock of each one."""
+
+    def post(self, request, *args, **kwargs):
+        logger.warning('clearing all projects')
+        project_ids = list(Project.objects.values_list('pk', flat=True))
+        with project_locks(project_ids):
+            # Projects take their SFs, components and FMs with them
+            _, deleted = Project.objects.filter(pk__in=project_ids).delete()
+        return Response({'detail': 'All projects and data cleared successfully',
+                         'projects': deleted.get(Project._meta.label, 0)}, status=status.HTTP_200_OK)
+
+
+def job_accepted(request, job):
+    """202 response for a queued job, pointing at its status endpoint."""
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED,
+                    headers={'Location': reverse('job-detail', args=[job.pk], request=request)})
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Status, progress, phase timings and result of background jobs."""
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+
+    def get_queryset(self):
+        return filter_by_query_params(super().get_queryset(), self.request.query_params,
+                                      project='project_id')
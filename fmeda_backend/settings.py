@@ -1,6 +1,7 @@
 from pathlib import Path
 import os
 import secrets
+import tempfile
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -26,6 +27,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'fmeda.middleware.CompressionMiddleware',                # brotli/gzip, see FMEDA_COMPRESS_MIN_SIZE
+    'fmeda.instrumentation.InstrumentationMiddleware',       # Server-Timing, query budgets
     'django.contrib.sessions.middleware.SessionMiddleware',  # ✅ Required
     'corsheaders.middleware.CorsMiddleware',                 # CORS (after sessions)
     'django.middleware.common.CommonMiddleware',
@@ -33,6 +36,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',  # ✅ Required
     'django.contrib.messages.middleware.MessageMiddleware',     # ✅ Required
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'fmeda.middleware.RecalculationBatchMiddleware',
 ]
 
 # CORS settings for production
@@ -119,6 +123,99 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# FMEDA calculation engine used by /fmeda/calculate/ when the request does not
+# pick one: 'vectorized' (NumPy), 'aggregate' (SQL SUM) or 'orm' (per-object)
+FMEDA_CALCULATION_ENGINE = os.environ.get('FMEDA_CALCULATION_ENGINE', 'vectorized')
+
+# Recalculate the affected safety functions whenever a failure mode, component
+# or SF <-> component link is saved, instead of only on /fmeda/calculate/
+FMEDA_AUTO_RECALCULATE = os.environ.get('FMEDA_AUTO_RECALCULATE', 'False').lower() == 'true'
+
+# Background jobs (?async=true on import-csv and calculate, see fmeda/jobs.py).
+# Every web process starts FMEDA_JOB_WORKERS worker threads on its first
+# request; set it to 0 to leave the queue to `manage.py run_fmeda_jobs`.
+# A running job without a heartbeat for FMEDA_JOB_STALE_AFTER seconds is
+# queued again (not on SQLite, which has no heartbeats), and so is one whose
+# worker process on the same host is gone when workers start.
+FMEDA_JOB_WORKERS = int(os.environ.get('FMEDA_JOB_WORKERS', '2'))
+FMEDA_JOB_STALE_AFTER = int(os.environ.get('FMEDA_JOB_STALE_AFTER', '60'))
+FMEDA_JOB_MAX_ATTEMPTS = int(os.environ.get('FMEDA_JOB_MAX_ATTEMPTS', '3'))
+
+# Live results (/fmeda/stream/<id>/, ASGI only): how often each process checks
+# a watched project's data version, and how long one stream stays open before
+# the browser reconnects
+FMEDA_STREAM_POLL_INTERVAL = float(os.environ.get('FMEDA_STREAM_POLL_INTERVAL', '1.0'))
+FMEDA_STREAM_MAX_AGE = int(os.environ.get('FMEDA_STREAM_MAX_AGE', '300'))
+
+# Results of /fmeda/results/ and /fmeda/calculate/ are cached per
+# (project, data version) in this cache alias. The default is an in-process
+# LRU cache; point FMEDA_RESULTS_CACHE_BACKEND/LOCATION at e.g. Redis to
+# share it between workers.
+FMEDA_RESULTS_CACHE = 'fmeda-results'
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    FMEDA_RESULTS_CACHE: {
+        'BACKEND': os.environ.get('FMEDA_RESULTS_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('FMEDA_RESULTS_CACHE_LOCATION', 'fmeda-results'),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('FMEDA_RESULTS_CACHE_ENTRIES', '512')),
+        },
+    },
+}
+
+# List endpoints return plain arrays unless ?cursor= or ?page_size= is given.
+# JSON is rendered with orjson when installed; MessagePack is served to
+# clients asking for application/msgpack when msgpack is installed.
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'fmeda.pagination.OptInCursorPagination',
+    'PAGE_SIZE': 100,
+    'DEFAULT_RENDERER_CLASSES': [
+        'fmeda.renderers.FastJSONRenderer',
+        'fmeda.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS': 'fmeda.renderers.ContentNegotiation',
+}
+
+# Responses of at least this many bytes are compressed (brotli or gzip)
+FMEDA_COMPRESS_MIN_SIZE = int(os.environ.get('FMEDA_COMPRESS_MIN_SIZE', '1024'))
+
+# Query count, DB time and phase spans of each request as a Server-Timing
+# header and a JSON log line. Requests over their view's query budget log a
+# warning ('warn'), fail ('raise') or are not checked ('off').
+FMEDA_INSTRUMENT_REQUESTS = os.environ.get('FMEDA_INSTRUMENT_REQUESTS', 'True').lower() == 'true'
+FMEDA_QUERY_BUDGETS = os.environ.get('FMEDA_QUERY_BUDGETS', 'warn').lower()
+
+# /metrics (Prometheus text format). The workers of a host add their request
+# latencies and cache lookups to this SQLite file, every
+# FMEDA_METRICS_FLUSH_INTERVAL seconds at most; an empty value keeps each
+# process's metrics to itself. Give every deployment on a host its own file.
+FMEDA_METRICS_FILE = os.environ.get('FMEDA_METRICS_FILE', os.path.join(tempfile.gettempdir(), 'fmeda-metrics.sqlite3'))
+FMEDA_METRICS_FLUSH_INTERVAL = float(os.environ.get('FMEDA_METRICS_FLUSH_INTERVAL', '5.0'))
+
+# The fmeda app logs imports, calculations and jobs at INFO. DEBUG adds the
+# per-SF metrics and every FMEDA_LOG_SAMPLE_EVERY-th failure mode / CSV row
+# (see fmeda/logs.py).
+FMEDA_LOG_LEVEL = os.environ.get('FMEDA_LOG_LEVEL', 'INFO').upper()
+FMEDA_LOG_SAMPLE_EVERY = int(os.environ.get('FMEDA_LOG_SAMPLE_EVERY', '100'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'fmeda': {'format': '%(asctime)s level=%(levelname)s logger=%(name)s %(message)s'},
+    },
+    'handlers': {
+        'fmeda': {'class': 'logging.StreamHandler', 'formatter': 'fmeda'},
+    },
+    'loggers': {
+        'fmeda': {'handlers': ['fmeda'], 'level': FMEDA_LOG_LEVEL, 'propagate': False},
+    },
+}
+
 # Security settings for production
 if not DEBUG:
     SECURE_BROWSER_XSS_FILTER = True
@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
- 
+
+from fmeda.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),  # Prometheus, see fmeda/metrics.py
     path('', include('fmeda.urls')),
 ] 
\ No newline at end of file
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Headless FMEDA command line.
+
+Evaluates project CSVs (the single-CSV format of the GUI and the backend
+export) without importing tkinter, ttkbootstrap or pandas:
+
+    python fmeda_cli.py evaluate "FMEDA Project1.csv"
+    python fmeda_cli.py evaluate project.csv --format csv -o results.csv
+    python fmeda_cli.py batch variants/ "more/*.csv" --jobs 8 -o summary.csv
+    python fmeda_cli.py sensitivity project.csv --mechanism Watchdog 60:99:40 \
+        --failure-mode C12 "Open circuit" Failure_rate_total 0.5,1,2 -o surface.csv
+
+Small projects are evaluated with the FMEDA.py objects; NumPy is only
+imported for large ones (see --engine), and modules only some commands need
+are imported by those commands, so a cold start stays under the 50 ms
+target on the bundled example (benchmarks/bench_cli_startup.py).
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+from fmeda_io import read_project_csv
+
+# below this many failure modes importing NumPy costs more than it saves
+VECTORIZE_MIN_FMS = 5000
+
+RESULT_COLUMNS = ['sf_id', 'RF', 'MPFL', 'MPFD', 'MPHF', 'SPFM', 'LFM']
+BATCH_COLUMNS = ['file', 'project'] + RESULT_COLUMNS + ['error']
+
+
+def evaluate(project, lifetime=None, engine='auto'):
+    """Evaluate ``project`` and return one result dict per SF."""
+    if lifetime is None:
+        lifetime = project.lifetime
+    if engine == 'auto':
+        n_fm = sum(len(comp.failure_modes) for comp in project.bom)
+        engine = 'vectorized' if n_fm >= VECTORIZE_MIN_FMS else 'objects'
+    if engine == 'vectorized':
+        from fmeda_engine import evaluate_project
+        evaluate_project(project, lifetime)
+    else:
+        project.evaluate_metrics(lifetime)
+    return [{'sf_id': sf.id, 'RF': sf.RF, 'MPFL': sf.MPFL, 'MPFD': sf.MPFD, 'MPHF': sf.MPHF,
+             'SPFM': sf.SPFM * 100, 'LFM': sf.LFM * 100} for sf in project.SF_list]
+
+
+def write_results(results, out, fmt):
+    if fmt == 'json':
+        import json
+        json.dump(results, out, indent=2)
+        out.write('\n')
+    elif fmt == 'csv':
+        writer = csv.DictWriter(out, fieldnames=RESULT_COLUMNS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(results)
+    else:
+        out.write(f"{'SF-ID':<12}{'RF (FIT)':>14}{'MPFL (FIT)':>14}{'MPFD (FIT)':>14}"
+                  f"{'MPHF':>14}{'SPFM (%)':>10}{'LFM (%)':>10}\n")
+        for r in results:
+            out.write(f"{str(r['sf_id']):<12}{r['RF']:>14.2f}{r['MPFL']:>14.2f}{r['MPFD']:>14.2f}"
+                      f"{r['MPHF']:>14.3e}{r['SPFM']:>10.2f}{r['LFM']:>10.2f}\n")
+
+
+def cmd_evaluate(args):
+    try:
+        project = read_project_csv(args.project)
+    except (OSError, ValueError) as e:
+        print(f"fmeda: cannot load {args.project}: {e}", file=sys.stderr)
+        return 1
+    results = evaluate(project, args.lifetime, args.engine)
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as out:
+            write_results(results, out, args.format)
+    else:
+        write_results(results, sys.stdout, args.format)
+    return 0
+
+
+def expand_inputs(inputs):
+    """Turn directories (all *.csv inside) and glob patterns into a sorted file list."""
+    import glob
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            files.extend(glob.glob(os.path.join(item, '*.csv')))
+        elif glob.has_magic(item):
+            files.extend(glob.glob(item, recursive=True))
+        else:
+            files.append(item)
+    return sorted(set(files))
+
+
+def evaluate_file(task):
+    """Worker: evaluate one project file, never raise.
+
+    Returns ``(path, rows)`` with one BATCH_COLUMNS row per SF, or a single
+    row carrying the error message when the file cannot be evaluated. A
+    project without SFs gets a single row with empty metrics, so every file
+    shows up in the output.
+    """
+    path, lifetime, engine = task
+    try:
+        project = read_project_csv(path)
+        results = evaluate(project, lifetime, engine)
+    except Exception as e:
+        return path, [{'file': path, 'error': f"{type(e).__name__}: {e}"}]
+    if not results:
+        return path, [{'file': path, 'project': project.name}]
+    return path, [{'file': path, 'project': project.name, **r} for r in results]
+
+
+def run_batch(files, jobs, lifetime=None, engine='auto', ordered=False):
+    """Yield ``(path, rows)`` per file, evaluated in a pool of ``jobs`` processes."""
+    tasks = [(path, lifetime, engine) for path in files]
+    if jobs <= 1 or len(tasks) <= 1:
+        yield from map(evaluate_file, tasks)
+        return
+    import multiprocessing
+    with multiprocessing.Pool(min(jobs, len(tasks))) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        yield from imap(evaluate_file, tasks)
+
+
+def cmd_batch(args):
+    import json
+    files = expand_inputs(args.inputs)
+    if not files:
+        print("fmeda: no project files found", file=sys.stderr)
+        return 1
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    failed = 0
+    try:
+        if args.format == 'csv':
+            writer = csv.DictWriter(out, fieldnames=BATCH_COLUMNS, lineterminator='\n')
+            writer.writeheader()
+        for path, rows in run_batch(files, args.jobs, args.lifetime, args.engine, args.ordered):
+            if rows and rows[0].get('error'):
+                failed += 1
+                print(f"fmeda: {path}: {rows[0]['error']}", file=sys.stderr)
+            if args.format == 'csv':
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    out.write(json.dumps(row) + '\n')
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"fmeda: {len(files) - failed}/{len(files)} projects evaluated", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def parse_values(text):
+    """``"0,60,90"`` -> a list, ``"60:99:40"`` -> 40 evenly spaced values from 60 to 99."""
+    if ':' in text:
+        start, stop, num = text.split(':')
+        num = int(num)
+        step = (float(stop) - float(start)) / (num - 1) if num > 1 else 0.0
+        return [float(start) + i * step for i in range(num)]
+    return [float(value) for value in text.split(',')]
+
+
+def cmd_sensitivity(args):
+    import json
+    from fmeda_sensitivity import Sweep
+    try:
+        project = read_project_csv(args.project)
+        sweep = Sweep(project, args.lifetime)
+        for mechanism, values in args.mechanism:
+            sweep.vary_mechanism(mechanism, parse_values(values))
+        for component_id, description, field, values in args.failure_mode:
+            sweep.vary_failure_mode((component_id, description), field, parse_values(values))
+    except (OSError, ValueError) as e:
+        print(f"fmeda: {e}", file=sys.stderr)
+        return 1
+    if not sweep.parameters:
+        print("fmeda: nothing to sweep, give --mechanism or --failure-mode", file=sys.stderr)
+        return 1
+
+    columns = ['scenario'] + [p.name for p in sweep.parameters] + RESULT_COLUMNS
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        if args.format == 'csv':
+            writer = csv.DictWriter(out, fieldnames=columns, lineterminator='\n')
+            writer.writeheader()
+        for result in sweep.batches():
+            for row in result.rows():
+                row['SPFM'] *= 100
+                row['LFM'] *= 100
+                if args.format == 'csv':
+                    writer.writerow(row)
+                else:
+                    out.write(json.dumps(row) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"fmeda: {len(sweep)} scenarios x {len(project.SF_list)} SFs", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='fmeda', description="Headless FMEDA evaluation.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('evaluate', help="evaluate one project CSV and print per-SF metrics")
+    p.add_argument('project', help="project CSV file")
+    p.add_argument('--lifetime', type=float, help="override the lifetime (hours) of the project row")
+    p.add_argument('--engine', choices=['auto', 'objects', 'vectorized'], default='auto',
+                   help=f"'auto' vectorizes from {VECTORIZE_MIN_FMS} failure modes on (default)")
+    p.add_argument('--format', choices=['table', 'csv', 'json'], default='table')
+    p.add_argument('-o', '--output', help="write the results to this file instead of stdout")
+    p.set_defaults(func=cmd_evaluate)
+
+    p = commands.add_parser('batch', help="evaluate many project CSVs in parallel, one row per SF")
+    p.add_argument('inputs', nargs='+', help="project CSV files, directories or glob patterns")
+    p.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                   help="worker processes (default: number of CPUs)")
+    p.add_argument('--lifetime', type=float, help="override the lifetime (hours) of every project")
+    p.add_argument('--engine', choices=['auto', 'objects', 'vectorized'], default='auto')
+    p.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    p.add_argument('--ordered', action='store_true', help="emit projects in input order")
+    p.add_argument('-o', '--output', help="write the rows to this file instead of stdout")
+    p.set_defaults(func=cmd_batch)
+
+    p = commands.add_parser('sensitivity', help="evaluate every combination of swept DCs / failure rates",
+                            description="Values are a comma separated list or START:STOP:COUNT.")
+    p.add_argument('project', help="project CSV file")
+    p.add_argument('--mechanism', nargs=2, action='append', default=[], metavar=('NAME', 'VALUES'),
+                   help="sweep the DC of every failure mode using this safety mechanism")
+    p.add_argument('--failure-mode', nargs=4, action='append', default=[],
+                   metavar=('COMPONENT', 'DESCRIPTION', 'FIELD', 'VALUES'),
+                   help="sweep Failure_rate_total, SPF_diagnostic_coverage or MPF_diagnostic_coverage of one failure mode")
+    p.add_argument('--lifetime', type=float, help="override the lifetime (hours) of the project row")
+    p.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    p.add_argument('-o', '--output', help="write the rows to this file instead of stdout")
+    p.set_defaults(func=cmd_sensitivity)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar FMEDA engine.
+
+Packs every failure mode of a project into flat NumPy arrays and evaluates
+RF/MPFL/MPFD, SPFM, LFM and MPHF for all safety functions with a handful of
+array operations, instead of walking SafetyFunction -> Component ->
+FailureMode objects one attribute at a time.
+
+The formulas are the ones of FMEDA.py:
+
+    RF   = is_SPF * lambda * (1 - DC_spf / 100)
+    MPFL = is_MPF * (lambda - RF) * (1 - DC_mpf / 100)
+    MPFD = is_MPF * (lambda - RF) * (DC_mpf / 100)
+"""
+
+import numpy as np
+
+
+"""
+evaluation result
+"""
+
+class FMEDAResult:
+    """Per-SF metrics (indexed like ``sf_ids``) and per-FM derived values."""
+
+    SF_FIELDS = ('RF', 'MPFL', 'MPFD', 'MPHF', 'SPFM', 'LFM', 'safetyrelated')
+
+    def __init__(self, sf_ids, RF, MPFL, MPFD, MPHF, SPFM, LFM, safetyrelated,
+                 fm_RF, fm_MPFL, fm_MPFD, lifetime=None):
+        self.sf_ids = sf_ids
+        self.lifetime = lifetime
+        self.RF = RF
+        self.MPFL = MPFL
+        self.MPFD = MPFD
+        self.MPHF = MPHF
+        self.SPFM = SPFM
+        self.LFM = LFM
+        self.safetyrelated = safetyrelated
+        self.fm_RF = fm_RF
+        self.fm_MPFL = fm_MPFL
+        self.fm_MPFD = fm_MPFD
+
+    def __len__(self):
+        return len(self.sf_ids)
+
+    def rows(self):
+        """Yield one ``dict`` of plain floats per safety function."""
+        columns = [getattr(self, name).tolist() for name in self.SF_FIELDS]
+        for i, sf_id in enumerate(self.sf_ids):
+            row = {'id': sf_id}
+            for name, values in zip(self.SF_FIELDS, columns):
+                row[name] = values[i]
+            yield row
+
+
+"""
+columnar project
+"""
+
+class ColumnarProject:
+    """Column-oriented snapshot of an FMEDA project.
+
+    ``fm_component`` maps each failure mode to a component index and the
+    ``link_sf``/``link_component`` pairs describe the SF -> component
+    relation, one entry per link. Each pair appears once, as in
+    ``SafetyFunction.related_components`` (a RefSet) and the backend's
+    link table; a repeated pair would count the component twice.
+    """
+
+    def __init__(self, sf_ids, comp_failure_rate, fm_component, fm_failure_rate,
+                 fm_is_spf, fm_is_mpf, fm_spf_dc, fm_mpf_dc, link_sf, link_component):
+        self.sf_ids = list(sf_ids)
+        self.comp_failure_rate = np.asarray(comp_failure_rate, dtype=np.float64)
+        self.fm_component = np.asarray(fm_component, dtype=np.intp)
+        self.fm_failure_rate = np.asarray(fm_failure_rate, dtype=np.float64)
+        self.fm_is_spf = np.asarray(fm_is_spf, dtype=np.float64)
+        self.fm_is_mpf = np.asarray(fm_is_mpf, dtype=np.float64)
+        self.fm_spf_dc = np.asarray(fm_spf_dc, dtype=np.float64)
+        self.fm_mpf_dc = np.asarray(fm_mpf_dc, dtype=np.float64)
+        self.link_sf = np.asarray(link_sf, dtype=np.intp)
+        self.link_component = np.asarray(link_component, dtype=np.intp)
+        # Source objects, only set by from_project()
+        self.safety_functions = None
+        self.components = None
+        self.failure_modes = None
+
+    @classmethod
+    def from_project(cls, project):
+        """Pack an ``FMEDA.Project`` (SF_list / bom object graph)."""
+        components = []
+        comp_index = {}
+
+        def index_of(comp):
+            key = id(comp)
+            if key not in comp_index:
+                comp_index[key] = len(components)
+                components.append(comp)
+            return comp_index[key]
+
+        for comp in project.bom:
+            index_of(comp)
+
+        link_sf = []
+        link_component = []
+        for s, sf in enumerate(project.SF_list):
+            for comp in sf.related_components:
+                link_sf.append(s)
+                link_component.append(index_of(comp))
+
+        failure_modes = []
+        fm_component = []
+        for c, comp in enumerate(components):
+            for fm in comp.failure_modes:
+                failure_modes.append(fm)
+                fm_component.append(c)
+
+        columnar = cls(
+            sf_ids=[sf.id for sf in project.SF_list],
+            comp_failure_rate=[float(comp.failure_rate or 0) for comp in components],
+            fm_component=fm_component,
+            fm_failure_rate=[float(fm.Failure_rate_total or 0) for fm in failure_modes],
+            fm_is_spf=[float(fm.is_SPF or 0) for fm in failure_modes],
+            fm_is_mpf=[float(fm.is_MPF or 0) for fm in failure_modes],
+            fm_spf_dc=[float(fm.SPF_diagnostic_coverage or 0) for fm in failure_modes],
+            fm_mpf_dc=[float(fm.MPF_diagnostic_coverage or 0) for fm in failure_modes],
+            link_sf=link_sf,
+            link_component=link_component,
+        )
+        columnar.safety_functions = list(project.SF_list)
+        columnar.components = components
+        columnar.failure_modes = failure_modes
+        return columnar
+
+    def failure_mode_metrics(self):
+        """Return the ``(RF, MPFL, MPFD)`` arrays of every failure mode."""
+        rate = self.fm_failure_rate
+        rf = self.fm_is_spf * rate * (1 - self.fm_spf_dc / 100)
+        mpf_base = rate - rf
+        mpfl = self.fm_is_mpf * mpf_base * (1 - self.fm_mpf_dc / 100)
+        mpfd = self.fm_is_mpf * mpf_base * (self.fm_mpf_dc / 100)
+        return rf, mpfl, mpfd
+
+    def sf_totals(self, fm_values):
+        """Sum a per-failure-mode array into one total per safety function."""
+        # FM -> component totals, then component -> SF totals through the links
+        comp_values = np.bincount(self.fm_component, weights=fm_values, minlength=len(self.comp_failure_rate))
+        return np.bincount(self.link_sf, weights=comp_values[self.link_component], minlength=len(self.sf_ids))
+
+    def evaluate(self, lifetime):
+        """Compute the metrics of every safety function at once."""
+        fm_rf, fm_mpfl, fm_mpfd = self.failure_mode_metrics()
+        rf = self.sf_totals(fm_rf)
+        mpfl = self.sf_totals(fm_mpfl)
+        mpfd = self.sf_totals(fm_mpfd)
+        safetyrelated = np.bincount(self.link_sf, weights=self.comp_failure_rate[self.link_component],
+                                    minlength=len(self.sf_ids))
+
+        return FMEDAResult(self.sf_ids, rf, mpfl, mpfd,
+                           *sf_metrics(rf, mpfl, mpfd, safetyrelated, lifetime),
+                           safetyrelated, fm_rf, fm_mpfl, fm_mpfd, lifetime)
+
+    def apply(self, result):
+        """Write ``result`` back onto the objects packed by from_project()."""
+        if self.safety_functions is None:
+            raise ValueError("apply() needs a ColumnarProject built with from_project()")
+        for fm, rf, mpfl, mpfd in zip(self.failure_modes, result.fm_RF.tolist(),
+                                      result.fm_MPFL.tolist(), result.fm_MPFD.tolist()):
+            fm.RF = rf
+            fm.MPFL = mpfl
+            fm.MPFD = mpfd
+        for sf, row in zip(self.safety_functions, result.rows()):
+            for name in FMEDAResult.SF_FIELDS:
+                setattr(sf, name, row[name])
+            sf.lifetime = result.lifetime
+
+
+def sf_metrics(rf, mpfl, mpfd, safetyrelated, lifetime):
+    """Return ``(MPHF, SPFM, LFM)`` arrays from per-SF totals."""
+    mphf = (rf / 1e9) + ((mpfl / 1e9) * (mpfd / 1e9) * lifetime)
+
+    spfm = np.zeros_like(rf)
+    has_rate = safetyrelated > 0
+    spfm[has_rate] = 1 - (rf[has_rate] / safetyrelated[has_rate])
+
+    lfm = np.zeros_like(rf)
+    remaining = safetyrelated - rf
+    has_remaining = remaining > 0
+    lfm[has_remaining] = 1 - (mpfl[has_remaining] / remaining[has_remaining])
+    return mphf, spfm, lfm
+
+
+def evaluate_project(project, lifetime):
+    """Evaluate an ``FMEDA.Project`` in place and return the FMEDAResult.
+
+    Drop-in replacement for ``project.evaluate_metrics(lifetime)``.
+    """
+    columnar = ColumnarProject.from_project(project)
+    result = columnar.evaluate(float(lifetime or 0))
+    columnar.apply(result)
+    return result
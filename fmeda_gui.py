@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from FMEDA import Project, SafetyFunction, Component, FailureMode
+from fmeda_engine import evaluate_project
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from ttkbootstrap.scrolled import ScrolledFrame
@@ -592,7 +593,7 @@ class FMEDAGUI:
                     return
                 
                 sf_id = sf_id_entry.get().strip()
-                if any(sf.id == sf_id for sf in self.project.SF_list):
+                if self.project.get_SF(sf_id) is not None:
                     messagebox.showerror("Error", "Safety Function ID already exists", parent=add_window)
                     return
 
@@ -630,7 +631,7 @@ class FMEDAGUI:
                 return
 
             sf_id = selected[0]
-            sf_to_edit = next((sf for sf in self.project.SF_list if sf.id == sf_id), None)
+            sf_to_edit = self.project.get_SF(sf_id)
             if not sf_to_edit:
                 return
 
@@ -746,14 +747,10 @@ class FMEDAGUI:
                 return
 
             sf_id = selected[0]
-            sf_to_remove = next((sf for sf in self.project.SF_list if sf.id == sf_id), None)
+            sf_to_remove = self.project.get_SF(sf_id)
 
             if sf_to_remove:
-                self.project.SF_list.remove(sf_to_remove)
-                
-                for comp in self.project.bom:
-                    if sf_to_remove in comp.related_Sfs:
-                        comp.related_Sfs.remove(sf_to_remove)
+                self.project.remove_SF(sf_to_remove)
 
                 tree.delete(selected[0])
                 self.enable_all_navigation()
@@ -796,7 +793,7 @@ class FMEDAGUI:
                 return
             for _, row in df.iterrows():
                 sf_id = str(row['id']).strip()
-                if any(str(sf.id) == sf_id for sf in self.project.SF_list):
+                if self.project.get_SF(sf_id) is not None:
                     continue  # Skip duplicates
                 sf = SafetyFunction(sf_id)
                 sf.description = str(row['description']).strip()
@@ -999,7 +996,7 @@ class FMEDAGUI:
                     if not comp_type:
                         messagebox.showerror("Error", "Please select a component type", parent=add_window)
                         return
-                    if any(c.id == comp_id for c in self.project.bom):
+                    if self.project.get_component(comp_id) is not None:
                         messagebox.showerror("Error", "Component ID already exists", parent=add_window)
                         return
                     comp = Component(comp_id)
@@ -1020,11 +1017,10 @@ class FMEDAGUI:
                     selected_indices = sf_listbox.curselection()
                     selected_sf_ids = [sf_ids[i] for i in selected_indices]
                     for sfid in selected_sf_ids:
-                        sf_obj = next((sf for sf in self.project.SF_list if sf.id == sfid), None)
+                        sf_obj = self.project.get_SF(sfid)
                         if sf_obj:
-                            comp.related_Sfs.append(sf_obj)
-                            sf_obj.add_component(comp)
-                    self.project.bom.append(comp)
+                            self.project.link(comp, sf_obj)
+                    self.project.add_component(comp)
                     related_sf_str = ", ".join(selected_sf_ids) if selected_sf_ids else "None"
                     fm_count = len(comp.failure_modes)
                     tree.insert("", END, iid=comp_id, values=(comp_id, comp_type, fit_rate, related_sf_str, fm_count))
@@ -1060,11 +1056,7 @@ class FMEDAGUI:
 
             try:
                 selected_item = selected[0]
-                comp_to_edit = None
-                for comp in self.project.bom:
-                    if str(comp.id) == str(selected_item):
-                        comp_to_edit = comp
-                        break
+                comp_to_edit = self.project.get_component(selected_item)
                 if not comp_to_edit:
                     messagebox.showerror("Error", f"Component with ID {selected_item} not found.")
                     return
@@ -1220,21 +1212,19 @@ class FMEDAGUI:
                         return
                     comp_to_edit.type = new_type
                     comp_to_edit.failure_rate = new_fit
-                    for sf in comp_to_edit.related_Sfs:
-                        if comp_to_edit in sf.related_components:
-                            sf.related_components.remove(comp_to_edit)
-                    comp_to_edit.related_Sfs.clear()
+                    for sf in list(comp_to_edit.related_Sfs):
+                        self.project.unlink(comp_to_edit, sf)
                     for sfid in selected_sf_ids:
-                        sf_obj = next((sf for sf in self.project.SF_list if sf.id == sfid), None)
+                        sf_obj = self.project.get_SF(sfid)
                         if sf_obj:
-                            comp_to_edit.related_Sfs.append(sf_obj)
-                            if comp_to_edit not in sf_obj.related_components:
-                                sf_obj.add_component(comp_to_edit)
+                            self.project.link(comp_to_edit, sf_obj)
                     comp_type = type_combo.get().strip()
                     fit_rate = float(fit_entry.get())
                     if comp_type in self.predefined_failure_modes and fit_rate > 0:
                         predefined_fms = self.predefined_failure_modes[comp_type]
-                        comp_to_edit.failure_modes = [fm for fm in comp_to_edit.failure_modes if fm.description not in [fm_data["description"] for fm_data in predefined_fms]]
+                        predefined_descriptions = [fm_data["description"] for fm_data in predefined_fms]
+                        for fm in [fm for fm in comp_to_edit.failure_modes if fm.description in predefined_descriptions]:
+                            comp_to_edit.remove_FM(fm)
                         for i, fm_data in enumerate(predefined_fms):
                             if i < len(fm_check_vars[0]) and fm_check_vars[0][i].get():
                                 fm = FailureMode()
@@ -1273,13 +1263,11 @@ class FMEDAGUI:
             if not messagebox.askyesno("Confirm", "Are you sure you want to remove this component?"):
                 return
             
-            comp_id = int(selected[0])
-            comp_to_remove = next((c for c in self.project.bom if c.id == comp_id), None)
+            comp_id = selected[0]
+            comp_to_remove = self.project.get_component(comp_id)
 
             if comp_to_remove:
-                self.project.bom.remove(comp_to_remove)
-                for sf in comp_to_remove.related_Sfs:
-                    sf.related_components.remove(comp_to_remove)
+                self.project.remove_component(comp_to_remove)
                 
                 tree.delete(selected[0])
                 self.show_success_message("Component removed successfully!")
@@ -1325,7 +1313,7 @@ class FMEDAGUI:
                 return
             for _, row in df.iterrows():
                 comp_id = str(row['id']).strip()
-                if any(str(c.id) == comp_id for c in self.project.bom):
+                if self.project.get_component(comp_id) is not None:
                     continue  # Skip duplicates
                 comp = Component(comp_id)
                 comp.type = str(row['type']).strip()
@@ -1336,11 +1324,10 @@ class FMEDAGUI:
                 if 'related_sf_ids' in row and pd.notna(row['related_sf_ids']):
                     sf_ids = [s.strip() for s in str(row['related_sf_ids']).split(',') if s.strip()]
                     for sfid in sf_ids:
-                        sf_obj = next((sf for sf in self.project.SF_list if str(sf.id) == sfid), None)
+                        sf_obj = self.project.get_SF(sfid)
                         if sf_obj:
-                            comp.related_Sfs.append(sf_obj)
-                            sf_obj.add_component(comp)
-                self.project.bom.append(comp)
+                            self.project.link(comp, sf_obj)
+                self.project.add_component(comp)
             self.show_success_message("BOM imported successfully!")
             self.show_components()  # Refresh table
         except Exception as e:
@@ -1381,11 +1368,8 @@ class FMEDAGUI:
         self.fm_data = []
         
         if selected_component_id is not None:
-            try:
-                comp = next(c for c in self.project.bom if str(c.id) == str(selected_component_id))
-                comps = [comp]
-            except StopIteration:
-                comps = []
+            comp = self.project.get_component(selected_component_id)
+            comps = [comp] if comp is not None else []
         else:
             comps = self.project.bom
         for comp in comps:
@@ -1530,7 +1514,9 @@ class FMEDAGUI:
             def save_failure_mode():
                 try:
                     comp_id = self._normalize_id(comp_combo.get().split(' - ')[0])
-                    component = next(c for c in self.project.bom if self._normalize_id(c.id) == comp_id)
+                    component = self.project.get_component(comp_id)
+                    if component is None:
+                        raise IndexError(comp_id)
                     
                     new_description = desc_entry.get().strip()
                     if not new_description:
@@ -1779,7 +1765,7 @@ class FMEDAGUI:
                 
             _, component, fm = item_data
             
-            component.failure_modes.remove(fm)
+            component.remove_FM(fm)
             
             self.fm_data.remove(item_data)
             
@@ -1832,7 +1818,10 @@ class FMEDAGUI:
                       font=('Segoe UI', 11), foreground="red").pack(pady=20)
             return
 
-        self.project.evaluate_metrics(self.lifetime)
+        # FM/component edits keep the SF metrics current, a full evaluation is
+        # only needed for SFs not evaluated yet for this lifetime
+        if any(sf.lifetime != self.lifetime for sf in self.project.SF_list):
+            evaluate_project(self.project, self.lifetime)
 
         table_frame = ttk.Frame(frame)
         table_frame.pack(fill=BOTH, expand=True)
@@ -2038,26 +2027,25 @@ class FMEDAGUI:
             new_project.name = project_row['name']
             new_project.lifetime = float(project_row['lifetime']) if pd.notna(project_row['lifetime']) else 0
             self.lifetime = new_project.lifetime
-            sf_map = {}
             for _, row in df[df['section'] == 'sf'].iterrows():
                 sf_id = self._normalize_id(row['id'])
+                if new_project.get_SF(sf_id) is not None:
+                    continue  # Skip duplicates
                 sf = SafetyFunction(sf_id)
                 sf.description = row['description'] if pd.notna(row['description']) else ''
                 sf.target_integrity_level = row['target_integrity_level'] if pd.notna(row['target_integrity_level']) else ''
                 new_project.add_SF(sf)
-                sf_map[sf.id] = sf
-            comp_map = {}
             for _, row in df[df['section'] == 'component'].iterrows():
                 comp_id = self._normalize_id(row['id'])
+                if new_project.get_component(comp_id) is not None:
+                    continue  # Skip duplicates
                 comp = Component(comp_id)
                 comp.type = row['type'] if pd.notna(row['type']) else ''
                 comp.failure_rate = float(row['failure_rate']) if pd.notna(row['failure_rate']) else 0
-                comp_map[comp.id] = comp
-                new_project.bom.append(comp)
+                new_project.add_component(comp)
             for _, row in df[df['section'] == 'fm'].iterrows():
-                comp_id = self._normalize_id(row['component_id'])
-                if comp_id in comp_map:
-                    comp = comp_map[comp_id]
+                comp = new_project.get_component(self._normalize_id(row['component_id']))
+                if comp is not None:
                     fm = FailureMode()
                     fm.description = row['description'] if pd.notna(row['description']) else ''
                     fm.Failure_rate_total = float(row['Failure_rate_total']) if pd.notna(row['Failure_rate_total']) else 0
@@ -2067,24 +2055,16 @@ class FMEDAGUI:
                     fm.set_spf_mechanism(row['SPF_safety_mechanism'] if pd.notna(row['SPF_safety_mechanism']) else '', float(row['SPF_diagnostic_coverage']) if pd.notna(row['SPF_diagnostic_coverage']) else 0)
                     fm.set_mpf_mechanism(row['MPF_safety_mechanism'] if pd.notna(row['MPF_safety_mechanism']) else '', float(row['MPF_diagnostic_coverage']) if pd.notna(row['MPF_diagnostic_coverage']) else 0)
                     comp.add_FM(fm)
-            for sf in new_project.SF_list:
-                sf.related_components = []
-            for comp in new_project.bom:
-                comp.related_Sfs = []
             for _, row in df[df['section'] == 'component'].iterrows():
-                comp_id = self._normalize_id(row['id'])
-                comp = comp_map[comp_id]
+                comp = new_project.get_component(self._normalize_id(row['id']))
                 if pd.notna(row['related_sf_ids']):
                     sf_ids = [self._normalize_id(s) for s in str(row['related_sf_ids']).split(',') if self._normalize_id(s)]
                     for sf_id in sf_ids:
-                        if sf_id in sf_map:
-                            sf = sf_map[sf_id]
-                            if comp not in sf.related_components:
-                                sf.related_components.append(comp)
-                            if sf not in comp.related_Sfs:
-                                comp.related_Sfs.append(sf)
+                        sf = new_project.get_SF(sf_id)
+                        if sf is not None:
+                            new_project.link(comp, sf)
             self.project = new_project
-            self.project.evaluate_metrics(self.lifetime)
+            evaluate_project(self.project, self.lifetime)
             self.enable_all_navigation()
             self.refresh_all_views()
             self.show_success_message("Project imported successfully!")
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Project CSV reader for the FMEDA.py object model.
+
+Uses only the standard csv module (no pandas, no GUI toolkit) so headless
+tools can load projects quickly. The format is the single-CSV layout written
+by the GUI and by the backend export:
+
+    section,name,lifetime,id,description,target_integrity_level,type,
+    failure_rate,related_sf_ids,component_id,Failure_rate_total,
+    system_level_effect,is_SPF,SPF_safety_mechanism,SPF_diagnostic_coverage,
+    is_MPF,MPF_safety_mechanism,MPF_diagnostic_coverage
+"""
+
+import csv
+
+from FMEDA import Project, SafetyFunction, Component, FailureMode
+
+# Column order of the files written by the backend export (the GUI leaves out
+# is_safety_related, the reader accepts both)
+CSV_COLUMNS = (
+    'section', 'name', 'lifetime', 'id', 'description', 'target_integrity_level', 'type',
+    'failure_rate', 'related_sf_ids', 'is_safety_related', 'component_id', 'Failure_rate_total',
+    'system_level_effect', 'is_SPF', 'SPF_safety_mechanism', 'SPF_diagnostic_coverage',
+    'is_MPF', 'MPF_safety_mechanism', 'MPF_diagnostic_coverage',
+)
+
+
+def normalize_id(value):
+    # same rules as FMEDAGUI._normalize_id: "45.0" and 45 both become "45"
+    s = str(value).strip() if value is not None and str(value).strip() != '' else ''
+    if s.endswith('.0'):
+        s = s[:-2]
+    return s
+
+
+# Cell parsers, shared with the backend import (fmeda/csv_io.py) so both read
+# a file the same way
+
+def text_value(row, key):
+    return (row.get(key) or '').strip()
+
+
+def float_value(row, key):
+    value = text_value(row, key)
+    return float(value) if value else 0.0
+
+
+def flag_value(row, key):
+    # The backend export writes booleans as True/False, the GUI uses 0/1;
+    # either way the result is 0 or 1
+    value = text_value(row, key)
+    if value.lower() in ('true', 'false'):
+        return int(value.lower() == 'true')
+    return int(bool(int(float(value)))) if value else 0
+
+
+def read_project_csv(source):
+    """Load a project from a path or an open text file."""
+    if isinstance(source, str):
+        with open(source, newline='', encoding='utf-8-sig') as f:
+            return read_project_csv(f)
+
+    sections = {'project': [], 'sf': [], 'component': [], 'fm': []}
+    for row in csv.DictReader(source):
+        rows = sections.get(text_value(row, 'section'))
+        if rows is not None:
+            rows.append(row)
+    if not sections['project']:
+        raise ValueError("no 'project' row in CSV")
+
+    project_row = sections['project'][0]
+    project = Project(text_value(project_row, 'name') or "Loaded Project")
+    project.lifetime = float_value(project_row, 'lifetime')
+
+    for row in sections['sf']:
+        sf_id = normalize_id(row.get('id'))
+        if project.get_SF(sf_id) is not None:
+            continue  # Skip duplicates
+        sf = SafetyFunction(sf_id)
+        sf.description = text_value(row, 'description')
+        sf.target_integrity_level = text_value(row, 'target_integrity_level')
+        project.add_SF(sf)
+
+    for row in sections['component']:
+        comp_id = normalize_id(row.get('id'))
+        if project.get_component(comp_id) is not None:
+            continue  # Skip duplicates
+        comp = Component(comp_id)
+        comp.type = text_value(row, 'type')
+        comp.failure_rate = float_value(row, 'failure_rate')
+        project.add_component(comp)
+
+    for row in sections['fm']:
+        comp = project.get_component(normalize_id(row.get('component_id')))
+        if comp is None:
+            continue
+        fm = FailureMode()
+        fm.description = text_value(row, 'description')
+        fm.Failure_rate_total = float_value(row, 'Failure_rate_total')
+        fm.system_level_effect = text_value(row, 'system_level_effect')
+        fm.is_SPF = flag_value(row, 'is_SPF')
+        fm.is_MPF = flag_value(row, 'is_MPF')
+        fm.set_spf_mechanism(text_value(row, 'SPF_safety_mechanism'), float_value(row, 'SPF_diagnostic_coverage'))
+        fm.set_mpf_mechanism(text_value(row, 'MPF_safety_mechanism'), float_value(row, 'MPF_diagnostic_coverage'))
+        comp.add_FM(fm)
+
+    for row in sections['component']:
+        comp = project.get_component(normalize_id(row.get('id')))
+        for sf_id in text_value(row, 'related_sf_ids').split(','):
+            sf = project.get_SF(normalize_id(sf_id))
+            if sf is not None:
+                project.link(comp, sf)
+
+    return project
+
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Sensitivity sweeps over failure mode parameters.
+
+Answers "what SPFM would we get if this mechanism's DC went from 60% to
+90%?" without editing the project: each parameter is a list of values for
+the failure rate or a diagnostic coverage of some failure modes, and every
+combination of the values (one scenario) is evaluated for all safety
+functions with the formulas of FMEDA.py.
+
+    sweep = Sweep(project)
+    sweep.vary_mechanism('Watchdog', np.linspace(60, 99, 40))
+    sweep.vary_failure_mode(('C12', 'Open circuit'), 'Failure_rate_total', [0.5, 1, 2])
+    result = sweep.run()
+    result.surface('SPFM', 'SF1')     # array of shape (40, 3)
+
+Per failure mode, with u = 1 - DC_spf / 100 and w = DC_mpf / 100,
+
+    RF   = is_SPF * lambda * u
+    MPFD = is_MPF * lambda * (1 - is_SPF * u) * w
+    MPFL = is_MPF * lambda * (1 - is_SPF * u) - MPFD
+
+so every term is a product of lambda, u and w. Failure modes whose
+lambda/u/w come from the same parameters are grouped and their per-SF sums
+of the fixed factors are computed once; a scenario then costs a few
+operations per group and safety function, however many failure modes the
+parameters touch.
+"""
+
+import numpy as np
+
+from fmeda_engine import ColumnarProject, sf_metrics
+
+# failure mode attribute -> ColumnarProject column
+FIELDS = {
+    'Failure_rate_total': 'fm_failure_rate',
+    'SPF_diagnostic_coverage': 'fm_spf_dc',
+    'MPF_diagnostic_coverage': 'fm_mpf_dc',
+}
+
+RESULT_FIELDS = ('RF', 'MPFL', 'MPFD', 'MPHF', 'SPFM', 'LFM')
+
+# scenarios evaluated per array operation by run() and batches()
+BATCH_SIZE = 4096
+
+
+"""
+sweep result
+"""
+
+class SensitivityResult:
+    """Per-scenario, per-SF metrics of ``scenarios`` [start, start + len).
+
+    Every field in RESULT_FIELDS is an array of shape (scenarios, SFs);
+    ``values`` holds the parameter values of each scenario, one column per
+    parameter.
+    """
+
+    def __init__(self, sf_ids, parameters, shape, start, values, RF, MPFL, MPFD, MPHF, SPFM, LFM):
+        self.sf_ids = sf_ids
+        self.parameters = parameters
+        self.shape = shape
+        self.start = start
+        self.values = values
+        self.RF = RF
+        self.MPFL = MPFL
+        self.MPFD = MPFD
+        self.MPHF = MPHF
+        self.SPFM = SPFM
+        self.LFM = LFM
+
+    def __len__(self):
+        return len(self.values)
+
+    def surface(self, field, sf_id):
+        """``field`` of one SF over the whole grid, one axis per parameter."""
+        if self.start != 0 or len(self) != int(np.prod(self.shape)):
+            raise ValueError("surface() needs the result of the whole sweep, not of one batch")
+        return getattr(self, field)[:, self.sf_ids.index(sf_id)].reshape(self.shape)
+
+    def rows(self):
+        """Yield one ``dict`` of plain values per scenario and safety function."""
+        values = self.values.tolist()
+        columns = [getattr(self, name).tolist() for name in RESULT_FIELDS]
+        for i, scenario in enumerate(values):
+            params = dict(zip(self.parameters, scenario))
+            for j, sf_id in enumerate(self.sf_ids):
+                row = {'scenario': self.start + i, **params, 'sf_id': sf_id}
+                for name, column in zip(RESULT_FIELDS, columns):
+                    row[name] = column[i][j]
+                yield row
+
+
+"""
+sweep
+"""
+
+class Parameter:
+    """One swept value list and the failure mode columns it sets."""
+
+    def __init__(self, name, values, targets):
+        self.name = name
+        self.values = np.asarray(values, dtype=np.float64).ravel()
+        self.targets = targets  # ColumnarProject column -> FM indices
+        if not len(self.values):
+            raise ValueError(f"parameter {name!r} has no values")
+
+
+class Sweep:
+    """Cartesian product of parameter values over one project.
+
+    The project is packed once; it is never modified.
+    """
+
+    def __init__(self, project, lifetime=None):
+        self.columnar = ColumnarProject.from_project(project)
+        self.lifetime = float((project.lifetime if lifetime is None else lifetime) or 0)
+        self.parameters = []
+        self._fm_keys = None
+        self._groups = None
+
+    @property
+    def shape(self):
+        return tuple(len(p.values) for p in self.parameters)
+
+    def __len__(self):
+        return int(np.prod(self.shape)) if self.parameters else 0
+
+    def failure_mode_index(self, fm):
+        """Index of a FailureMode, given as the object or ``(component_id, description)``."""
+        if isinstance(fm, (int, np.integer)):
+            return int(fm)
+        if self._fm_keys is None:
+            keys = {}
+            for i, obj in enumerate(self.columnar.failure_modes):
+                keys.setdefault(id(obj), i)
+                keys.setdefault((str(obj.component.id), obj.description), i)
+            self._fm_keys = keys
+        key = (str(fm[0]), fm[1]) if isinstance(fm, tuple) else id(fm)
+        try:
+            return self._fm_keys[key]
+        except KeyError:
+            raise ValueError(f"no failure mode {fm!r} in the project") from None
+
+    def vary_failure_mode(self, fm, field, values, name=None):
+        """Sweep ``field`` (a FIELDS attribute) of one failure mode."""
+        if field not in FIELDS:
+            raise ValueError(f"cannot vary {field!r}, choose one of {', '.join(FIELDS)}")
+        index = self.failure_mode_index(fm)
+        if name is None:
+            obj = self.columnar.failure_modes[index]
+            name = f"{obj.component.id}/{obj.description}:{field}"
+        return self._add(Parameter(name, values, {FIELDS[field]: np.array([index])}))
+
+    def vary_mechanism(self, mechanism, values, name=None):
+        """Sweep the DC of every failure mode using ``mechanism``.
+
+        A failure mode using it as SPF mechanism gets the value as its SPF
+        DC, one using it as MPF mechanism as its MPF DC (both when it does
+        both).
+        """
+        fms = self.columnar.failure_modes
+        targets = {}
+        for column, attr in (('fm_spf_dc', 'SPF_safety_mechanism'), ('fm_mpf_dc', 'MPF_safety_mechanism')):
+            indices = np.array([i for i, fm in enumerate(fms) if getattr(fm, attr) == mechanism], dtype=np.intp)
+            if len(indices):
+                targets[column] = indices
+        if not targets:
+            raise ValueError(f"no failure mode uses the safety mechanism {mechanism!r}")
+        return self._add(Parameter(name or mechanism, values, targets))
+
+    def _add(self, parameter):
+        for other in self.parameters:
+            for column, indices in parameter.targets.items():
+                if column in other.targets and np.intersect1d(indices, other.targets[column]).size:
+                    raise ValueError(f"{parameter.name!r} and {other.name!r} set the same failure mode value")
+        self.parameters.append(parameter)
+        self._groups = None
+        return parameter
+
+    def _prepare(self):
+        """Group failure modes by the parameters that set their lambda/u/w.
+
+        For each group, the per-SF sums of its fixed factors:
+        ``(rate_param, u_param, w_param, k_rf, k_a1, k_a2, k_d1, k_d2)``.
+        """
+        c = self.columnar
+        n_fm = len(c.fm_failure_rate)
+        sources = {column: np.full(n_fm, -1, dtype=np.intp) for column in FIELDS.values()}
+        for p, parameter in enumerate(self.parameters):
+            for column, indices in parameter.targets.items():
+                sources[column][indices] = p
+        rate_src, u_src, w_src = sources['fm_failure_rate'], sources['fm_spf_dc'], sources['fm_mpf_dc']
+
+        # fixed factors, 1 where a parameter supplies the value
+        rate = np.where(rate_src < 0, c.fm_failure_rate, 1.0)
+        u = np.where(u_src < 0, 1 - c.fm_spf_dc / 100, 1.0)
+        w = np.where(w_src < 0, c.fm_mpf_dc / 100, 1.0)
+        spf_rate_u = c.fm_is_spf * rate * u
+        mpf_rate = c.fm_is_mpf * rate
+        mpf_spf_rate_u = c.fm_is_mpf * spf_rate_u
+
+        signatures, group_of = np.unique(np.stack([rate_src, u_src, w_src], axis=1), axis=0, return_inverse=True)
+        group_of = group_of.ravel()
+        groups = []
+        for g, (rate_p, u_p, w_p) in enumerate(signatures.tolist()):
+            member = group_of == g
+            groups.append((rate_p, u_p, w_p,
+                           c.sf_totals(spf_rate_u * member),
+                           c.sf_totals(mpf_rate * member),
+                           c.sf_totals(mpf_spf_rate_u * member),
+                           c.sf_totals(mpf_rate * w * member),
+                           c.sf_totals(mpf_spf_rate_u * w * member)))
+        safetyrelated = np.bincount(c.link_sf, weights=c.comp_failure_rate[c.link_component],
+                                    minlength=len(c.sf_ids))
+        self._groups = groups, safetyrelated
+
+    def evaluate(self, start, stop):
+        """Evaluate scenarios [start, stop) of the grid in one batch."""
+        if not self.parameters:
+            raise ValueError("nothing to sweep, add a parameter first")
+        if self._groups is None:
+            self._prepare()
+        groups, safetyrelated = self._groups
+        stop = min(stop, len(self))
+        indices = np.unravel_index(np.arange(start, stop), self.shape)
+        values = [p.values[i] for p, i in zip(self.parameters, indices)]
+        shape = (stop - start, len(self.columnar.sf_ids))
+
+        rf = np.zeros(shape)
+        mpf = np.zeros(shape)
+        mpfd = np.zeros(shape)
+        for rate_p, u_p, w_p, k_rf, k_a1, k_a2, k_d1, k_d2 in groups:
+            rate = values[rate_p][:, None] if rate_p >= 0 else 1.0
+            u = 1 - values[u_p][:, None] / 100 if u_p >= 0 else 1.0
+            w = values[w_p][:, None] / 100 if w_p >= 0 else 1.0
+            rf += rate * u * k_rf
+            mpf += rate * (k_a1 - u * k_a2)
+            mpfd += rate * w * (k_d1 - u * k_d2)
+        mpfl = mpf - mpfd
+
+        mphf, spfm, lfm = sf_metrics(rf, mpfl, mpfd, np.broadcast_to(safetyrelated, shape), self.lifetime)
+        return SensitivityResult(self.columnar.sf_ids, [p.name for p in self.parameters], self.shape, start,
+                                 np.stack(values, axis=1), rf, mpfl, mpfd, mphf, spfm, lfm)
+
+    def batches(self, batch_size=BATCH_SIZE):
+        """Yield a SensitivityResult per ``batch_size`` scenarios, in grid order."""
+        if not self.parameters:
+            raise ValueError("nothing to sweep, add a parameter first")
+        for start in range(0, len(self), batch_size):
+            yield self.evaluate(start, start + batch_size)
+
+    def run(self, batch_size=BATCH_SIZE):
+        """Evaluate the whole grid and return a single SensitivityResult."""
+        parts = list(self.batches(batch_size))
+        if len(parts) == 1:
+            return parts[0]
+        first = parts[0]
+        return SensitivityResult(first.sf_ids, first.parameters, first.shape, 0,
+                                 np.concatenate([part.values for part in parts]),
+                                 *(np.concatenate([getattr(part, name) for part in parts]) for name in RESULT_FIELDS))
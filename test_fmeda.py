@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the desktop model (FMEDA.py) and the engines built on its formulas.
+
+Every fast path is checked against a full Project.evaluate_metrics():
+the columnar engine, the running totals kept by the object model while it
+is edited, and the sensitivity sweeps. The headless CLI is checked too.
+
+    python -m unittest test_fmeda
+"""
+
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import fmeda_cli
+from FMEDA import Project, SafetyFunction, Component, FailureMode
+from fmeda_engine import evaluate_project
+from fmeda_sensitivity import Sweep
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+EXAMPLE = os.path.join(ROOT, 'FMEDA Project1.csv')
+METRICS = ('RF', 'MPFL', 'MPFD', 'MPHF', 'SPFM', 'LFM')
+MECHANISMS = ('Watchdog', 'Voltage monitor', 'CRC check')
+DC_LEVELS = (0, 60, 90, 99)
+
+
+def random_project(seed, n_sfs=6, n_components=40, fms_per_component=3):
+    """A project with random rates, flags and coverages.
+
+    Components link to 0-2 of the SFs; the last SF is never linked.
+    """
+    rng = random.Random(seed)
+    project = Project(f"random {seed}")
+    project.lifetime = 20000.0
+    sfs = [SafetyFunction(f"SF{i}") for i in range(n_sfs)]
+    for sf in sfs:
+        project.add_SF(sf)
+    for i in range(n_components):
+        comp = Component(f"C{i}")
+        comp.failure_rate = rng.uniform(1, 100)
+        project.add_component(comp)
+        for j in range(fms_per_component):
+            comp.add_FM(random_failure_mode(rng, f"fm {j}"))
+        for sf in rng.sample(sfs[:-1], min(rng.randint(0, 2), n_sfs - 1)):
+            project.link(comp, sf)
+    return project
+
+
+def random_failure_mode(rng, description):
+    fm = FailureMode()
+    fm.description = description
+    fm.Failure_rate_total = rng.uniform(0.1, 30)
+    fm.is_SPF = int(rng.random() < 0.7)
+    fm.is_MPF = int(rng.random() < 0.8)
+    fm.set_spf_mechanism(rng.choice(MECHANISMS), rng.choice(DC_LEVELS))
+    fm.set_mpf_mechanism(rng.choice(MECHANISMS), rng.choice(DC_LEVELS))
+    return fm
+
+
+def snapshot(project):
+    """``{sf_id: {metric: value}}`` of the current SF values."""
+    return {sf.id: {name: getattr(sf, name) for name in METRICS} for sf in project.SF_list}
+
+
+class MetricsAssertions:
+    """Mixin comparing SF metrics with a relative tolerance."""
+
+    def assertMetricsClose(self, expected, actual):
+        """Compare two snapshot() dicts, MPHF in FIT like the other metrics."""
+        self.assertEqual(expected.keys(), actual.keys())
+        for sf_id, values in expected.items():
+            for name, value in values.items():
+                scale = 1e9 if name == 'MPHF' else 1.0
+                self.assertTrue(
+                    math.isclose(value * scale, actual[sf_id][name] * scale, rel_tol=1e-9, abs_tol=1e-9),
+                    f"SF {sf_id} {name}: expected {value!r}, got {actual[sf_id][name]!r}",
+                )
+
+
+class ColumnarEngineTests(MetricsAssertions, unittest.TestCase):
+
+    def test_matches_evaluate_metrics(self):
+        for seed in range(5):
+            project = random_project(seed)
+            project.evaluate_metrics(project.lifetime)
+            expected = snapshot(project)
+            columnar = random_project(seed)
+            evaluate_project(columnar, columnar.lifetime)
+            self.assertMetricsClose(expected, snapshot(columnar))
+
+
+class IncrementalUpdateTests(MetricsAssertions, unittest.TestCase):
+    """Edits update the running totals; they must match a full evaluation."""
+
+    def edit(self, rng, project):
+        comps = list(project.bom)
+        sfs = list(project.SF_list)
+        comp = rng.choice(comps)
+        action = rng.randrange(8)
+        if action == 0 and comp.failure_modes:
+            rng.choice(comp.failure_modes).set_spf_mechanism(rng.choice(MECHANISMS), rng.uniform(0, 100))
+        elif action == 1 and comp.failure_modes:
+            rng.choice(comp.failure_modes).set_mpf_mechanism(rng.choice(MECHANISMS), rng.uniform(0, 100))
+        elif action == 2 and comp.failure_modes:
+            rng.choice(comp.failure_modes).Failure_rate_total = rng.uniform(0.1, 30)
+        elif action == 3 and comp.failure_modes:
+            fm = rng.choice(comp.failure_modes)
+            fm.is_SPF = 1 - fm.is_SPF
+        elif action == 4:
+            comp.failure_rate = rng.uniform(1, 100)
+        elif action == 5:
+            project.link(comp, rng.choice(sfs))
+        elif action == 6 and comp.related_Sfs:
+            project.unlink(comp, rng.choice(comp.related_Sfs))
+        elif action == 7:
+            if comp.failure_modes and rng.random() < 0.5:
+                comp.remove_FM(rng.choice(comp.failure_modes))
+            else:
+                comp.add_FM(random_failure_mode(rng, f"added {rng.random()}"))
+
+    def test_edits_match_full_evaluation(self):
+        rng = random.Random(0)
+        for seed in range(5):
+            project = random_project(seed)
+            project.evaluate_metrics(project.lifetime)
+            for _ in range(300):
+                self.edit(rng, project)
+            running = snapshot(project)
+            project.evaluate_metrics(project.lifetime)
+            self.assertMetricsClose(snapshot(project), running)
+
+    def test_adding_a_linked_component_again(self):
+        project = random_project(1)
+        project.evaluate_metrics(project.lifetime)
+        sf = project.SF_list[0]
+        before = snapshot(project)
+        for comp in list(sf.related_components):
+            sf.add_component(comp)
+        self.assertEqual(before, snapshot(project))
+
+    def test_unlinking_every_component_leaves_zero(self):
+        project = random_project(2, n_sfs=1, n_components=50)
+        sf = project.SF_list[0]
+        comps = list(project.bom)
+        for comp in comps:
+            project.link(comp, sf)
+        project.evaluate_metrics(project.lifetime)
+        random.Random(2).shuffle(comps)
+        for comp in comps:
+            project.unlink(comp, sf)
+        self.assertEqual((sf.RF, sf.MPFL, sf.MPFD, sf.safetyrelated, sf.SPFM, sf.LFM), (0, 0, 0, 0, 0, 0))
+
+
+class SensitivityTests(MetricsAssertions, unittest.TestCase):
+    """Each scenario of a sweep equals editing the project and evaluating it."""
+
+    SEED = 3
+
+    def sweep(self):
+        project = random_project(self.SEED)
+        sweep = Sweep(project)
+        sweep.vary_mechanism('Watchdog', [0, 45.5, 90, 99])
+        sweep.vary_mechanism('CRC check', [10, 60, 99])
+        sweep.vary_failure_mode(('C7', 'fm 1'), 'Failure_rate_total', [0.5, 3.0])
+        return project, sweep
+
+    def evaluate_scenario(self, values):
+        project = random_project(self.SEED)
+        watchdog, crc, rate = values
+        for comp in project.bom:
+            for fm in comp.failure_modes:
+                for name, dc in (('Watchdog', watchdog), ('CRC check', crc)):
+                    if fm.SPF_safety_mechanism == name:
+                        fm.set_spf_mechanism(name, dc)
+                    if fm.MPF_safety_mechanism == name:
+                        fm.set_mpf_mechanism(name, dc)
+        comp = project.get_component('C7')
+        next(fm for fm in comp.failure_modes if fm.description == 'fm 1').Failure_rate_total = rate
+        project.evaluate_metrics(project.lifetime)
+        return snapshot(project)
+
+    def test_scenarios_match_evaluate_metrics(self):
+        project, sweep = self.sweep()
+        self.assertEqual(len(sweep), 4 * 3 * 2)
+        result = sweep.run(batch_size=5)
+        for i in range(len(result)):
+            actual = {sf_id: {name: getattr(result, name)[i, s] for name in METRICS}
+                      for s, sf_id in enumerate(result.sf_ids)}
+            self.assertMetricsClose(self.evaluate_scenario(result.values[i].tolist()), actual)
+
+    def test_project_is_not_modified(self):
+        project, sweep = self.sweep()
+        project.evaluate_metrics(project.lifetime)
+        before = snapshot(project)
+        sweep.run()
+        self.assertEqual(before, snapshot(project))
+
+    def test_surface_has_one_axis_per_parameter(self):
+        _, sweep = self.sweep()
+        self.assertEqual(sweep.run().surface('SPFM', 'SF0').shape, (4, 3, 2))
+
+    def test_overlapping_parameters_are_rejected(self):
+        _, sweep = self.sweep()
+        with self.assertRaises(ValueError):
+            sweep.vary_mechanism('Watchdog', [50])
+
+
+class CliTests(unittest.TestCase):
+
+    def test_evaluate_does_not_import_numpy(self):
+        # NumPy alone is most of the 50 ms cold start budget
+        code = ("import sys, fmeda_cli; fmeda_cli.main(['evaluate', sys.argv[1]]); "
+                "sys.exit('numpy' in sys.modules or 'fmeda_engine' in sys.modules)")
+        process = subprocess.run([sys.executable, '-c', code, EXAMPLE], cwd=ROOT, capture_output=True, text=True)
+        self.assertEqual(process.returncode, 0, process.stderr)
+        self.assertIn('SF-ID', process.stdout)
+
+    def test_batch_has_a_row_for_every_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            empty = os.path.join(tmp, 'no_sfs.csv')
+            with open(empty, 'w', encoding='utf-8') as out:
+                out.write('section,name,lifetime\nproject,No SFs,1000\n')
+            rows = dict(fmeda_cli.run_batch([EXAMPLE, empty], jobs=1))
+        self.assertEqual(len(rows[EXAMPLE]), 2)
+        self.assertEqual(rows[empty], [{'file': empty, 'project': 'No SFs'}])
+
+
+if __name__ == '__main__':
+    unittest.main()